@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Conversation, AnalyticsCounter, SessionSketch
+from analytics_rollup import RollupDelta, HyperLogLog, build_summary, day_bucket, hour_bucket
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+class DatabaseRollup:
+    """Analytics rollups stored next to the conversations they count
+
+    apply() is called in the same transaction that inserts a batch of
+    conversations, so counters and rows commit or roll back together.
+    Counter increments are single upserts; a session sketch row is locked
+    while it is merged, so concurrent workers never lose each other's sessions.
+    """
+
+    # AnalyticsCounter row recording how many conversations the rollups missed
+    STALE_KEY = ('stale', '', '')
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.tables_ready = False
+
+    def ensure_tables(self):
+        """Create the rollup tables on databases that predate them (safe to repeat)"""
+        if not self.tables_ready:
+            for model in (AnalyticsCounter, SessionSketch):
+                model.__table__.create(db.engine, checkfirst=True)
+            self.tables_ready = True
+
+    def mark_stale(self, session, rows):
+        """Record that rows conversations are missing from the rollups until the next backfill"""
+        period, bucket, sentiment = self.STALE_KEY
+        with session.begin_nested():
+            counter = session.get(AnalyticsCounter, self.STALE_KEY, with_for_update=True, populate_existing=True)
+            if counter is None:
+                session.add(AnalyticsCounter(period=period, bucket=bucket, sentiment=sentiment, count=rows))
+            else:
+                counter.count += rows
+
+    def is_stale(self):
+        """Whether some conversations were saved without updating the rollups"""
+        return db.session.get(AnalyticsCounter, self.STALE_KEY) is not None
+
+    def delta(self, rows):
+        """RollupDelta for conversation rows as queued by ConversationWriter"""
+        delta = RollupDelta(self.precision)
+        for row in rows:
+            delta.add(row.get('created_at'), row.get('sentiment'), row.get('session_id'))
+        return delta
+
+    def apply(self, session, delta):
+        insert = UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+        for (period, bucket, sentiment), count in delta.counts.items():
+            if insert is not None:
+                statement = insert(AnalyticsCounter).values(period=period, bucket=bucket, sentiment=sentiment, count=count)
+                session.execute(statement.on_conflict_do_update(
+                    index_elements=['period', 'bucket', 'sentiment'],
+                    set_={'count': AnalyticsCounter.count + statement.excluded.count}
+                ))
+                continue
+            counter = session.get(AnalyticsCounter, (period, bucket, sentiment), with_for_update=True, populate_existing=True)
+            if counter is None:
+                session.add(AnalyticsCounter(period=period, bucket=bucket, sentiment=sentiment, count=count))
+                session.flush()
+            else:
+                counter.count += count
+
+        for period, bucket in delta.sketches:
+            if insert is not None:
+                session.execute(insert(SessionSketch).values(
+                    period=period, bucket=bucket, registers=HyperLogLog(self.precision).to_bytes()
+                ).on_conflict_do_nothing(index_elements=['period', 'bucket']))
+            stored = session.get(SessionSketch, (period, bucket), with_for_update=True, populate_existing=True)
+            sketch = HyperLogLog(self.precision, stored.registers if stored else None)
+            if not delta.apply_to((period, bucket), sketch) and stored is not None:
+                continue
+            if stored is None:
+                session.add(SessionSketch(period=period, bucket=bucket, registers=sketch.to_bytes()))
+                session.flush()
+            else:
+                stored.registers = sketch.to_bytes()
+
+    def summary(self, days=7, hours=24, now=None):
+        """Dashboard numbers read from the rollups (buckets are in UTC, like created_at)"""
+        now = now or datetime.utcnow()
+        rows = db.session.query(
+            AnalyticsCounter.period, AnalyticsCounter.bucket, AnalyticsCounter.sentiment, AnalyticsCounter.count
+        ).filter(or_(
+            AnalyticsCounter.period == 'all',
+            (AnalyticsCounter.period == 'day') & (AnalyticsCounter.bucket >= day_bucket(now - timedelta(days=days - 1))),
+            (AnalyticsCounter.period == 'hour') & (AnalyticsCounter.bucket >= hour_bucket(now - timedelta(hours=hours - 1)))
+        )).all()
+        stored = db.session.get(SessionSketch, ('all', ''))
+        all_time = HyperLogLog.from_bytes(stored.registers, self.precision) if stored else None
+        return {**build_summary(rows, all_time, days, hours, now), 'rollup_stale': self.is_stale()}
+
+    def backfill(self, batch_size=1000):
+        """Rebuild every rollup from the conversations table
+
+        Run it with conversation writes paused (e.g. before starting the
+        workers), since rows flushed during the scan may be counted twice.
+        It also clears the stale marker left by failed rollup updates.
+        """
+        self.ensure_tables()
+        delta = RollupDelta(self.precision)
+        query = db.session.query(Conversation.created_at, Conversation.sentiment, Conversation.session_id)
+        for created_at, sentiment, session_id in query.yield_per(batch_size):
+            delta.add(created_at, sentiment, session_id)
+        db.session.query(AnalyticsCounter).delete()
+        db.session.query(SessionSketch).delete()
+        self.apply(db.session, delta)
+        db.session.commit()
+        return sum(count for (period, _, _), count in delta.counts.items() if period == 'all')
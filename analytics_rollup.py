@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Conversation analytics kept as running totals instead of being recomputed
+
+Each saved conversation adds one to its hour, day and all-time counters
+(split by sentiment) and adds its session to an all-time HyperLogLog
+sketch, so the dashboard reads a bounded number of rows no matter how many
+conversations have been stored.
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+
+def register_position(value, precision=12):
+    """(register index, rank) that adding value to a sketch raises"""
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    hashed = int.from_bytes(digest, 'big')
+    remaining = hashed & ((1 << (64 - precision)) - 1)
+    return hashed >> (64 - precision), 64 - precision - remaining.bit_length() + 1
+
+class HyperLogLog:
+    """Fixed-size distinct-count sketch (about 1.6% error at precision 12)
+
+    Sketches of the same precision merge by taking the larger register, so
+    updates can be folded into stored sketches in any order.
+    """
+
+    def __init__(self, precision=12, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError(f"Expected {self.size} registers, got {len(self.registers)}")
+
+    def update(self, index, rank):
+        """Raise one register to rank; True if it changed"""
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def add(self, value):
+        return self.update(*register_position(value, self.precision))
+
+    def merge(self, other):
+        """Fold other into this sketch"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """Estimated number of distinct values added"""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        histogram = Counter(self.registers)
+        estimate = alpha * m * m / sum(count * 2.0 ** -rank for rank, count in histogram.items())
+        zeros = histogram.get(0, 0)
+        if estimate <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))  # Linear counting is more accurate when sparse
+        return round(estimate)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data, precision=12):
+        return cls(precision, data)
+
+def parse_timestamp(value):
+    """A conversation's time as a datetime (records store ISO strings)"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return datetime.now()
+
+def hour_bucket(moment):
+    return moment.strftime('%Y-%m-%dT%H')
+
+def day_bucket(moment):
+    return moment.strftime('%Y-%m-%d')
+
+class RollupDelta:
+    """Counter increments and session-sketch updates for a batch of conversations
+
+    counts maps (period, bucket, sentiment) to a count, where period is
+    'all' (bucket ''), 'day' or 'hour'. sketches maps ('all', '') to the
+    HyperLogLog registers the batch's sessions raise ({index: rank}), so
+    applying one conversation touches one register. Only the all-time
+    sketch is kept: it is the one the dashboard reads, and every sketch
+    costs a 4 KB blob rewrite per batch.
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.counts = Counter()
+        self.sketches = {}
+
+    def add(self, created_at, sentiment, session_id):
+        moment = parse_timestamp(created_at)
+        sentiment = sentiment or 'neutral'
+        self.counts[('all', '', sentiment)] += 1
+        self.counts[('day', day_bucket(moment), sentiment)] += 1
+        self.counts[('hour', hour_bucket(moment), sentiment)] += 1
+        index, rank = register_position(session_id or 'anonymous', self.precision)
+        updates = self.sketches.setdefault(('all', ''), {})
+        if rank > updates.get(index, 0):
+            updates[index] = rank
+        return self
+
+    def apply_to(self, key, sketch):
+        """Raise sketch's registers for key; True if any changed"""
+        changed = False
+        for index, rank in self.sketches[key].items():
+            changed = sketch.update(index, rank) or changed
+        return changed
+
+    def add_record(self, record):
+        """Add a conversation record as stored in the JSON-lines log"""
+        return self.add(record.get('timestamp') or record.get('created_at'),
+                        record.get('sentiment'), record.get('session_id'))
+
+    def __bool__(self):
+        return bool(self.counts)
+
+def build_summary(counter_rows, all_time_sketch, days=7, hours=24, now=None):
+    """Dashboard numbers from (period, bucket, sentiment, count) rows
+
+    counter_rows should hold the all-time rows plus the day and hour rows
+    of the requested window; missing buckets are reported as zero.
+    """
+    now = now or datetime.now()
+    sentiment_distribution = {sentiment: 0 for sentiment in SENTIMENTS}
+    daily = {day_bucket(now - timedelta(days=n)): 0 for n in reversed(range(days))}
+    hourly = {hour_bucket(now - timedelta(hours=n)): 0 for n in reversed(range(hours))}
+    for period, bucket, sentiment, count in counter_rows:
+        if period == 'all':
+            sentiment_distribution[sentiment] = sentiment_distribution.get(sentiment, 0) + count
+        elif period == 'day' and bucket in daily:
+            daily[bucket] += count
+        elif period == 'hour' and bucket in hourly:
+            hourly[bucket] += count
+    return {
+        'total_conversations': sum(sentiment_distribution.values()),
+        'unique_sessions': all_time_sketch.count() if all_time_sketch is not None else 0,
+        'sentiment_distribution': sentiment_distribution,
+        'daily_conversations': [{'day': day, 'conversations': count} for day, count in daily.items()],
+        'hourly_conversations': [{'hour': hour, 'conversations': count} for hour, count in hourly.items()]
+    }
+
+class SQLiteRollup:
+    """Rollup counters and sketches in a SQLite file shared by every worker
+
+    Used by the file-based app next to the conversation log; the Postgres
+    app keeps the same rollups in its database (see analytics_db.py).
+    """
+
+    def __init__(self, path='analytics.db', precision=12):
+        self.path = path
+        self.precision = precision
+        self.local = threading.local()
+        self.built = False
+
+    def connection(self):
+        """Per-thread connection, reopened after a fork"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')  # Rollups can be rebuilt from the log
+            conn.execute('CREATE TABLE IF NOT EXISTS counters ('
+                         'period TEXT NOT NULL, bucket TEXT NOT NULL, sentiment TEXT NOT NULL, '
+                         'count INTEGER NOT NULL, PRIMARY KEY (period, bucket, sentiment))')
+            conn.execute('CREATE TABLE IF NOT EXISTS sketches ('
+                         'period TEXT NOT NULL, bucket TEXT NOT NULL, registers BLOB NOT NULL, '
+                         'PRIMARY KEY (period, bucket))')
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def is_built(self):
+        """Whether the rollups have been backfilled from existing conversations"""
+        if not self.built:
+            row = self.connection().execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+            self.built = row is not None
+        return self.built
+
+    def apply_delta(self, conn, delta):
+        for (period, bucket, sentiment), count in delta.counts.items():
+            conn.execute('INSERT INTO counters (period, bucket, sentiment, count) VALUES (?, ?, ?, ?) '
+                         'ON CONFLICT (period, bucket, sentiment) DO UPDATE SET count = count + excluded.count',
+                         (period, bucket, sentiment, count))
+        for period, bucket in delta.sketches:
+            row = conn.execute('SELECT registers FROM sketches WHERE period = ? AND bucket = ?',
+                               (period, bucket)).fetchone()
+            sketch = HyperLogLog(self.precision, row[0] if row else None)
+            if delta.apply_to((period, bucket), sketch) or row is None:
+                conn.execute('INSERT OR REPLACE INTO sketches (period, bucket, registers) VALUES (?, ?, ?)',
+                             (period, bucket, sketch.to_bytes()))
+
+    def add(self, record):
+        """Count one newly saved conversation record"""
+        self.apply(RollupDelta(self.precision).add_record(record))
+
+    def apply(self, delta):
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self.apply_delta(conn, delta)
+
+    def rebuild(self, records):
+        """Replace the rollups with ones computed from records"""
+        delta = RollupDelta(self.precision)
+        for record in records:
+            delta.add_record(record)
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM counters')
+            conn.execute('DELETE FROM sketches')
+            self.apply_delta(conn, delta)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+        self.built = True
+        return sum(count for (period, _, _), count in delta.counts.items() if period == 'all')
+
+    def summary(self, days=7, hours=24, now=None):
+        """Dashboard numbers read from the rollups"""
+        now = now or datetime.now()
+        conn = self.connection()
+        rows = conn.execute(
+            "SELECT period, bucket, sentiment, count FROM counters WHERE period = 'all' "
+            "OR (period = 'day' AND bucket >= ?) OR (period = 'hour' AND bucket >= ?)",
+            (day_bucket(now - timedelta(days=days - 1)), hour_bucket(now - timedelta(hours=hours - 1)))
+        ).fetchall()
+        sketch = conn.execute("SELECT registers FROM sketches WHERE period = 'all' AND bucket = ''").fetchone()
+        all_time = HyperLogLog.from_bytes(sketch[0], self.precision) if sketch else None
+        return build_summary(rows, all_time, days, hours, now)
+
+def main():
+    """Rebuild the analytics rollups from the conversation log"""
+    from conversation_store import ConversationStore
+    log_path = sys.argv[1] if len(sys.argv) > 1 else 'conversations.jsonl'
+    rollup_path = sys.argv[2] if len(sys.argv) > 2 else 'analytics.db'
+    count = SQLiteRollup(rollup_path).rebuild(ConversationStore(log_path).read_all())
+    print(f"✅ Backfilled analytics for {count} conversations from {log_path} into {rollup_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
-from flask import Flask, request, jsonify, render_template_string, session
+from flask import Flask, Response, g, request, jsonify, render_template_string, session, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
+import click
 from flask_caching import Cache
 import os
 import time
@@ -14,8 +15,18 @@ from sqlalchemy import text
 from config import config
 from models import db, Conversation, Feedback, KnowledgeBase, AdminUser
 from auth import admin_required, hash_password, verify_password, generate_token
-from monitoring import init_monitoring, before_request, after_request, log_chat_interaction, get_metrics, logger
-import openai
+from monitoring import init_monitoring, before_request, after_request, log_chat_interaction, log_time_to_first_token, get_metrics, logger
+from response_cache import KnowledgeVersion, ResponseCache, SemanticCache, build_cache_key
+from conversation_writer import ConversationWriter
+from knowledge_db import KnowledgeSearch, import_knowledge_files, install_search_index
+from streaming import format_sse, iter_completion_tokens
+from provider_clients import ProviderClients
+from provider_router import Provider, ProviderRouter
+from single_flight import create_single_flight
+from intent_matcher import IntentMatcher
+from sentiment import SentimentAnalyzer
+from static_page import StaticPage
+from stage_timer import stage, record_stage
 
 def create_app(config_name=None):
     app = Flask(__name__)
@@ -40,6 +51,46 @@ def create_app(config_name=None):
     
     # Caching
     cache = Cache(app, config={'CACHE_TYPE': 'redis', 'CACHE_REDIS_URL': app.config['REDIS_URL']})
+    response_cache = ResponseCache(cache, timeout=app.config['AI_CACHE_TIMEOUT'])
+    # Part of every cache key; flask load-knowledge moves it on
+    knowledge_version = KnowledgeVersion(cache)
+    app.extensions['knowledge_version'] = knowledge_version
+    semantic_cache = SemanticCache(
+        threshold=app.config['SEMANTIC_CACHE_THRESHOLD'],
+        max_entries=app.config['SEMANTIC_CACHE_SIZE'],
+        ttl=app.config['AI_CACHE_TIMEOUT']
+    ) if app.config['SEMANTIC_CACHE_ENABLED'] else None
+    
+    # Concurrent identical questions wait on one provider call, in this worker and across workers
+    single_flight = create_single_flight(app.config['SINGLE_FLIGHT_STORAGE_URL'], app.config['SINGLE_FLIGHT_TIMEOUT'])
+    
+    # Knowledge base entries live in the database, behind its full-text index
+    knowledge_search = KnowledgeSearch(
+        priority_boost=app.config['KNOWLEDGE_PRIORITY_BOOST'],
+        limit=app.config['KNOWLEDGE_SEARCH_LIMIT']
+    )
+    app.extensions['knowledge_search'] = knowledge_search
+    
+    # Keep-alive connections to the LLM providers, shared by every request in a worker
+    provider_clients = ProviderClients.from_config(app.config)
+    app.extensions['provider_clients'] = provider_clients
+    
+    # Conversations are written in batches off the request path
+    conversation_writer = ConversationWriter(
+        app,
+        batch_size=app.config['CONVERSATION_BATCH_SIZE'],
+        flush_interval=app.config['CONVERSATION_FLUSH_INTERVAL'],
+        max_queue=app.config['CONVERSATION_QUEUE_SIZE'],
+        retries=app.config['CONVERSATION_WRITE_RETRIES'],
+        retry_backoff=app.config['CONVERSATION_RETRY_BACKOFF']
+    )
+    
+    # The repo has no migrations, so create the analytics tables on databases that predate them
+    with app.app_context():
+        try:
+            conversation_writer.rollup.ensure_tables()
+        except Exception as e:
+            logger.warning("Could not create analytics rollup tables", error=str(e))
     
     # Monitoring
     init_monitoring(app)
@@ -59,39 +110,161 @@ def create_app(config_name=None):
         "default": "Hello! Welcome to 3MTT support. How can I help you today?"
     }
     
-    def get_ai_response(message, conversation_history=None):
+    # Keywords for each mock response, checked in priority order
+    MOCK_INTENTS = IntentMatcher({
+        "dashboard_scores": ["dashboard", "score", "darey"],
+        "change_course": ["change", "course", "location"],
+        "onboarding_wait": ["onboard", "waiting"],
+        "entry_assessment": ["assessment", "test"],
+        "financial_support": ["financial", "money"],
+        "physical_attendance": ["physical", "attendance"],
+        "learning_community": ["community", "learning"],
+        "program_end": ["end", "finish", "cohort"]
+    })
+    
+    sentiment_analyzer = SentimentAnalyzer()
+    
+    SYSTEM_PROMPT = "You are a helpful customer support assistant for 3MTT organization. Keep responses concise and professional."
+    
+    def build_system_prompt(message):
+        """System prompt with the knowledge base entries that match message"""
+        try:
+            with stage('knowledge_search'):
+                matches = knowledge_search.search(message)
+        except Exception as e:
+            logger.warning("Knowledge search failed", error=str(e))
+            # On Postgres the failed query aborts the transaction the rest of the request still needs
+            db.session.rollback()
+            matches = []
+        if not matches:
+            return SYSTEM_PROMPT
+        context = "\n".join(f"- {match.question}: {match.answer}" for match in matches)
+        return f"{SYSTEM_PROMPT}\n\nRelevant 3MTT information:\n{context}"
+    
+    def build_chat_messages(message):
+        """Chat messages sent to every provider tried for message"""
+        return [
+            {"role": "system", "content": build_system_prompt(message)},
+            {"role": "user", "content": message}
+        ]
+    
+    def get_provider():
+        """Return the (provider, model) pair that will answer the next message"""
+        if app.config['AI_PROVIDER'] == 'openrouter' and app.config['OPENROUTER_API_KEY']:
+            return 'openrouter', app.config['AI_MODEL']
+        elif app.config['AI_PROVIDER'] == 'openai' and app.config['OPENAI_API_KEY']:
+            return 'openai', get_openai_model()
+        return 'mock', None
+    
+    def get_openai_model():
+        """OpenAI only serves gpt-* models; fall back to gpt-4 otherwise"""
+        return app.config['AI_MODEL'] if app.config['AI_MODEL'].startswith('gpt') else 'gpt-4'
+    
+    def get_cached_response(message, provider, model):
+        """Return (cache_key, cached response or None) for a message"""
+        with stage('cache_lookup'):
+            version = knowledge_version.get()
+            if semantic_cache is not None:
+                semantic_cache.sync(version)
+            cache_key = build_cache_key(message, provider, model, app.config['TEMPERATURE'], SYSTEM_PROMPT, version)
+            cached_response = response_cache.get(cache_key)
+            if cached_response:
+                return cache_key, cached_response
+            
+            # Near-duplicate questions only save money when a real LLM is behind them
+            if semantic_cache is not None and provider != 'mock':
+                cached_response = semantic_cache.get(message)
+                if cached_response:
+                    response_cache.set(cache_key, cached_response)
+                    return cache_key, cached_response
+            return cache_key, None
+    
+    def cache_response(cache_key, message, provider, response):
+        """Store a fresh response in the exact and semantic caches"""
+        with stage('cache_store'):
+            response_cache.set(cache_key, response)
+            if semantic_cache is not None and provider != 'mock':
+                semantic_cache.set(message, response)
+    
+    def fetch_ai_response(message, cache_key, provider):
+        """Ask the providers for a response and cache it for later and concurrent askers"""
+        # Built once here so fail-over and hedged attempts reuse the knowledge search
+        answered_by, response = provider_router.call(build_chat_messages(message))
+        # cache_key names provider; a fail-over answer must not pass for its
+        if answered_by == provider:
+            cache_response(cache_key, message, provider, response)
+        return response
+    
+    def get_ai_response(message, sentiment, conversation_history=None):
         """Get AI response with caching"""
-        cache_key = f"ai_response:{hash(message)}"
-        cached_response = cache.get(cache_key)
+        provider, model = get_provider()
+        cache_key, cached_response = get_cached_response(message, provider, model)
         if cached_response:
             return cached_response
         
         start_time = time.time()
         try:
-            if app.config['AI_PROVIDER'] == 'openrouter' and app.config['OPENROUTER_API_KEY']:
-                response = get_openrouter_response(message)
-            elif app.config['AI_PROVIDER'] == 'openai' and app.config['OPENAI_API_KEY']:
-                response = get_openai_response(message)
-            else:
-                response = get_mock_response(message)
-            
-            # Cache successful responses
-            cache.set(cache_key, response, timeout=3600)  # 1 hour
+            with stage('provider'):
+                if provider_router:
+                    response = single_flight.do(
+                        cache_key,
+                        lambda: fetch_ai_response(message, cache_key, provider),
+                        lookup=lambda: response_cache.peek(cache_key)
+                    )
+                else:
+                    response = get_mock_response(message)
+                    cache_response(cache_key, message, provider, response)
             
         except Exception as e:
             logger.error("AI response failed", error=str(e))
             response = get_mock_response(message)
         
         response_time = time.time() - start_time
-        log_chat_interaction(analyze_sentiment(message), response_time)
+        log_chat_interaction(sentiment, response_time)
         return response
     
-    def get_openrouter_response(message):
-        """Get response from OpenRouter (DeepSeek) API"""
-        import requests
+    def stream_ai_response(message, sentiment):
+        """Yield the AI response in pieces as the provider produces them"""
+        provider, model = get_provider()
+        cache_key, cached_response = get_cached_response(message, provider, model)
+        if cached_response:
+            yield cached_response
+            return
         
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
+        start_time = time.time()
+        pieces = []
+        answered_by = provider
+        try:
+            if provider_router:
+                tokens = provider_router.stream(build_chat_messages(message))
+            else:
+                tokens = iter([(provider, get_mock_response(message))])
+            
+            for answered_by, token in tokens:
+                if not pieces:
+                    log_time_to_first_token(time.time() - start_time)
+                pieces.append(token)
+                yield token
+            record_stage('provider', time.time() - start_time)
+            
+            # Only complete responses from the provider cache_key names are cached
+            if answered_by == provider:
+                cache_response(cache_key, message, provider, ''.join(pieces))
+            
+        except Exception as e:
+            logger.error("AI response stream failed", error=str(e), streamed=len(pieces))
+            if pieces:
+                # Part of the answer is already out; chat_stream reports the failure
+                raise
+            yield get_mock_response(message)
+        
+        response_time = time.time() - start_time
+        log_chat_interaction(sentiment, response_time)
+    
+    def get_openrouter_response(messages):
+        """Get response from OpenRouter (DeepSeek) API"""
+        response = provider_clients.http_session().post(
+            url=app.config['OPENROUTER_API_URL'],
             headers={
                 "Authorization": f"Bearer {app.config['OPENROUTER_API_KEY']}",
                 "Content-Type": "application/json",
@@ -100,20 +273,11 @@ def create_app(config_name=None):
             },
             json={
                 "model": app.config['AI_MODEL'],
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are a helpful customer support assistant for 3MTT organization. Keep responses concise and professional."
-                    },
-                    {
-                        "role": "user",
-                        "content": message
-                    }
-                ],
+                "messages": messages,
                 "max_tokens": app.config['MAX_TOKENS'],
                 "temperature": app.config['TEMPERATURE']
             },
-            timeout=30
+            timeout=provider_clients.request_timeout()
         )
         
         if response.status_code == 200:
@@ -121,63 +285,82 @@ def create_app(config_name=None):
         else:
             raise Exception(f"OpenRouter API error: {response.status_code}")
     
-    def get_openai_response(message):
+    def stream_openrouter_response(messages):
+        """Stream response tokens from OpenRouter (DeepSeek) API"""
+        response = provider_clients.http_session().post(
+            url=app.config['OPENROUTER_API_URL'],
+            headers={
+                "Authorization": f"Bearer {app.config['OPENROUTER_API_KEY']}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": app.config['SITE_URL'],
+                "X-Title": app.config['SITE_NAME'],
+            },
+            json={
+                "model": app.config['AI_MODEL'],
+                "messages": messages,
+                "max_tokens": app.config['MAX_TOKENS'],
+                "temperature": app.config['TEMPERATURE'],
+                "stream": True
+            },
+            stream=True,
+            timeout=provider_clients.request_timeout()
+        )
+        
+        with response:
+            if response.status_code != 200:
+                raise Exception(f"OpenRouter API error: {response.status_code}")
+            yield from iter_completion_tokens(response.iter_lines())
+    
+    def get_openai_response(messages):
         """Get response from OpenAI API"""
-        client = openai.OpenAI(api_key=app.config['OPENAI_API_KEY'])
-        messages = [
-            {"role": "system", "content": "You are a helpful customer support assistant for 3MTT organization. Keep responses concise and professional."},
-            {"role": "user", "content": message}
-        ]
+        client = provider_clients.openai_client(app.config['OPENAI_API_KEY'])
         
         ai_response = client.chat.completions.create(
-            model=app.config['AI_MODEL'] if app.config['AI_MODEL'].startswith('gpt') else 'gpt-4',
+            model=get_openai_model(),
             messages=messages,
             max_tokens=app.config['MAX_TOKENS'],
             temperature=app.config['TEMPERATURE']
         )
         return ai_response.choices[0].message.content
     
+    def stream_openai_response(messages):
+        """Stream response tokens from OpenAI API"""
+        client = provider_clients.openai_client(app.config['OPENAI_API_KEY'])
+        stream = client.chat.completions.create(
+            model=get_openai_model(),
+            messages=messages,
+            max_tokens=app.config['MAX_TOKENS'],
+            temperature=app.config['TEMPERATURE'],
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
     def get_mock_response(message):
         """Get mock response based on keywords"""
-        message_lower = message.lower()
-        if any(word in message_lower for word in ["dashboard", "score", "darey"]):
-            return MOCK_RESPONSES["dashboard_scores"]
-        elif any(word in message_lower for word in ["change", "course", "location"]):
-            return MOCK_RESPONSES["change_course"]
-        elif any(word in message_lower for word in ["onboard", "waiting"]):
-            return MOCK_RESPONSES["onboarding_wait"]
-        elif any(word in message_lower for word in ["assessment", "test"]):
-            return MOCK_RESPONSES["entry_assessment"]
-        elif any(word in message_lower for word in ["financial", "money"]):
-            return MOCK_RESPONSES["financial_support"]
-        elif any(word in message_lower for word in ["physical", "attendance"]):
-            return MOCK_RESPONSES["physical_attendance"]
-        elif any(word in message_lower for word in ["community", "learning"]):
-            return MOCK_RESPONSES["learning_community"]
-        elif any(word in message_lower for word in ["end", "finish", "cohort"]):
-            return MOCK_RESPONSES["program_end"]
-        else:
-            return MOCK_RESPONSES["default"]
+        return MOCK_RESPONSES[MOCK_INTENTS.first(message, default="default")]
     
-    def analyze_sentiment(message):
-        """Basic sentiment analysis"""
-        positive_words = ['good', 'great', 'excellent', 'happy', 'thank']
-        negative_words = ['bad', 'terrible', 'angry', 'frustrated', 'problem']
-        
-        message_lower = message.lower()
-        positive_count = sum(1 for word in positive_words if word in message_lower)
-        negative_count = sum(1 for word in negative_words if word in message_lower)
-        
-        if positive_count > negative_count:
-            return "positive"
-        elif negative_count > positive_count:
-            return "negative"
-        return "neutral"
+    def build_provider_router():
+        """Router over the configured provider, then any other provider with an API key"""
+        primary, _ = get_provider()
+        if primary == 'mock':
+            return ProviderRouter([])
+        available = {}
+        if app.config['OPENROUTER_API_KEY']:
+            available['openrouter'] = Provider('openrouter', get_openrouter_response, stream_openrouter_response)
+        if app.config['OPENAI_API_KEY']:
+            available['openai'] = Provider('openai', get_openai_response, stream_openai_response)
+        order = [primary] + [name for name in available if name != primary]
+        return ProviderRouter.from_config([available[name] for name in order], app.config)
     
-    @app.route('/')
-    def index():
-        """Serve chat interface"""
-        return render_template_string('''
+    # Circuit breakers skip a failing provider instead of waiting out its timeout
+    provider_router = build_provider_router()
+    app.extensions['provider_router'] = provider_router
+    
+    # Chat interface, rendered once and served as cached, precompressed bytes
+    with app.app_context():
+        chat_page = StaticPage(render_template_string('''
         <!DOCTYPE html>
         <html lang="en">
         <head>
@@ -228,6 +411,7 @@ def create_app(config_name=None):
                     messageDiv.appendChild(content);
                     chatMessages.appendChild(messageDiv);
                     chatMessages.scrollTop = chatMessages.scrollHeight;
+                    return content;
                 }
                 
                 function sendMessage() {
@@ -238,16 +422,48 @@ def create_app(config_name=None):
                     addMessage(message, true);
                     input.value = '';
                     
-                    fetch('/chat', {
+                    fetch('/chat/stream', {
                         method: 'POST',
                         headers: { 'Content-Type': 'application/json' },
                         body: JSON.stringify({ message: message })
                     })
-                    .then(response => response.json())
-                    .then(data => addMessage(data.response, false))
+                    .then(response => {
+                        if (!response.ok || !response.body) {
+                            return response.json().then(data => addMessage(data.response || data.error, false));
+                        }
+                        return readStream(response.body.getReader());
+                    })
                     .catch(error => addMessage('Sorry, something went wrong.', false));
                 }
                 
+                function readStream(reader) {
+                    const decoder = new TextDecoder();
+                    const content = addMessage('', false);
+                    let buffer = '';
+                    
+                    function handleEvent(raw) {
+                        const data = raw.split('\\n').filter(line => line.startsWith('data:')).map(line => line.slice(5)).join('\\n');
+                        if (!data) return;
+                        const payload = JSON.parse(data);
+                        if (payload.token) content.textContent += payload.token;
+                        if (payload.response) content.textContent = payload.response;
+                        if (payload.error) content.textContent = 'Sorry, something went wrong.';
+                        content.parentNode.parentNode.scrollTop = content.parentNode.parentNode.scrollHeight;
+                    }
+                    
+                    function pump() {
+                        return reader.read().then(({ done, value }) => {
+                            if (done) return;
+                            buffer += decoder.decode(value, { stream: true });
+                            const events = buffer.split('\\n\\n');
+                            buffer = events.pop();
+                            events.forEach(handleEvent);
+                            return pump();
+                        });
+                    }
+                    return pump();
+                }
+                
                 function handleKeyPress(event) {
                     if (event.key === 'Enter') sendMessage();
                 }
@@ -256,36 +472,55 @@ def create_app(config_name=None):
             </script>
         </body>
         </html>
-        ''')
+        '''), max_age=app.config['CHAT_PAGE_MAX_AGE'])
     
-    @app.route('/chat', methods=['POST'])
-    @limiter.limit("10 per minute")
-    def chat():
-        """Handle chat messages with security and monitoring"""
-        try:
-            data = request.get_json()
-            if not data or not data.get('message'):
-                return jsonify({'error': 'No message provided'}), 400
-            
-            user_message = html.escape(data['message'].strip())
-            if len(user_message) > 1000:
-                return jsonify({'error': 'Message too long'}), 400
-            
-            # Get AI response
-            bot_response = get_ai_response(user_message)
-            
-            # Save to database
-            conversation = Conversation(
+    @app.route('/')
+    def index():
+        """Serve chat interface"""
+        return chat_page.response(request)
+    
+    def read_chat_message():
+        """Return (message, error response) for the posted chat message"""
+        # Already parsed and sanitized by SecurityMiddleware, when installed
+        if 'sanitized_message' in g:
+            return g.sanitized_message, None
+        
+        data = request.get_json()
+        if not data or not data.get('message'):
+            return None, (jsonify({'error': 'No message provided'}), 400)
+        
+        user_message = html.escape(data['message'].strip())
+        if len(user_message) > 1000:
+            return None, (jsonify({'error': 'Message too long'}), 400)
+        return user_message, None
+    
+    def save_conversation(user_message, bot_response, sentiment):
+        """Queue a conversation for a batched database write"""
+        with stage('persist'):
+            conversation_writer.submit(
                 session_id=session.get('session_id', 'anonymous'),
                 user_message=user_message,
                 bot_response=bot_response,
-                sentiment=analyze_sentiment(user_message),
+                sentiment=sentiment,
                 message_length=len(user_message),
                 ip_address=request.remote_addr,
                 user_agent=request.headers.get('User-Agent', '')[:500]
             )
-            db.session.add(conversation)
-            db.session.commit()
+    
+    @app.route('/chat', methods=['POST'])
+    @limiter.limit("10 per minute")
+    def chat():
+        """Handle chat messages with security and monitoring"""
+        try:
+            user_message, error = read_chat_message()
+            if error:
+                return error
+            
+            # Get AI response
+            with stage('sentiment'):
+                sentiment = sentiment_analyzer.analyze(user_message)
+            bot_response = get_ai_response(user_message, sentiment)
+            save_conversation(user_message, bot_response, sentiment)
             
             return jsonify({'response': bot_response})
             
@@ -293,6 +528,41 @@ def create_app(config_name=None):
             logger.error("Chat error", error=str(e))
             return jsonify({'error': 'Internal server error'}), 500
     
+    @app.route('/chat/stream', methods=['POST'])
+    @limiter.limit("10 per minute")
+    def chat_stream():
+        """Stream the chat response as Server-Sent Events"""
+        try:
+            user_message, error = read_chat_message()
+            if error:
+                return error
+            with stage('sentiment'):
+                sentiment = sentiment_analyzer.analyze(user_message)
+        except Exception as e:
+            logger.error("Chat error", error=str(e))
+            return jsonify({'error': 'Internal server error'}), 500
+        
+        def generate():
+            pieces = []
+            try:
+                for token in stream_ai_response(user_message, sentiment):
+                    pieces.append(token)
+                    yield format_sse({'token': token})
+            except Exception as e:
+                logger.error("Chat stream error", error=str(e))
+                yield format_sse({'error': 'Internal server error'}, event='error')
+                return
+            
+            bot_response = ''.join(pieces)
+            save_conversation(user_message, bot_response, sentiment)
+            yield format_sse({'response': bot_response}, event='done')
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
     @app.route('/admin/login', methods=['POST'])
     @limiter.limit("5 per minute")
     def admin_login():
@@ -314,14 +584,36 @@ def create_app(config_name=None):
     @admin_required
     def analytics():
         """Admin analytics dashboard"""
-        total_conversations = Conversation.query.count()
+        summary = conversation_writer.rollup.summary()
         recent_conversations = Conversation.query.order_by(Conversation.created_at.desc()).limit(10).all()
         
         return jsonify({
-            'total_conversations': total_conversations,
+            **summary,
             'recent_conversations': [conv.to_dict() for conv in recent_conversations]
         })
     
+    @app.cli.command('backfill-analytics')
+    def backfill_analytics():
+        """Rebuild the analytics rollups from the conversations table"""
+        count = conversation_writer.rollup.backfill()
+        print(f"✅ Backfilled analytics for {count} conversations")
+    
+    @app.cli.command('load-knowledge')
+    @click.argument('paths', nargs=-1)
+    @click.option('--priority', default=1, help='Priority for entries from PATHS')
+    @click.option('--rebuild-index', is_flag=True, help='Rebuild the SQLite full-text index (e.g. after VACUUM)')
+    def load_knowledge(paths, priority, rebuild_index):
+        """Import knowledge base JSON files (KNOWLEDGE_FILES by default) into the database"""
+        db.create_all()
+        install_search_index(rebuild=rebuild_index)
+        files = {path: priority for path in paths} if paths else app.config['KNOWLEDGE_FILES']
+        added, updated = import_knowledge_files(files)
+        print(f"✅ Loaded knowledge base: {added} added, {updated} updated")
+        try:
+            knowledge_version.bump()
+        except Exception as e:
+            print(f"⚠️  Could not reset cached answers, they expire within {app.config['AI_CACHE_TIMEOUT']}s: {e}")
+    
     @app.route('/health')
     def health_check():
         """Health check endpoint"""
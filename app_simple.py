@@ -4,10 +4,26 @@ import os
 import uuid
 import time
 import html
-import re
 from datetime import datetime
 from dotenv import load_dotenv
 import logging
+from bm25_index import BM25FIndex
+from knowledge_store import KnowledgeStore
+from intent_matcher import IntentMatcher
+from sentiment import SentimentAnalyzer, CONVERSATION_LOG_POSITIVE_WORDS, CONVERSATION_LOG_NEGATIVE_WORDS
+from static_page import StaticPage
+from rate_limiter import create_rate_limiter
+from input_validation import contains_malicious_content
+from stage_timer import stage, start_request, stage_breakdown
+from conversation_store import ConversationStore, SessionIndex
+from analytics_rollup import SQLiteRollup
+from local_answer_router import LocalAnswerRouter, load_training_examples
+
+try:
+    # Importing monitoring sends every stage timing to its chat_stage_duration_seconds histogram
+    from monitoring import get_metrics
+except ImportError:  # requirements-simple.txt leaves out the metrics stack; stages then only reach the slow-request log
+    get_metrics = None
 
 # Load environment variables
 load_dotenv()
@@ -22,30 +38,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger('chatbot')
 
-# Simple rate limiting using in-memory storage (for single instance)
-request_counts = {}
+# Sliding-window rate limiting; RATE_LIMIT_STORAGE (sqlite:///path or
+# redis://...) shares the limits between workers
 RATE_LIMIT_WINDOW = 60  # 1 minute
 RATE_LIMIT_MAX = 10     # 10 requests per minute
+rate_limiter = create_rate_limiter(
+    RATE_LIMIT_MAX,
+    RATE_LIMIT_WINDOW,
+    storage_url=os.getenv('RATE_LIMIT_STORAGE', 'memory://'),
+    max_keys=int(os.getenv('RATE_LIMIT_MAX_CLIENTS', '10000'))
+)
 
 def simple_rate_limit():
-    """Simple rate limiting implementation"""
-    client_ip = request.remote_addr
-    current_time = time.time()
-    
-    # Clean old entries
-    cutoff_time = current_time - RATE_LIMIT_WINDOW
-    request_counts[client_ip] = [t for t in request_counts.get(client_ip, []) if t > cutoff_time]
-    
-    # Check if rate limit exceeded
-    if len(request_counts.get(client_ip, [])) >= RATE_LIMIT_MAX:
-        return True
-    
-    # Add current request
-    if client_ip not in request_counts:
-        request_counts[client_ip] = []
-    request_counts[client_ip].append(current_time)
-    
-    return False
+    """Return True when the client has exceeded the rate limit"""
+    return not rate_limiter.allow(request.remote_addr)
 
 # Mock responses for 3MTT organization
 MOCK_RESPONSES = {
@@ -62,124 +68,65 @@ MOCK_RESPONSES = {
     "default": "Hello! Welcome to 3MTT support. How can I help you today? You can ask about dashboard scores, program timeline, course changes, assessments, or general support."
 }
 
-def contains_malicious_content(text):
-    """Check for potentially malicious content"""
-    malicious_patterns = [
-        r'<script[^>]*>.*?</script>',  # Script tags
-        r'javascript:',                # JavaScript URLs
-        r'on\w+\s*=',                 # Event handlers
-        r'<iframe[^>]*>',             # Iframes
-        r'<object[^>]*>',             # Objects
-        r'<embed[^>]*>',              # Embeds
-    ]
-    
-    text_lower = text.lower()
-    for pattern in malicious_patterns:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return True
-    return False
+# Keywords for each mock response, checked in priority order
+MOCK_INTENTS = IntentMatcher({
+    "dashboard_scores": ["dashboard", "score", "darey", "sync", "different"],
+    "change_course": ["change", "course", "location"],
+    "onboarding_wait": ["onboard", "waiting", "wait"],
+    "entry_assessment": ["assessment", "entry", "test", "exam"],
+    "financial_support": ["financial", "transport", "meal", "money"],
+    "physical_attendance": ["physical", "attendance", "mandatory", "person"],
+    "learning_community": ["community", "learning"],
+    "program_end": ["end", "finish", "cohort", "program", "when"],
+    "office hours": ["hour", "times", "open", "close"],
+    "contact": ["contact", "phone", "email", "support"]
+}, exclusions={"change_course": ["end", "finish"]})
+
+# Parsed once per process and reloaded only when the file changes
+knowledge_store = KnowledgeStore('knowledge_base.json')
+
+# Append-only conversation log (imports conversations.json on first write)
+conversation_store = ConversationStore(
+    os.getenv('CONVERSATION_LOG', 'conversations.jsonl'),
+    legacy_path='conversations.json',
+    max_bytes=int(os.getenv('CONVERSATION_LOG_MAX_MB', '50')) * 1024 * 1024,
+    session_index=SessionIndex(os.getenv('CONVERSATION_INDEX', 'conversations.index.db'))
+)
+
+# Running analytics totals, updated on every saved conversation
+analytics_rollup = SQLiteRollup(os.getenv('ANALYTICS_DB', 'analytics.db'))
+
+def get_analytics_rollup():
+    """Return the analytics rollup, backfilled from the conversation log on first use"""
+    if not analytics_rollup.is_built():
+        with conversation_store.locked():
+            if not analytics_rollup.is_built():
+                analytics_rollup.rebuild(conversation_store.read_all())
+    return analytics_rollup
 
 def load_knowledge_base():
-    """Load knowledge base from JSON file"""
-    try:
-        with open('knowledge_base.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        logger.warning("Knowledge base file not found. Using basic knowledge.")
-        return {}
-    except json.JSONDecodeError as e:
-        logger.error(f"Knowledge base JSON decode error: {e}")
-        return {}
-
-def flatten_dict_value(value, key_context=""):
-    """Flatten dictionary values for better searching"""
-    if isinstance(value, dict):
-        result = []
-        for k, v in value.items():
-            if isinstance(v, str):
-                result.append(f"{k}: {v}")
-            elif isinstance(v, list):
-                result.append(f"{k}: {', '.join(str(item) for item in v)}")
-            else:
-                result.append(f"{k}: {str(v)}")
-        return "; ".join(result)
-    elif isinstance(value, list):
-        return ", ".join(str(item) for item in value)
-    else:
-        return str(value)
+    """Return the in-memory knowledge base, reloading it if the file changed"""
+    return knowledge_store.get()
+
+# Search index for knowledge bases that did not come from knowledge_store
+knowledge_index = None
+
+def get_knowledge_index(knowledge_base):
+    """Return the search index for knowledge_base, rebuilding it only when the content changes"""
+    global knowledge_index
+    snapshot = knowledge_store.snapshot
+    if snapshot.knowledge_base is knowledge_base:
+        return snapshot.index
+    
+    index = knowledge_index
+    if index is None or (index.knowledge_base is not knowledge_base and index.knowledge_base != knowledge_base):
+        index = BM25FIndex(knowledge_base)
+        knowledge_index = index
+    return index
 
 def search_knowledge_base(query, knowledge_base):
-    """Search knowledge base for relevant information with better matching"""
-    query_lower = query.lower()
-    query_words = [word.strip() for word in query_lower.split() if len(word.strip()) > 2]
-    
-    # Define specific keyword mappings for better matching
-    keyword_mappings = {
-        'dashboard': ['dashboard', 'score', 'sync', 'darey', 'different'],
-        'course': ['course', 'track', 'change', 'switch', 'program'],
-        'assessment': ['assessment', 'test', 'exam', 'evaluation', 'entry'],
-        'financial': ['financial', 'cost', 'fee', 'money', 'payment', 'support'],
-        'timeline': ['end', 'finish', 'when', 'date', 'timeline', 'cohort'],
-        'community': ['community', 'learning', 'group', 'assigned'],
-        'support': ['support', 'help', 'contact', 'assistance', 'hours'],
-        'onboarding': ['onboard', 'wait', 'waiting', 'start'],
-        'platform': ['platform', 'portal', 'login', 'access']
-    }
-    
-    # Score each section based on relevance
-    section_scores = {}
-    
-    for section, content in knowledge_base.items():
-        score = 0
-        matched_content = []
-        
-        if isinstance(content, dict):
-            for key, value in content.items():
-                key_lower = key.lower()
-                
-                # Flatten complex values for better searching
-                flattened_value = flatten_dict_value(value, key)
-                value_str = flattened_value.lower()
-                
-                # Direct word matching
-                for word in query_words:
-                    if word in key_lower or word in value_str:
-                        score += 2
-                        content_key = f"{section}.{key}"
-                        if content_key not in [item.split(': ')[0] for item in matched_content]:
-                            # Use original value for display, not flattened
-                            if isinstance(value, str):
-                                matched_content.append(f"{content_key}: {value}")
-                            else:
-                                matched_content.append(f"{content_key}: {flattened_value}")
-                
-                # Keyword category matching
-                for category, keywords in keyword_mappings.items():
-                    if any(kw in query_lower for kw in keywords):
-                        if any(kw in key_lower or kw in value_str for kw in keywords):
-                            score += 3
-                            content_key = f"{section}.{key}"
-                            if content_key not in [item.split(': ')[0] for item in matched_content]:
-                                if isinstance(value, str):
-                                    matched_content.append(f"{content_key}: {value}")
-                                else:
-                                    matched_content.append(f"{content_key}: {flattened_value}")
-        
-        if score > 0:
-            section_scores[section] = {'score': score, 'content': matched_content}
-    
-    # Return most relevant content
-    if not section_scores:
-        return []
-    
-    # Sort by score and return top matches
-    sorted_sections = sorted(section_scores.items(), key=lambda x: x[1]['score'], reverse=True)
-    relevant_info = []
-    
-    for section, data in sorted_sections[:2]:  # Top 2 sections
-        relevant_info.extend(data['content'][:2])  # Top 2 items per section
-    
-    return relevant_info[:3]  # Maximum 3 items total
+    """Top knowledge base items for query, ranked by BM25F"""
+    return get_knowledge_index(knowledge_base).search(query)
 
 def get_ai_response(message, conversation_history=None):
     """Get response from OpenAI API with knowledge base context"""
@@ -190,25 +137,51 @@ def get_ai_response(message, conversation_history=None):
             logger.info("No OpenAI API key found. Using enhanced mock responses.")
             return get_enhanced_mock_response(message)
         
-        client = openai.OpenAI(api_key=api_key)
-        
         # Load knowledge base
-        knowledge_base = load_knowledge_base()
-        relevant_info = search_knowledge_base(message, knowledge_base)
+        with stage('knowledge_search'):
+            knowledge_base = load_knowledge_base()
+            relevant_info = search_knowledge_base(message, knowledge_base)
+        
+        # Confident local answers skip the provider entirely
+        with stage('local_route'):
+            local_answer = get_local_answer(message, relevant_info, knowledge_base)
+        if local_answer:
+            return local_answer
+        
+        client = openai.OpenAI(api_key=api_key)
         
-        # Build enhanced system prompt with knowledge base
-        knowledge_context = ""
-        if relevant_info:
-            # Extract clean information from search results
-            clean_info = []
-            for info in relevant_info:
-                if ': ' in info:
-                    clean_info.append(info.split(': ', 1)[1])
-                else:
-                    clean_info.append(info)
-            knowledge_context = "\n".join(f"- {info}" for info in clean_info)
+        with stage('prompt_build'):
+            messages = build_chat_messages(message, relevant_info, conversation_history)
         
-        system_content = f"""You are a friendly and knowledgeable customer support assistant for 3MTT (3 Million Technical Talent), Nigeria's flagship technical skills development program.
+        with stage('provider'):
+            provider_start = time.perf_counter()
+            response = client.chat.completions.create(
+                model=os.getenv('AI_MODEL', 'gpt-4'),
+                messages=messages,
+                max_tokens=int(os.getenv('MAX_TOKENS', '300')),
+                temperature=float(os.getenv('TEMPERATURE', '0.7'))
+            )
+            get_local_answer_router().record_provider_call(time.perf_counter() - provider_start)
+        return response.choices[0].message.content
+    except Exception as e:
+        logger.error(f"AI Error: {e}")
+        return get_enhanced_mock_response(message)
+
+def build_chat_messages(message, relevant_info, conversation_history=None):
+    """Build the system prompt from the knowledge base matches, plus recent history"""
+    # Build enhanced system prompt with knowledge base
+    knowledge_context = ""
+    if relevant_info:
+        # Extract clean information from search results
+        clean_info = []
+        for info in relevant_info:
+            if ': ' in info:
+                clean_info.append(info.split(': ', 1)[1])
+            else:
+                clean_info.append(info)
+        knowledge_context = "\n".join(f"- {info}" for info in clean_info)
+    
+    system_content = f"""You are a friendly and knowledgeable customer support assistant for 3MTT (3 Million Technical Talent), Nigeria's flagship technical skills development program.
 
 ABOUT 3MTT:
 3MTT is part of Nigeria's Renewed Hope agenda, aimed at building the country's technical talent backbone to power the digital economy. The program has trained 30,000 fellows in Phase 1 (launched December 2023) and plans to train 270,000 more in Phase 2 across three cohorts.
@@ -224,665 +197,669 @@ INSTRUCTIONS:
 - Keep responses natural and human-like, not robotic
 - Don't just list facts - explain them in context"""
 
-        messages = [{"role": "system", "content": system_content}]
-        
-        # Add recent conversation history for context
-        if conversation_history:
-            for conv in conversation_history[-5:]:  # Last 5 exchanges
-                messages.append({"role": "user", "content": conv.get("user_message", "")})
-                messages.append({"role": "assistant", "content": conv.get("bot_response", "")})
-        
-        messages.append({"role": "user", "content": message})
-        
-        response = client.chat.completions.create(
-            model=os.getenv('AI_MODEL', 'gpt-4'),
-            messages=messages,
-            max_tokens=int(os.getenv('MAX_TOKENS', '300')),
-            temperature=float(os.getenv('TEMPERATURE', '0.7'))
+    messages = [{"role": "system", "content": system_content}]
+    
+    # Add recent conversation history for context
+    if conversation_history:
+        for conv in conversation_history[-5:]:  # Last 5 exchanges
+            messages.append({"role": "user", "content": conv.get("user_message", "")})
+            messages.append({"role": "assistant", "content": conv.get("bot_response", "")})
+    
+    messages.append({"role": "user", "content": message})
+    return messages
+
+# Response templates for different intents, in priority order for ties
+RESPONSE_TEMPLATES = {
+    'program_overview': {
+        'keywords': ['what is 3mtt', 'about 3mtt', 'tell me about', 'program overview', 'what is the program'],
+        'sections': ['3mtt_program'],
+        'response': lambda kb: f"{kb['3mtt_program']['overview']} The program is part of Nigeria's Renewed Hope agenda and aims to train technical talent across multiple phases. Phase 1 launched in December 2023 with 30,000 fellows, while Phase 2 will train 270,000 more technical talents."
+    },
+    'dashboard_issues': {
+        'keywords': ['dashboard', 'score', 'sync', 'different', 'darey'],
+        'sections': ['platform'],
+        'response': lambda kb: f"Don't worry about dashboard score differences - this is completely normal! {kb['platform']['dashboard_sync']} The system automatically updates, so just give it some time to sync properly."
+    },
+    'course_changes': {
+        'keywords': ['change course', 'switch course', 'course change', 'different course', 'can i switch', 'can i change'],
+        'sections': ['courses'],
+        'response': lambda kb: f"Yes, you can change your course, but timing matters! {kb['courses']['course_change_policy']} Also, {kb['courses']['location_change_policy']} So you have flexibility with location throughout the program."
+    },
+    'program_timeline': {
+        'keywords': ['when end', 'program end', 'cohort end', 'finish', 'timeline'],
+        'sections': ['3mtt_program'],
+        'response': lambda kb: f"Cohort 3 ends on July 20th, 2024. The overall program runs for 12 months with different phases, and we're currently in an active phase of the program."
+    },
+    'financial_support': {
+        'keywords': ['financial', 'money', 'cost', 'fee', 'payment', 'support'],
+        'sections': ['support'],
+        'response': lambda kb: f"Here's what's covered financially: {kb['support']['financial_support']} The program covers your training costs, which is the main expense, but you'll need to handle your own transportation and meals for in-person sessions."
+    },
+    'available_courses': {
+        'keywords': ['what courses', 'available tracks', 'course options', 'tracks available', 'what tracks', 'courses offer'],
+        'sections': ['courses'],
+        'response': lambda kb: f"We offer {len(kb['courses']['available_tracks'])} exciting tracks: {', '.join(kb['courses']['available_tracks'])}. Each track is designed to meet industry demands and help you build relevant skills for the digital economy."
+    },
+    'contact_support': {
+        'keywords': ['contact', 'support', 'help', 'assistance', 'reach out'],
+        'sections': ['support'],
+        'response': lambda kb: f"You can reach our support team through multiple channels: {', '.join(kb['support']['contact_methods'])}. Our office hours are {kb['support']['office_hours']}, and we're here to help with any 3MTT related questions!"
+    },
+    'onboarding_wait': {
+        'keywords': ['waiting', 'onboard', 'when start', 'access'],
+        'sections': ['onboarding'],
+        'response': lambda kb: f"While you're waiting for full onboarding, you're not left empty-handed! {kb['onboarding']['waiting_period']} This gives you a head start on learning and connecting with your peers."
+    },
+    'assessments': {
+        'keywords': ['assessment', 'test', 'exam', 'evaluation'],
+        'sections': ['assessments'],
+        'response': lambda kb: f"Yes, there will be assessments! {kb['assessments']['entry_assessment']['purpose']} and they happen {kb['assessments']['entry_assessment']['timing']}. Don't worry - they're designed to help place you in the right track for your skill level."
+    },
+    'technical_issues': {
+        'keywords': ['login', 'access', 'error', 'problem', 'trouble', 'issue', 'bug'],
+        'sections': ['support', 'technical_requirements', 'platform'],
+        'response': lambda kb: f"I understand you're having technical difficulties. For login and access issues, please ensure you have a stable internet connection and are using a modern web browser as required. If the problem persists, please contact our support team through {', '.join(kb['support']['contact_methods'])} during our office hours: {kb['support']['office_hours']}."
+    },
+    'learning_community': {
+        'keywords': ['community', 'group', 'peers', 'meetup', 'assigned'],
+        'sections': ['support', 'onboarding'],
+        'response': lambda kb: f"Great question about learning communities! {kb['support']['learning_communities']} {kb['onboarding']['community_assignment']} This helps you connect with fellow learners in your area for collaboration and support."
+    },
+    'program_phases': {
+        'keywords': ['phase 1', 'phase 2', 'phases', 'cohort', 'fellows'],
+        'sections': ['3mtt_program'],
+        'response': lambda kb: f"The 3MTT program has multiple phases: Phase 1 launched in December 2023 with {kb['3mtt_program']['phase_1']['fellows_count']} and included {kb['3mtt_program']['phase_1']['training_approach']}. Phase 2 will be even bigger, targeting {kb['3mtt_program']['phase_2']['target']} in {kb['3mtt_program']['phase_2']['structure']}."
+    }
+}
+
+# Compiled once: one pass over the message finds every template keyword
+INTELLIGENT_INTENTS = IntentMatcher({intent: template['keywords'] for intent, template in RESPONSE_TEMPLATES.items()})
+
+# Built on first use, after RESPONSE_TEMPLATES and the training data are available
+local_answer_router = None
+
+def get_local_answer_router():
+    """Return the router that decides which messages skip the provider"""
+    global local_answer_router
+    if local_answer_router is None:
+        local_answer_router = LocalAnswerRouter(
+            load_training_examples('training_data.json'),
+            INTELLIGENT_INTENTS,
+            {intent: template['sections'] for intent, template in RESPONSE_TEMPLATES.items()},
+            threshold=float(os.getenv('LOCAL_ANSWER_THRESHOLD', '0.8'))
         )
-        return response.choices[0].message.content
-    except Exception as e:
-        logger.error(f"AI Error: {e}")
-        return get_enhanced_mock_response(message)
+    return local_answer_router
+
+def get_local_answer(message, relevant_info, knowledge_base):
+    """Answer from training data or a response template when the router is confident enough"""
+    def render(intent):
+        try:
+            return RESPONSE_TEMPLATES[intent]['response'](knowledge_base)
+        except KeyError as e:
+            logger.error(f"Missing knowledge base key: {e}")
+            return None
+    
+    candidate = get_local_answer_router().route(message, relevant_info, render)
+    return candidate.answer if candidate else None
 
 def create_intelligent_response(message, knowledge_base):
     """Create intelligent, contextual responses based on user intent"""
-    message_lower = message.lower()
+    best_match = INTELLIGENT_INTENTS.best(message)
     
-    # Define response templates for different intents
-    response_templates = {
-        'program_overview': {
-            'keywords': ['what is 3mtt', 'about 3mtt', 'tell me about', 'program overview', 'what is the program'],
-            'response': lambda kb: f"{kb['3mtt_program']['overview']} The program is part of Nigeria's Renewed Hope agenda and aims to train technical talent across multiple phases. Phase 1 launched in December 2023 with 30,000 fellows, while Phase 2 will train 270,000 more technical talents."
-        },
-        'dashboard_issues': {
-            'keywords': ['dashboard', 'score', 'sync', 'different', 'darey'],
-            'response': lambda kb: f"Don't worry about dashboard score differences - this is completely normal! {kb['platform']['dashboard_sync']} The system automatically updates, so just give it some time to sync properly."
-        },
-        'course_changes': {
-            'keywords': ['change course', 'switch course', 'course change', 'different course', 'can i switch', 'can i change'],
-            'response': lambda kb: f"Yes, you can change your course, but timing matters! {kb['courses']['course_change_policy']} Also, {kb['courses']['location_change_policy']} So you have flexibility with location throughout the program."
-        },
-        'program_timeline': {
-            'keywords': ['when end', 'program end', 'cohort end', 'finish', 'timeline'],
-            'response': lambda kb: f"Cohort 3 ends on July 20th, 2024. The overall program runs for 12 months with different phases, and we're currently in an active phase of the program."
-        },
-        'financial_support': {
-            'keywords': ['financial', 'money', 'cost', 'fee', 'payment', 'support'],
-            'response': lambda kb: f"Here's what's covered financially: {kb['support']['financial_support']} The program covers your training costs, which is the main expense, but you'll need to handle your own transportation and meals for in-person sessions."
-        },
-        'available_courses': {
-            'keywords': ['what courses', 'available tracks', 'course options', 'tracks available', 'what tracks', 'courses offer'],
-            'response': lambda kb: f"We offer {len(kb['courses']['available_tracks'])} exciting tracks: {', '.join(kb['courses']['available_tracks'])}. Each track is designed to meet industry demands and help you build relevant skills for the digital economy."
-        },
-        'contact_support': {
-            'keywords': ['contact', 'support', 'help', 'assistance', 'reach out'],
-            'response': lambda kb: f"You can reach our support team through multiple channels: {', '.join(kb['support']['contact_methods'])}. Our office hours are {kb['support']['office_hours']}, and we're here to help with any 3MTT related questions!"
-        },
-        'onboarding_wait': {
-            'keywords': ['waiting', 'onboard', 'when start', 'access'],
-            'response': lambda kb: f"While you're waiting for full onboarding, you're not left empty-handed! {kb['onboarding']['waiting_period']} This gives you a head start on learning and connecting with your peers."
-        },
-        'assessments': {
-            'keywords': ['assessment', 'test', 'exam', 'evaluation'],
-            'response': lambda kb: f"Yes, there will be assessments! {kb['assessments']['entry_assessment']['purpose']} and they happen {kb['assessments']['entry_assessment']['timing']}. Don't worry - they're designed to help place you in the right track for your skill level."
-        },
-        'technical_issues': {
-            'keywords': ['login', 'access', 'error', 'problem', 'trouble', 'issue', 'bug'],
-            'response': lambda kb: f"I understand you're having technical difficulties. For login and access issues, please ensure you have a stable internet connection and are using a modern web browser as required. If the problem persists, please contact our support team through {', '.join(kb['support']['contact_methods'])} during our office hours: {kb['support']['office_hours']}."
-        },
-        'learning_community': {
-            'keywords': ['community', 'group', 'peers', 'meetup', 'assigned'],
-            'response': lambda kb: f"Great question about learning communities! {kb['support']['learning_communities']} {kb['onboarding']['community_assignment']} This helps you connect with fellow learners in your area for collaboration and support."
-        },
-        'program_phases': {
-            'keywords': ['phase 1', 'phase 2', 'phases', 'cohort', 'fellows'],
-            'response': lambda kb: f"The 3MTT program has multiple phases: Phase 1 launched in December 2023 with {kb['3mtt_progrt)rt=por0', po.0.ost='0.0g=False, hburun(de   app.
- ', 5002))RTon.get('POos.envirint(t = _':
-    por__main__name__ == '
-
-if _ics_html)tring(analytr_template_seturn rende  r
-  ''html>
-    'ody>
-    </
-    </b/p>><to Chat</a">← Back ef="/   <p><a hr   
-           </div>
- v>
-       </di     }
-      :]])ations[-10 conversr conv in/p><hr>" fo]}...< '')[:100response',get('bot_conv.</strong> {Bot:rong>stp><..</p><}.100]age', '')[:t('user_messg> {conv.ge/strontrong>User:<n([f"<p><s   {"".joi     >
-        "ing: 10px; #ddd; padd 1px solid; border:olly: screrflow-px; ovht: 300-heige="max<div styl      /h3>
-      nversations<cent Co>Re        <h3ic">
-    "metrdiv class=
-        < v>
-       /di
-        </p>ative']}<counts['negntiment_{seative: Neg} | tral']['neunts_cou {sentimenttral:eu| Nitive']} 'poscounts[iment_sent {ositive:     <p>P       ution</h3>
-t Distribtimen3>Sen          <h  ic">
-"metrclass=div 
-        <      
-       </div>   ions)}</p>
-ique_sessen(un>{l         <p3>
-   /hsions<ue Ses  <h3>Uniq       ">
-   s="metricas <div cl   
-                </div>
-/p>
-    tions}<sal_converp>{tota  <      </h3>
-    ationsl Conversota>T      <h3    >
-  "metric" class=    <div  
-    >
-      h1tics</hatbot Analy>3MTT C    <h1dy>
+    # Generate response based on best match
+    if best_match:
+        try:
+            return RESPONSE_TEMPLATES[best_match]['response'](knowledge_base)
+        except KeyError as e:
+            logger.error(f"Missing knowledge base key: {e}")
+            return get_mock_response(message)
     
-    <bo/head> <e>
-   /styl       <7bff; }}
- or: #00t: bold; colghwei24px; font-ont-size: argin: 0; f{ m { .metric p   
-         #333; }}lor:; copx 0 10: 0 0rginh3 {{ maetric       .m}
-      dius: 5px; }0; border-rapx  10 margin:ding: 15px; pad5f5f5;ground: #f {{ backicetr         .m  }}
- ing: 20px; o; padd aut0px: 50px; margindth: 80f; max-wins-serial, saamily: Arifont-f{    body {          <style>
-       </title>
-alyticst AnboT Chat <title>3MT
-       <head>>
-    
-    <htmlYPE html>
-    <!DOCT'' f'ytics_html =al 
-    ans"))
-   "anonymou on_id",sessi("(conv.getns.add_sessio unique       1
- tral")] +=, "neut"entimen("sv.getnts[connt_couentime      sons:
-  nversatiin co   for conv 
+    # Fallback to original mock responses
+    return get_mock_response(message)
+
+def get_enhanced_mock_response(message):
+    """Enhanced mock response with intelligent, contextual responses"""
+    knowledge_base = load_knowledge_base()
     
- ns = set()ique_sessio    un": 0}
-al 0, "neutrve": 0, "negatisitive":unts = {"poentiment_co
-    sersations)n(conv letions =ersaal_convot  t
-  nalytics  # Basic a
-  
-    ons = []onversati       cror:
- NDecodeErJSOpt json.exce
-    ions = []  conversat     dError:
- NotFouncept File ex   (f)
-adjson.lons = nversatioco          
-   'r') as f:ns.json',onversatioopen('c  with      
- try:"""
-    yticsn analversatioard for conshboda""Admin  "   ics():
- analyt
-def)/analytics'ute('/admin)
-
-@app.roessfully'}d succck collecteeedbassage': 'F 'mecess': True,sucy({'sonifrn jretu     
-  : {e}")
- ve feedback to saled(f"Fair.error       logge e:
- xception as except E  
- dent=2), f, inining_datason.dump(tra         j
-   w') as f:', 'ata.json('training_dwith open      
-  try:   
- )
-    end(feedbacka"].appfeedback_dating_data[" train
+    if knowledge_base:
+        return create_intelligent_response(message, knowledge_base)
+    else:
+        return get_mock_response(message)
+
+def get_mock_response(message):
+    """Return appropriate mock response based on message content"""
+    return MOCK_RESPONSES[MOCK_INTENTS.first(message, default="default")]
+
+# Sentiment lexicon, compiled once
+sentiment_analyzer = SentimentAnalyzer(CONVERSATION_LOG_POSITIVE_WORDS, CONVERSATION_LOG_NEGATIVE_WORDS)
+
+def analyze_sentiment(message):
+    """Basic sentiment analysis"""
+    return sentiment_analyzer.analyze(message)
+
+def get_conversation_history(session_id, limit=5):
+    """Return the last turns of one session for conversation context"""
+    return conversation_store.history(session_id or "anonymous", limit)
+
+def save_conversation(user_message, bot_response, session_id=None):
+    """Append conversation to the conversation log with enhanced metadata"""
+    with stage('sentiment'):
+        sentiment = analyze_sentiment(user_message)
     
-    []}gestions":_sugimprovement" [], ":dback_data[], "feees": xamplning_erai= {"tdata   training_or:
-      codeErrSONDept json.J exce
-   s": []}t_suggestion"improvemena": [], eedback_dat": [], "fesng_examplraini = {"tning_data     trai
-   oundError: FileNotF  except(f)
-  = json.loadta ning_da  trai      
-    :, 'r') as fata.json'ining_dpen('tra     with o     try:
-     
- )
+    conversation = {
+        "timestamp": datetime.now().isoformat(),
+        "session_id": session_id or "anonymous",
+        "user_message": user_message,
+        "bot_response": bot_response,
+        "sentiment": sentiment,
+        "message_length": len(user_message)
     }
- Trueelpful',t('h data.gelpful":        "hext', ''),
-back_teeedt('f data.ge_text":ck   "feedba    stars
-  ng'),  # 1-5.get('ratig": data     "ratin,
-   ')ponset('bot_res": data.gesespon "bot_re      ssage'),
- r_meata.get('usessage": der_me   "us
-     ssage_id'),ata.get('meid": d"message_        id'),
-et('session_ta.gd": da"session_i       
- oformat(),me.now().istetistamp": da     "time
-   ack = {dbfeeon()
-    t_jsst.ge = reque   data"""
- n responsesback ofeedt user lec"Col
-    ""):back(llect_feedT'])
-def coethods=['POSk', m/feedbacte('pp.rou@a)
-
-esults}': rults'ressonify({urn j
-    retase)wledge_by, knoe_base(querh_knowledgults = searc
-    resbase()wledge_no load_kbase =edge_ knowl')
-   uery', '.get('q = data    queryson()
-est.get_ja = requ
-    datrch"""e base seaest knowledg   """Tsearch():
-  test_OST'])
-defhods=['P, metch'test-sear/admin/oute('pp.rl)
-
-@atmdge_hnowle(kte_stringtemplaender_ r
-    returnl>
-    ''' </htm
-     </body>pt>
-        </scri  }}
-            });
-       }      '');
-   /p>').join(• ' + r + '<<p>(r => 'lts.mapesu   data.r                   ' + 
-  sults:</h4>Reearch h4>S       '<         
-         erHTML =lts').innresu('search-IdementByment.getEl    docu               
- a => {{  .then(dat             
- se.json())se => responen(respon        .th       
-          }})  })
-     ry: query }ngify({{ queON.striody: JS           b        ' }},
- sonplication/j'apent-Type': s: {{ 'Contader        he          POST',
-   'ethod:     m         
-      earch', {{in/test-stch('/adm          fe;
-      aluequery').vt-entById('teslemument.getE query = docnst     co           ) {{
-t(on searchTes functi            
-   }}
-                    }}
-               sage);
- e.mesrmat: ' + ON foJSid lert('Inval        a          ) {{
-  ch (e     }} cat          }});
-                    eload();
- cation.ress) loata.succ(dif                        ge);
- a.messaalert(dat                        => {{
-n(data he        .t           
- son())sponse.je => responsn(re       .the         
-             }})          sed)
- ar.stringify(pbody: JSON                  
-      /json' }},on'applicatit-Type': onteners: {{ 'C   head               ,
-      POST': '  method                      {{
- ge',ledowadmin/knfetch('/                  );
-  knowledgeN.parse( = JSOrsednst pa       co              try {{
-             e;
-  tor').valuowledge-ediknId('ElementBydocument.getwledge = nst kno    co            ) {{
-edge(Knowlten upda   functio
-          <script>
-       
-v>      </di/div>
-  ;"><olid #dddpx sr: 1bordewhite; ound: ckgr; bapxadding: 10 pp: 10px;="margin-tolts" styleh-resu"searc   <div id=
-         on>earch</butt">STest()ick="searchclutton on     <b  x;">
-     10pding: padidth: 70%; le="wry..." styer test que="Enteholderplact-query" " id="tes"textype=ut t<inp            3>
-arch</hge Sest Knowled   <h3>Te       tion">
-  ="sec <div class 
-       v>
-            </di
-   h</button>e Searcst Knowledg)">TestKnowledge(ick="te oncltton        <bu   on>
- Base</buttedge  Knowldate">Upe()edgateKnowl"updick=on onclbutt   <    br>
-          <   rea>
-    extadent=2)}</t, inbasee_ps(knowledg">{json.dumditorledge-eow="kna id   <textare    
-     3>edge Base</h Knowl3>Current<h        
-    ">sectionass="div cl  <   
-        </h1>
-   e Managementowledge Bas     <h1>Kn      
-   
-  >    </div</a>
-    owledge Base>Knknowledge"n/ef="/admi hr    <a      a>
-  >Analytics<//analytics"/admin"ef=hra            <t</a>
-  Cha"/">← href=        <a   v">
- ass="na<div cl
-            <body>  </head>
-
-     </style>
-     bff; }}olor: #007e; ction: nontext-decoraht: 15px; in-rig {{ marg    .nav a}}
-        px; m: 20gin-bottoav {{ mar      .n       5px; }}
-rgin:ter; maincursor: ponone;  border: olor: white;f; c#007bf: colorround-ackg0px; bpx 2g: 10 {{ paddin     button }}
-       monospace;t-family: 0px; fon 40t:%; heighh: 100a {{ widt textare        }}
-    x;radius: 5prder-bo 0; argin: 10px 15px; mdding: #f5f5f5; pakground:tion {{ bac    .sec}
-        ing: 20px; }to; padd aumargin: 50px00px; x-width: 10 ma-serif;ial, sansily: Ar-famy {{ font bod        style>
-     <      itle>
-gement</tManawledge Base tle>3MTT Kno  <ti  d>
-    hea
-    <
-    <html>CTYPE html>DO
-    <!ml = f'''dge_ht knowle   
-   e_base()
- nowledg= load_kse owledge_ba   knse
- wledge banod current koa
-    # L tr(e)})
-   ': ssage False, 'mesccess':onify({'su  return js          s e:
-on aept Excepti   exc})
-     uccessfully'dated sbase upedge age': 'KnowlmessTrue, 's': cces{'sunify(jsoeturn         rt=2)
-    e, f, indenew_knowledgdump(njson.           f:
-      'w') asase.json', ge_bpen('knowled  with o
-            try:  
-    json()quest.get_= reedge    new_knowl
-     basewledge # Update kno  ':
-      od == 'POSTst.methf reque"""
-    iedge baseknowl managing terface for""Admin in
-    "owledge():anage_kn])
-def mET', 'POST'ethods=['Gedge', mnowl/admin/k@app.route(' 500
-
-n.'}),ase try agaiccurred. Pleror oerxpected : 'An uney({'error'eturn jsonif  rdr})
-      te_ad.remodr': requeste_ade), 'remot': str(ror, extra={'erpoint"in chat endted error ("Unexpecerrorgger.   loe:
-     on as tit Excepexcep       
-      })
- 
-  uid4())tr(uuid.ud': sage_i 'mess    
-       _id'],on['sessionessi: sid''session_            _response,
-otsponse': b        're    onify({
-rn jsetu     r
-   
-        
-        )         }me
-   tisponse_e': rese_tim 'respon             ),
-  bot_response: len(gth'se_len   'respon             ssage),
- len(user_meength':essage_l      'm          sion_id'],
-ession['ses s_id':on'sessi                ,
-'unknown')uest_id', reqr(g, 'getattd': _iquest       're
-         extra={    ,
-        ed"letion compnteract iat "Ch
-           gger.info(lo
-        rt_timeime() - sta= time.te_time ons       respaction
-  chat inter successful      # Log          
-sation
- the convern't saveif we cae request il thfa't        # Don)
-     e)}: str(={'error'", extraversationoned to save crror("Fail   logger.e         s e:
-n apt Exceptio     exce
-   ession_id']) session['snse,pores bot_message,user_rsation(veone_c       sav   try:
-  
-        ingracksession tion with onversat c # Save       
-  4())
-      id.uuidr(uu'] = stion_idn['sess    sessio        session:
-id' not in ession_   if 's ID
-     essionor create s     # Get        
-   
- moment."again in a ease try ght now. Plquest ri your re processingving troublery, I'm ha soronse = "I'mot_resp          b
-  0]})[:10er_messagessage': us str(e), 'merror':, extra={'eiled"sponse fa reor("AIer.err    logg      e:
-  tion as pt Excepexce      
-  istory)_hnversation coessage,onse(user_m_ai_respgetnse = respo        bot_  :
-        trycontext
-  se with I respon AGet     #        
-    []
- on_history =rsati    conve        )
-tr(e)}rror': sxtra={'e", eations fileersrupted converror("Cor     logger.   
-     e:Error asDecodeon.JSONexcept js
-         []_history =conversation    
-        r:NotFoundErropt File    exce)
-    ad(fson.lo= jhistory ersation_    conv           ') as f:
- n', 'rs.jsonversationopen('co     with :
-             try
-  ntext for cotion historyd conversa      # Loa    
-  400
-    ected'}), etid content dr': 'Invalnify({'erroreturn jso       dr})
-     st.remote_adque': rete_addremo], 'r[:100ssager_me usesage':ra={'mes, extd"tectecontent decious rning("Maliwa   logger.
-         ge):er_messat(usontenious_cins_malicconta  if     
-  ntents cofor maliciouy check urit   # Sec 
-         
-   e.strip())(user_messagescapetml.message = h user_      
- put inizeanit
-        # S     , 400
-   rs)'})haracte00 cax 10ong (m too lr': 'Messagerroonify({'e jsurnet r    })
-       .remote_addrr': requestemote_addge), 'ressan(user_mngth': le'le extra={oo long",ge t("Messaning.wargger         lo000:
-   ) > 1_messagef len(user      i      
-  , 400
-  ed'})ovido message pr 'Nor':nify({'errturn jso        ressage:
-    _meot user        if ntion
-idaInput val # 
-       
-        ge', '')messa('getage = data. user_mess         
-     '}), 400
- JSON 'Invalid error':sonify({' j    return      dr})
-  _adt.remoteddr': reques_aa={'remoted", extrJSON received ng("Invaliarniger.w   log
-         ot data:      if n
-  on()get_js = request.     data
-    9
-        42ent.'}),it a momse wasts. Pleay requer': 'Too man{'erronify( return jso  
-         ote_addr})emest.requaddr': r{'remote_ed", extra=eedt excRate limi.warning("      logger:
-      mit()te_lif simple_ra   i   k
-  checimiting mple rate l# Siy:
-          tr()
     
-   time.time_time =start""
-    g"rind monito anith securityt messages w"Handle cha""at():
+    try:
+        with stage('persist'):
+            rollup = get_analytics_rollup()  # Backfill before appending, so this turn is counted once
+            conversation_store.append(conversation)
+            rollup.add(conversation)
+    except Exception as e:
+        logger.error(f"Failed to save conversation: {e}")
+
+# Requests slower than this log a per-stage timing breakdown
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', '2.0'))
+
+@app.before_request
+def before_request():
+    """Track request start time and add request ID"""
+    start_request()
+    g.start_time = time.time()
+    g.request_id = f"{int(time.time())}-{id(request)}"
+    
+    logger.info(
+        "Request started",
+        extra={
+            'request_id': g.request_id,
+            'method': request.method,
+            'endpoint': request.endpoint,
+            'remote_addr': request.remote_addr,
+            'user_agent': request.headers.get('User-Agent', '')[:100]
+        }
     )
-def chST']ds=['POthoat', me/chp.route(')
 
-@aptmlng(hte_striender_templa    return r
-    '''
-</html>body>
+@app.after_request
+def after_request(response):
+    """Add security headers and log response"""
+    # Security headers
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['X-Frame-Options'] = 'DENY'
+    response.headers['X-XSS-Protection'] = '1; mode=block'
     
-    <//script>        <);
-alse, f today?'n I help yout. How caupporme to 3MTT s! Welcolloage('He     addMess    essage
-   lcome m// Add we             }
-
-     
-      age(); sendMesser')= 'Enty ==f (event.ke      i         ) {
- entyPress(evndleKeon hafuncti               }
-
-     ));
-    , falsen.' try agailease. Pongnt wrhing wemet'Sorry, soage(ess=> addMerror     .catch(           data))
- lse, fa, a.responsesage(dat addMes =>then(data       .         se.json())
-ponse => resn(respon      .the
-                  })       age })
- e: messagify({ mess.string JSONody:      b           n' },
-   json/atiopplicpe': 'aent-Ty{ 'Cont: headers           
-         d: 'POST',hoet        m            {
-/chat', h('       fetc         ';
-
- = 'input.value           ue);
-     ssage, trMessage(me        add
-
-        return;ge) essa  if (!m             im();
- value.tre = input.const messag             ut');
-   ssage-inpmentById('meetElent.g documeut = const inp             {
-   ndMessage()function se     
+    # Content Security Policy
+    response.headers['Content-Security-Policy'] = (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline'; "
+        "style-src 'self' 'unsafe-inline'; "
+        "img-src 'self' data:; "
+        "connect-src 'self'"
+    )
+    
+    # Log response
+    if hasattr(g, 'start_time'):
+        response_time = time.time() - g.start_time
+        logger.info(
+            "Request completed",
+            extra={
+                'request_id': getattr(g, 'request_id', 'unknown'),
+                'status_code': response.status_code,
+                'response_time': response_time,
+                'content_length': response.content_length
             }
-});
-                       }
-               
-     se);al fack! 🙏',r feedbu for younk yo'Thassage(      addMe             ss) {
-      (data.succe    if                
-n(data => {        .the)
-        n()jsoonse.=> respen(response      .th       })
-                  )
-      }            2
-     lpful ? 5 :ating: he     r                  elpful,
- : hpfulhel                       esponse,
- se: lastBotR bot_respon                
-       erMessage,: lastUsser_message          u             essageId,
- id: currentMage_ mess                   ,
-    onIdurrentSessision_id: ces         s          
-     ingify({dy: JSON.str          bo   
-       /json' },ontipplica: 'atent-Type' { 'Con    headers:           T',
-     method: 'POS               k', {
-     /feedbactch('     fe            
-              return;
-  ageId)rrentMess    if (!cu            ful) {
-helpFeedback(endnction s     fu  
-
-     }           
- t;eighrollHContainer.sc chatllTop =.scroontainer  chatC             ;
- essageDiv)hild(mndCiner.appentaatCo        ch
-                       }
-        }
-                         
-    d;.session_i messageDataonId =rentSessi        cur              e_id;
-  Data.messagessage msageId =entMes     curr                  a) {
- essageDat (m      if        age;
-      ss = meBotResponse       last   
-          ';'</div>                     +
-    tton>'l</buHelpfupx;">👎 Not : 3radiusrder-ointer; boursor: px; c10pdding: 5px : none; pahite; borderolor: w: #dc3545; croundtyle="backgse)" sback(fal="sendFeedlickutton onc '<b             
-          ton>' +l</butpfu">👍 Helius: 3px;er-rad; bordr: pointer5px; cursoight: n-rpx; margiding: 5px 10padone; r: nordewhite; b: 45; colorround: #28a7kgacstyle="btrue)" k("sendFeedbacick=utton oncl<b      '           
-       px;">' +n-top: 10argistyle="miv        '<d            + 
-      = messageinnerHTML ssageDiv.    me              else {
-              }     sage;
-age = messtUserMessla                sage;
-     mesontent =v.textC   messageDi        
-         (isUser) {        if      
-             
-      ' : 'bot');r ? 'user' + (isUseessage Name = 'mgeDiv.class    messa      
-      iv');('dElementate.cre documenteDiv =messag    const             r');
-t-containehayId('ctElementBment.geainer = docuhatCont  const c        {
-      ta = null)  messageDa, isUser,sage(messageddMes function a          '';
-
-  ponse =lastBotRes   let         age = '';
- stUserMess  let la    l;
-       nulId =entSessionet curr      l    l;
-  ageId = nulurrentMess       let cipt>
-      <scr      
-
- /div>
-        <n>tto)">Send</buendMessage(lick="soncutton" -bsendd="n i  <butto       
-   ">vent)Press(ehandleKeynkeypress="e..." or messag="Type you placeholder"e-input id="messagype="text"   <input t        er">
- put-contain"indiv id=       <>
- "></divntainerat-cod="ch     <div ih1>
-   t Chat</orupp  <h1>3MTT S  body>
-        <
-d>>
-    </heatyle       </ster; }
- cursor: poinone;  border: n: white;7bff; color: #00olornd-c backgrou0px 20px;dding: 1 paon {d-butt #sen     d; }
-       solid #dd 1px0px; border:ding: 1ex: 1; pad-input { fl #message          lex; }
- y: fispla{ dcontainer   #input-     
-      } #f5f5f5;round-color:t { backg  .bo
-          ight; }t-align: r2fd; texlor: #e3fd-cobackgrounser {          .ux; }
-   -radius: 5porder8px; bdding: 0px 0; pa: 1gine { mar.messag      }
-       0px;bottom: 1px; margin- padding: 10roll;rflow-y: sc400px; oveght: ; heisolid #dddder: 1px ainer { borchat-cont          #}
-  ding: 20px; px auto; padin: 50 marg 600px;dth:f; max-wi sans-seriily: Arial,fam{ font-  body         >
-  yle <st    e>
-   </titlport Chat>3MTT Supitle<t         <head>
- 
-  ml><ht  ml>
-  !DOCTYPE ht'''
-    < = "
-    html" interface"he chaterve t
-    """Sex(): ind)
-defp.route('/'aps_code
-
-@tatu, status)_sealthn jsonify(htur   relse 503
- thy' es'] == 'healatu'sttus[stalth_heaif code = 200    status_GB'
+        )
+        
+        if response_time >= SLOW_REQUEST_SECONDS:
+            logger.warning(
+                "Slow request",
+                extra={
+                    'request_id': getattr(g, 'request_id', 'unknown'),
+                    'endpoint': request.endpoint,
+                    'response_time': response_time,
+                    'stages_ms': stage_breakdown()
+                }
+            )
     
- b:.2f}e_gac_splthy: {free'heapace'] = fks']['disk_satus['chec health_stse:
-       '
-    el 'degradedtatus'] =atus['slth_st        hea
-2f}GB'e_space_gb:.w: {fre'] = f'lok_spacecks']['diss['chestatu  health_ 1:
-      ace_gb <ree_spif f3)
-    24**e / (10.fre= disk_usage_gb pace free_s)
-   usage('.'til.disk_ = shusk_usageil
-    dimport shutace
-    i disk spheck
-    # C'
-    nfigured = 'not_corvice']ks']['ai_seatus['checalth_sthe        
-se:  el
-  ed'nfigur] = 'coservice']['ai_ks'ec['chalth_status       hePI_KEY'):
- OPENAI_Aenv('etos.gif ervice
-    AI s Check 
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics endpoint, including per-stage chat timings"""
+    if get_metrics is None:
+        return jsonify({'error': 'Metrics need the packages in requirements.txt'}), 404
+    return get_metrics(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+@app.route('/health')
+def health_check():
+    """Health check endpoint for monitoring"""
+    health_status = {
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'version': '1.0.0',
+        'checks': {}
+    }
+    
+    # Check knowledge base
+    try:
+        with open('knowledge_base.json', 'r') as f:
+            json.load(f)
+        health_status['checks']['knowledge_base'] = 'healthy'
+    except Exception as e:
+        health_status['checks']['knowledge_base'] = f'unhealthy: {str(e)}'
+        health_status['status'] = 'degraded'
     
-    #ed'egrad = 'dtatus']s['stu health_sta     tr(e)}'
-  {shealthy: ] = f'unledge_base'']['knows['checksth_statu    healas e:
-     Exception xcept
-    ehy'ealt] = 'hedge_base'wlecks']['knochth_status['al       hed(f)
- oa json.l
-           r') as f:n', 'jsoe_base.owledgn('knwith ope        try:
-   ase
- wledge bheck kno# C   
+    # Check AI service
+    if os.getenv('OPENAI_API_KEY'):
+        health_status['checks']['ai_service'] = 'configured'
+    else:
+        health_status['checks']['ai_service'] = 'not_configured'
     
- }
-    }checks': {       ''1.0.0',
- ion': 'vers   (),
-     rmat.isofotetime.now()mp': daimesta
-        'ty',': 'healthtus  'sta      = {
- tatusealth_s    h""
-nitoring" for mopointndalth check e"""He):
-    ck( health_che
-deflth')te('/hea
-
-@app.rourn response
-    retu  )
-     }
-                gth
- content_lense. respon':thent_leng  'cont           _time,
-   sponseime': reponse_t       'res
-         tatus_code,se.s: responstatus_code'        '    wn'),
-    ', 'unkno'request_id getattr(g, _id':est       'requ{
-           extra=         ted",
- pleuest com"Req           er.info(
-         loggart_time
-me() - g.st.tiime_time = tresponse        time'):
-, 'start_attr(gf hasonse
-    i resp 
-    # Log)
-       'self'"
-ct-src     "conne  
-   data:; "c 'self'  "img-sr"
-      e'; -inlinelf' 'unsafesrc 's"style-       ; "
- line'afe-in'unsf' el-src 'sscript      "'; "
-  c 'self"default-sr     (
-    ] =y'Polic-Security-s['Contentersponse.head
-    rety Policyent Securiont
-    # C  '
-  ode=block '1; m =rotection']-Pders['X-XSSse.hearespon  = 'DENY'
-  s'] e-OptionFramrs['X-nse.headespoiff'
-    resn = 'no']ype-Optionstent-TConheaders['X-   response.eaders
- y h  # Securitse"""
-  og responders and leaty hsecuri """Add se):
-   t(responeser_requef aft_request
-dpp.after
-    )
+    # Check disk space
+    import shutil
+    disk_usage = shutil.disk_usage('.')
+    free_space_gb = disk_usage.free / (1024**3)
+    if free_space_gb < 1:
+        health_status['checks']['disk_space'] = f'low: {free_space_gb:.2f}GB'
+        health_status['status'] = 'degraded'
+    else:
+        health_status['checks']['disk_space'] = f'healthy: {free_space_gb:.2f}GB'
+    
+    status_code = 200 if health_status['status'] == 'healthy' else 503
+    return jsonify(health_status), status_code
+
+# Chat interface, rendered once and served as cached, precompressed bytes
+with app.app_context():
+    chat_page = StaticPage(render_template_string('''
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>3MTT Support Chat</title>
+        <style>
+            body { font-family: Arial, sans-serif; max-width: 600px; margin: 50px auto; padding: 20px; }
+            #chat-container { border: 1px solid #ddd; height: 400px; overflow-y: scroll; padding: 10px; margin-bottom: 10px; }
+            .message { margin: 10px 0; padding: 8px; border-radius: 5px; }
+            .user { background-color: #e3f2fd; text-align: right; }
+            .bot { background-color: #f5f5f5; }
+            #input-container { display: flex; }
+            #message-input { flex: 1; padding: 10px; border: 1px solid #ddd; }
+            #send-button { padding: 10px 20px; background-color: #007bff; color: white; border: none; cursor: pointer; }
+        </style>
+    </head>
+    <body>
+        <h1>3MTT Support Chat</h1>
+        <div id="chat-container"></div>
+        <div id="input-container">
+            <input type="text" id="message-input" placeholder="Type your message..." onkeypress="handleKeyPress(event)">
+            <button id="send-button" onclick="sendMessage()">Send</button>
+        </div>
+
+        <script>
+            let currentMessageId = null;
+            let currentSessionId = null;
+            let lastUserMessage = '';
+            let lastBotResponse = '';
+
+            function addMessage(message, isUser, messageData = null) {
+                const chatContainer = document.getElementById('chat-container');
+                const messageDiv = document.createElement('div');
+                messageDiv.className = 'message ' + (isUser ? 'user' : 'bot');
+                
+                if (isUser) {
+                    messageDiv.textContent = message;
+                    lastUserMessage = message;
+                } else {
+                    messageDiv.innerHTML = message + 
+                        '<div style="margin-top: 10px;">' +
+                        '<button onclick="sendFeedback(true)" style="background: #28a745; color: white; border: none; padding: 5px 10px; margin-right: 5px; cursor: pointer; border-radius: 3px;">👍 Helpful</button>' +
+                        '<button onclick="sendFeedback(false)" style="background: #dc3545; color: white; border: none; padding: 5px 10px; cursor: pointer; border-radius: 3px;">👎 Not Helpful</button>' +
+                        '</div>';
+                    lastBotResponse = message;
+                    if (messageData) {
+                        currentMessageId = messageData.message_id;
+                        currentSessionId = messageData.session_id;
+                    }
+                }
+                
+                chatContainer.appendChild(messageDiv);
+                chatContainer.scrollTop = chatContainer.scrollHeight;
+            }
+
+            function sendFeedback(helpful) {
+                if (!currentMessageId) return;
+                
+                fetch('/feedback', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({
+                        session_id: currentSessionId,
+                        message_id: currentMessageId,
+                        user_message: lastUserMessage,
+                        bot_response: lastBotResponse,
+                        helpful: helpful,
+                        rating: helpful ? 5 : 2
+                    })
+                })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        addMessage('Thank you for your feedback! 🙏', false);
+                    }
+                });
+            }
+
+            function sendMessage() {
+                const input = document.getElementById('message-input');
+                const message = input.value.trim();
+                if (!message) return;
+
+                addMessage(message, true);
+                input.value = '';
+
+                fetch('/chat', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ message: message })
+                })
+                .then(response => response.json())
+                .then(data => addMessage(data.response, false, data))
+                .catch(error => addMessage('Sorry, something went wrong. Please try again.', false));
+            }
+
+            function handleKeyPress(event) {
+                if (event.key === 'Enter') sendMessage();
+            }
 
-@a}       100]
- ', '')[:ntUser-Ageers.get('uest.headt': reqer_agen    'us      
-  ddr,remote_aquest._addr': remote    're,
-        .endpointequestpoint': r      'end     hod,
- uest.metmethod': req   '       d,
-  equest_i: g.ruest_id'  'req          xtra={
-,
-        etarted"st sque    "Refo(
-      logger.in   
-  est)}"
- d(requ)}-{itime.time()nt("{iuest_id = freq)
-    g.ime.time(ime = t g.start_t   """
-d request IDtime and adst start ck reque"Tra
-    ""():re_requestefoest
-def be_requapp.befor
-
-@")sation: {e}ave conver to siledr(f"Far.errologge   e:
-     as xception cept Eex    =2)
-s, f, indentconversationon.dump(         js   :
-as fn', 'w') .jsoonversationsopen('c      with y:
-     tron)
+            // Add welcome message
+            addMessage('Hello! Welcome to 3MTT support. How can I help you today?', false);
+        </script>
+    </body>
+    </html>
+    '''))
+
+@app.route('/')
+def index():
+    """Serve the chat interface"""
+    return chat_page.response(request)
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    """Handle chat messages with security and monitoring"""
+    start_time = time.time()
     
- nversatins.append(coersatioconv   
-    s = []
- tion   conversa)
-     "g freshstartin, ns.json filenversatiorrupted coerror("Co logger.     r:
-  roSONDecodeEr json.Jexcept
-    ations = [] convers:
-       ErrorileNotFoundt Fxcep
-    e(f) json.loadsations =   conver
-         s f:r') ans.json', 'nversatioopen('coth  wiry:
-         
-    t  
+    try:
+        # Simple rate limiting check
+        if simple_rate_limit():
+            logger.warning("Rate limit exceeded", extra={'remote_addr': request.remote_addr})
+            return jsonify({'error': 'Too many requests. Please wait a moment.'}), 429
+        
+        data = request.get_json()
+        if not data:
+            logger.warning("Invalid JSON received", extra={'remote_addr': request.remote_addr})
+            return jsonify({'error': 'Invalid JSON'}), 400
+        
+        user_message = data.get('message', '')
+        
+        # Input validation
+        if not user_message:
+            return jsonify({'error': 'No message provided'}), 400
+        
+        if len(user_message) > 1000:
+            logger.warning("Message too long", extra={'length': len(user_message), 'remote_addr': request.remote_addr})
+            return jsonify({'error': 'Message too long (max 1000 characters)'}), 400
+        
+        # Security check for malicious content (before escaping hides the markup)
+        if contains_malicious_content(user_message):
+            logger.warning("Malicious content detected", extra={'message': user_message[:100], 'remote_addr': request.remote_addr})
+            return jsonify({'error': 'Invalid content detected'}), 400
+        
+        # Sanitize input
+        user_message = html.escape(user_message.strip())
+        
+        # Get or create session ID
+        if 'session_id' not in session:
+            session['session_id'] = str(uuid.uuid4())
+        
+        # Load this session's history for context (get_ai_response uses the last 5)
+        try:
+            conversation_history = get_conversation_history(session['session_id'])
+        except Exception as e:
+            logger.error("Failed to load conversation history", extra={'error': str(e)})
+            conversation_history = []
+        
+        # Get AI response with context
+        try:
+            bot_response = get_ai_response(user_message, conversation_history)
+        except Exception as e:
+            logger.error("AI response failed", extra={'error': str(e), 'message': user_message[:100]})
+            bot_response = "I'm sorry, I'm having trouble processing your request right now. Please try again in a moment."
+        
+        # Save conversation with session tracking
+        try:
+            save_conversation(user_message, bot_response, session['session_id'])
+        except Exception as e:
+            logger.error("Failed to save conversation", extra={'error': str(e)})
+            # Don't fail the request if we can't save the conversation
+        
+        # Log successful chat interaction
+        response_time = time.time() - start_time
+        logger.info(
+            "Chat interaction completed",
+            extra={
+                'request_id': getattr(g, 'request_id', 'unknown'),
+                'session_id': session['session_id'],
+                'message_length': len(user_message),
+                'response_length': len(bot_response),
+                'response_time': response_time
+            }
+        )
+        
+        return jsonify({
+            'response': bot_response,
+            'session_id': session['session_id'],
+            'message_id': str(uuid.uuid4())
+        })
+    
+    except Exception as e:
+        logger.error("Unexpected error in chat endpoint", extra={'error': str(e), 'remote_addr': request.remote_addr})
+        return jsonify({'error': 'An unexpected error occurred. Please try again.'}), 500
+
+@app.route('/admin/knowledge', methods=['GET', 'POST'])
+def manage_knowledge():
+    """Admin interface for managing knowledge base"""
+    if request.method == 'POST':
+        # Update knowledge base
+        new_knowledge = request.get_json()
+        try:
+            knowledge_store.update(new_knowledge)
+            return jsonify({'success': True, 'message': 'Knowledge base updated successfully'})
+        except Exception as e:
+            return jsonify({'success': False, 'message': str(e)})
+    
+    # Load current knowledge base
+    knowledge_base = load_knowledge_base()
+    
+    knowledge_html = f'''
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>3MTT Knowledge Base Management</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; max-width: 1000px; margin: 50px auto; padding: 20px; }}
+            .section {{ background: #f5f5f5; padding: 15px; margin: 10px 0; border-radius: 5px; }}
+            textarea {{ width: 100%; height: 400px; font-family: monospace; }}
+            button {{ padding: 10px 20px; background-color: #007bff; color: white; border: none; cursor: pointer; margin: 5px; }}
+            .nav {{ margin-bottom: 20px; }}
+            .nav a {{ margin-right: 15px; text-decoration: none; color: #007bff; }}
+        </style>
+    </head>
+    <body>
+        <div class="nav">
+            <a href="/">← Chat</a>
+            <a href="/admin/analytics">Analytics</a>
+            <a href="/admin/knowledge">Knowledge Base</a>
+        </div>
+        
+        <h1>Knowledge Base Management</h1>
+        
+        <div class="section">
+            <h3>Current Knowledge Base</h3>
+            <textarea id="knowledge-editor">{json.dumps(knowledge_base, indent=2)}</textarea>
+            <br>
+            <button onclick="updateKnowledge()">Update Knowledge Base</button>
+            <button onclick="testKnowledge()">Test Knowledge Search</button>
+        </div>
+        
+        <div class="section">
+            <h3>Test Knowledge Search</h3>
+            <input type="text" id="test-query" placeholder="Enter test query..." style="width: 70%; padding: 10px;">
+            <button onclick="searchTest()">Search</button>
+            <div id="search-results" style="margin-top: 10px; padding: 10px; background: white; border: 1px solid #ddd;"></div>
+        </div>
+
+        <script>
+            function updateKnowledge() {{
+                const knowledge = document.getElementById('knowledge-editor').value;
+                try {{
+                    const parsed = JSON.parse(knowledge);
+                    fetch('/admin/knowledge', {{
+                        method: 'POST',
+                        headers: {{ 'Content-Type': 'application/json' }},
+                        body: JSON.stringify(parsed)
+                    }})
+                    .then(response => response.json())
+                    .then(data => {{
+                        alert(data.message);
+                        if (data.success) location.reload();
+                    }});
+                }} catch (e) {{
+                    alert('Invalid JSON format: ' + e.message);
+                }}
+            }}
+            
+            function searchTest() {{
+                const query = document.getElementById('test-query').value;
+                fetch('/admin/test-search', {{
+                    method: 'POST',
+                    headers: {{ 'Content-Type': 'application/json' }},
+                    body: JSON.stringify({{ query: query }})
+                }})
+                .then(response => response.json())
+                .then(data => {{
+                    document.getElementById('search-results').innerHTML = 
+                        '<h4>Search Results:</h4>' + 
+                        data.results.map(r => '<p>• ' + r + '</p>').join('');
+                }});
+            }}
+        </script>
+    </body>
+    </html>
+    '''
+    return render_template_string(knowledge_html)
+
+@app.route('/admin/test-search', methods=['POST'])
+def test_search():
+    """Test knowledge base search"""
+    data = request.get_json()
+    query = data.get('query', '')
+    knowledge_base = load_knowledge_base()
+    results = search_knowledge_base(query, knowledge_base)
+    return jsonify({'results': results})
+
+@app.route('/feedback', methods=['POST'])
+def collect_feedback():
+    """Collect user feedback on responses"""
+    data = request.get_json()
+    feedback = {
+        "timestamp": datetime.now().isoformat(),
+        "session_id": data.get('session_id'),
+        "message_id": data.get('message_id'),
+        "user_message": data.get('user_message'),
+        "bot_response": data.get('bot_response'),
+        "rating": data.get('rating'),  # 1-5 stars
+        "feedback_text": data.get('feedback_text', ''),
+        "helpful": data.get('helpful', True)
     }
-message): len(user__length"   "messageage),
-     nt(user_messtime_sen analyzet":timen"sen       onse,
- ": bot_respespons "bot_re     message,
-  : user_e"ag_messuser    "",
-    mous"anonyion_id or _id": sess   "session   ,
-  oformat()ime.now().isdatettamp": "times
-         { =ersation conva"""
-   datetaenhanced mfile with N SOrsation to J conveSave  """:
-  n_id=None) sessio_response,e, botser_messagtion(u_conversa save
-
-def"neutral"   return :
-        elsegative"
-  return "ne       :
-tive_countt > posiune_co negativif
-    elve""positireturn         ive_count:
-unt > negat positive_co   if 
- 
-   r)sage_loweord in mesords if wve_wn negati for word iunt = sum(1 negative_co   ge_lower)
-rd in messaords if woositive_wr word in pfoum(1 nt = se_cou   positiv()
- eressage.lowower = mmessage_l  ]
     
-  e', 'error'issu, ' 'problem'ed',ppointted', 'disastra, 'fruul', 'angry'le', 'awfrribbad', 'tewords = ['negative_ul']
-    , 'helpf'thanks''thank', ed', isfi 'sathappy',, 'nt'llet', 'excegrea', 'goodds = ['ve_wor
-    positi"s""nt analysisic sentime  """Ba  ge):
-t(messantimensealyze_ anlt"]
-
-deffauSPONSES["den MOCK_RE       returelse:
-   tact"]
-  S["conRESPONSECK_MOrn   retu      ]):
-support", "l"ne", "emai"phoact", ontd in ["cworer for essage_lown mf any(word i    elis"]
-urice hooffRESPONSES["n MOCK_      retur  se"]):
-lo", "cpen "o",s", "timed in ["hourr for worge_lowein messad  any(wor
-    elifram_end"]ES["progOCK_RESPONSrn M     retun"]):
-   "whem", , "progra"cohort", inish" "f["end",rd in  wor fore_lowe messag inrdf any(wo]
-    elimunity"g_comninlear["ONSESOCK_RESP   return M    ing"]):
- "learnty", communi" in [or wordge_lower fd in messaf any(wor    elice"]
-attendan"physical_SES[ONn MOCK_RESP      retur:
-  rson"])", "petorynda", "matendanceical", "atn ["physr word ifoe_lower n messagf any(word i"]
-    eliort_suppinancialSES["fOCK_RESPON    return M"]):
-    oney"meal", "mt", ansportr", "nancialin ["fi for word age_lowerord in mess  elif any(wment"]
-  ssessry_aS["entOCK_RESPONSErn Metu
-        ram"]): "ex "test",, "entry",ssessment"["ain  word ge_lower ford in messany(worf a    eliit"]
-_waonboardingNSES["POn MOCK_RESur  ret
-      "]):it, "wang"itid", "wan ["onboard ier for worssage_lowin meny(word   elif arse"]
-  ou"change_cSES[K_RESPON return MOC       
-ish"]):in"end", "fd in [ for worage_lower messrd inwoany( and not "]) "location"course",e", "changword in [for er age_lown messd i(woranylif     ees"]
-d_scoroarNSES["dashb_RESPOMOCKurn et    r   :
- ])ifferent""sync", "d", "dareycore", rd", "s"dashboa [rd inower for won message_lword i   if any(.lower()
- er = message message_low  ""
- tent"ssage con based on mesponsemock reppropriate urn a""Rete):
-    "nse(messagock_respoget_m
-
-def sage)ponse(mesck_resurn get_mo ret       else:
-)
-    owledge_basesage, knresponse(mesintelligent_n create_tur
-        ree_base: knowledg if  
+    try:
+        with open('training_data.json', 'r') as f:
+            training_data = json.load(f)
+    except FileNotFoundError:
+        training_data = {"training_examples": [], "feedback_data": [], "improvement_suggestions": []}
+    except json.JSONDecodeError:
+        training_data = {"training_examples": [], "feedback_data": [], "improvement_suggestions": []}
+    
+    training_data["feedback_data"].append(feedback)
+    
+    try:
+        with open('training_data.json', 'w') as f:
+            json.dump(training_data, f, indent=2)
+    except Exception as e:
+        logger.error(f"Failed to save feedback: {e}")
     
- _base()wledgeoad_kno_base = l  knowledge""
-  ponses"xtual resgent, conteintellie with mock responsnced   """Enha:
-  e)messagesponse(ock_rnced_met_enhage)
-
-def gsponse(messack_reeturn get_mo
-    ronsesrespal mock k to origin # Fallbac    
-   
-age)(messck_responsen get_mo   retur    ")
-     ase key: {e}wledge bissing knor.error(f"M     logge e:
-       KeyError asexcept       _base)
-  nowledge'](kesponseatch]['rbest_mtemplates[ponse_ res   return       try:
-  
-         > 0:hes_matcnd maxst_match a  if be
-  t matchon bes based te responseera
-    # Genent
-    match = int      best_ches
-      es = mattch max_ma      s:
-     tchees > max_mamatchf        iower)
- in message_lkeyword '] if eywordsnfig['k coeyword infor kes = sum(1 ch   mat
-     es.items():_templatin responset, config  inten   for  
- = 0
-  tches max_ma    tch = None
-ma   best_ntent
- g iest matchin b # Find the
+    return jsonify({'success': True, 'message': 'Feedback collected successfully'})
+
+@app.route('/admin/analytics')
+def analytics():
+    """Admin dashboard for conversation analytics"""
+    summary = get_analytics_rollup().summary()
+    total_conversations = summary['total_conversations']
+    sentiment_counts = summary['sentiment_distribution']
+    conversations = conversation_store.recent(10)
+    routing = get_local_answer_router().stats()
     
-       }   }
+    analytics_html = f'''
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>3MTT Chatbot Analytics</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; max-width: 800px; margin: 50px auto; padding: 20px; }}
+            .metric {{ background: #f5f5f5; padding: 15px; margin: 10px 0; border-radius: 5px; }}
+            .metric h3 {{ margin: 0 0 10px 0; color: #333; }}
+            .metric p {{ margin: 0; font-size: 24px; font-weight: bold; color: #007bff; }}
+        </style>
+    </head>
+    <body>
+        <h1>3MTT Chatbot Analytics</h1>
+        
+        <div class="metric">
+            <h3>Total Conversations</h3>
+            <p>{total_conversations}</p>
+        </div>
+        
+        <div class="metric">
+            <h3>Unique Sessions</h3>
+            <p>{summary['unique_sessions']}</p>
+        </div>
+        
+        <div class="metric">
+            <h3>Sentiment Distribution</h3>
+            <p>Positive: {sentiment_counts['positive']} | Neutral: {sentiment_counts['neutral']} | Negative: {sentiment_counts['negative']}</p>
+        </div>
+        
+        <div class="metric">
+            <h3>Answered Locally</h3>
+            <p>{routing['offload_rate']:.0%} of {routing['routed']} | ~{routing['estimated_seconds_saved']:.1f}s of provider time saved</p>
+        </div>
+        
+        <div class="metric">
+            <h3>Recent Conversations</h3>
+            <div style="max-height: 300px; overflow-y: scroll; border: 1px solid #ddd; padding: 10px;">
+                {"".join([f"<p><strong>User:</strong> {conv.get('user_message', '')[:100]}...</p><p><strong>Bot:</strong> {conv.get('bot_response', '')[:100]}...</p><hr>" for conv in conversations])}
+            </div>
+        </div>
+        
+        <p><a href="/">← Back to Chat</a></p>
+    </body>
+    </html>
+    '''
+    return render_template_string(analytics_html)
 
-     ucture']}."'stre_2'][]['phasgram'rokb['3mtt_p']} in {et]['targ']['phase_2'3mtt_programg {kb['etinargen bigger, t be evillhase 2 w}. Ppproach']_a]['training]['phase_1'mtt_program''3{kb[nd included ]} aount'fellows_cphase_1']['am']['
\ No newline at end of file
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5002))
+    app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -7,6 +7,7 @@ import os
 import requests
 import json
 from flask import Flask, request, jsonify, render_template_string
+from static_page import StaticPage
 
 # Create Flask app
 application = Flask(__name__)
@@ -66,10 +67,9 @@ def get_mock_response(message):
     else:
         return MOCK_RESPONSES["default"]
 
-@application.route('/')
-def index():
-    """Chat interface"""
-    return render_template_string('''
+# Chat interface, rendered once and served as cached, precompressed bytes
+with application.app_context():
+    chat_page = StaticPage(render_template_string('''
     <!DOCTYPE html>
     <html>
     <head>
@@ -140,7 +140,12 @@ def index():
         </script>
     </body>
     </html>
-    ''', api_key=bool(OPENROUTER_API_KEY), model=AI_MODEL)
+    ''', api_key=bool(OPENROUTER_API_KEY), model=AI_MODEL))
+
+@application.route('/')
+def index():
+    """Chat interface"""
+    return chat_page.response(request)
 
 @application.route('/chat', methods=['POST'])
 def chat():
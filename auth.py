@@ -1,5 +1,9 @@
+import threading
+import time
+import uuid
 from functools import wraps
 from flask import request, jsonify, current_app
+from sqlalchemy import event
 import jwt
 import bcrypt
 from models import AdminUser, db
@@ -13,18 +17,102 @@ def verify_password(password, password_hash):
     return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
 
 def generate_token(user_id):
-    """Generate JWT token"""
-    payload = {'user_id': user_id}
+    """Generate JWT token that expires after JWT_EXPIRES_SECONDS"""
+    now = int(time.time())
+    payload = {
+        'user_id': user_id,
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + current_app.config.get('JWT_EXPIRES_SECONDS', 3600)
+    }
     return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
 
-def verify_token(token):
-    """Verify JWT token"""
+def decode_token(token):
+    """Verified payload of a JWT token, or None if it is invalid or expired"""
     try:
-        payload = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        return payload['user_id']
+        return jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'],
+                          options={'require': ['user_id', 'jti', 'iat', 'exp']})
     except jwt.InvalidTokenError:
         return None
 
+def verify_token(token):
+    """Verify JWT token"""
+    payload = decode_token(token)
+    return payload['user_id'] if payload else None
+
+class PrincipalCache:
+    """Admins already checked against the database, keyed by token ID
+
+    An entry lives for at most ttl seconds and never past its token's
+    expiry. invalidate_user() drops every cached token of an admin, and is
+    called when an AdminUser is deactivated or deleted in this process;
+    other workers notice within ttl.
+    """
+
+    def __init__(self, max_entries=1000, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = {}  # token ID -> (user ID, expires at)
+
+    def get(self, token_id):
+        entry = self.entries.get(token_id)
+        if entry is None:
+            return None
+        if entry[1] <= self.clock():
+            self.entries.pop(token_id, None)
+            return None
+        return entry[0]
+
+    def put(self, token_id, user_id, ttl, token_expires):
+        expires = min(self.clock() + ttl, token_expires)
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                now = self.clock()
+                for key in [key for key, (_, at) in self.entries.items() if at <= now]:
+                    del self.entries[key]
+                if len(self.entries) >= self.max_entries:
+                    self.entries.pop(next(iter(self.entries)))
+            self.entries[token_id] = (user_id, expires)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key in [key for key, (cached, _) in self.entries.items() if cached == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+principal_cache = PrincipalCache()
+
+@event.listens_for(AdminUser.active, 'set')
+def admin_active_changed(target, value, oldvalue, initiator):
+    """Forget a deactivated admin's cached tokens"""
+    if not value and target.id is not None:
+        principal_cache.invalidate_user(target.id)
+
+@event.listens_for(AdminUser, 'after_delete')
+def admin_deleted(mapper, connection, target):
+    """Forget a deleted admin's cached tokens"""
+    principal_cache.invalidate_user(target.id)
+
+def active_admin_id(payload):
+    """ID of the active admin a verified token payload belongs to, or None
+
+    The database is only asked whether the admin still exists and is
+    active once per token per ADMIN_AUTH_CACHE_TTL seconds.
+    """
+    user_id = principal_cache.get(payload['jti'])
+    if user_id is not None:
+        return user_id if user_id == payload['user_id'] else None
+
+    user = db.session.get(AdminUser, payload['user_id'])
+    if not user or not user.active:
+        return None
+    principal_cache.put(payload['jti'], user.id, current_app.config.get('ADMIN_AUTH_CACHE_TTL', 60), payload['exp'])
+    return user.id
+
 def admin_required(f):
     """Decorator to require admin authentication"""
     @wraps(f)
@@ -36,12 +124,11 @@ def admin_required(f):
         if token.startswith('Bearer '):
             token = token[7:]
         
-        user_id = verify_token(token)
-        if not user_id:
+        payload = decode_token(token)
+        if not payload:
             return jsonify({'error': 'Invalid token'}), 401
         
-        user = AdminUser.query.get(user_id)
-        if not user or not user.active:
+        if not active_admin_id(payload):
             return jsonify({'error': 'User not found or inactive'}), 401
         
         return f(*args, **kwargs)
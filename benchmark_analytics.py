@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark the analytics dashboard numbers as the conversation log grows:
+a full scan of the log versus reading the rollups
+"""
+
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from analytics_rollup import SQLiteRollup
+from conversation_store import ConversationStore
+
+def full_scan(store):
+    """What /admin/analytics used to compute on every request"""
+    sentiment_counts = {"positive": 0, "negative": 0, "neutral": 0}
+    unique_sessions = set()
+    total = 0
+    for conv in store.read_all():
+        total += 1
+        sentiment_counts[conv.get("sentiment", "neutral")] += 1
+        unique_sessions.add(conv.get("session_id", "anonymous"))
+    return total, sentiment_counts, len(unique_sessions)
+
+def time_call(fn, rounds):
+    """Average latency in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return 1000 * (time.perf_counter() - start) / rounds
+
+def main():
+    """Compare recomputing analytics with reading the rollups"""
+    rng = random.Random(42)
+    start = datetime(2024, 5, 1)
+
+    print("📊 Analytics Benchmark")
+    print("=" * 60)
+    print(f"{'conversations':>13} {'scan ms':>9} {'rollup ms':>10} {'sessions':>9} {'estimate':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ConversationStore(os.path.join(tmp, 'conversations.jsonl'), legacy_path=None, max_bytes=None)
+        rollup = SQLiteRollup(os.path.join(tmp, 'analytics.db'))
+        rollup.rebuild([])
+        written = 0
+        for size in (1000, 10000, 50000):
+            while written < size:
+                record = {
+                    "timestamp": (start + timedelta(minutes=written)).isoformat(),
+                    "session_id": f"session-{rng.randrange(size // 3)}",
+                    "user_message": "When does cohort 3 end?",
+                    "bot_response": "Cohort 3 ends July 20th.",
+                    "sentiment": rng.choice(("positive", "neutral", "negative"))
+                }
+                store.append(record)
+                rollup.add(record)
+                written += 1
+            scan_ms = time_call(lambda: full_scan(store), 3)
+            rollup_ms = time_call(rollup.summary, 20)
+            _, _, sessions = full_scan(store)
+            estimate = rollup.summary()['unique_sessions']
+            print(f"{size:>13} {scan_ms:>9.1f} {rollup_ms:>10.2f} {sessions:>9} {estimate:>9}")
+
+if __name__ == '__main__':
+    main()
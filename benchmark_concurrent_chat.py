@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Load test /chat under gunicorn against a local fake LLM to compare worker modes
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LLM_LATENCY = 0.5  # seconds the fake LLM takes per completion
+CLIENTS = 32
+REQUESTS_PER_CLIENT = 4
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "Cohort 3 ends July 20th."}}]
+}).encode('utf-8')
+
+class FakeLLM(BaseHTTPRequestHandler):
+    """OpenRouter-compatible endpoint that answers after LLM_LATENCY"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(LLM_LATENCY)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, format, *args):
+        pass
+
+ThreadingHTTPServer.daemon_threads = True
+
+def app_environment(tmp, llm_url, port):
+    """Environment that points the production app at the fake LLM"""
+    env = dict(os.environ)
+    env.update({
+        'FLASK_ENV': 'production',
+        'PORT': str(port),
+        'DATABASE_URL': f"sqlite:///{os.path.join(tmp, 'loadtest.db')}",
+        'REDIS_URL': 'redis://127.0.0.1:1/0',  # Nothing listens here: cache lookups miss fast
+        'AI_PROVIDER': 'openrouter',
+        'OPENROUTER_API_KEY': 'loadtest',
+        'OPENROUTER_API_URL': llm_url,
+        'RATELIMIT_ENABLED': 'false',
+        'SEMANTIC_CACHE_ENABLED': 'false',
+        'GUNICORN_WORKERS': '1'
+    })
+    return env
+
+def create_tables(env):
+    """Create the SQLite schema the app writes conversations to"""
+    subprocess.run(
+        [sys.executable, '-c', 'from app import create_app\nfrom models import db\n'
+         'app = create_app("production")\nwith app.app_context(): db.create_all()'],
+        env=env, check=True, capture_output=True
+    )
+
+def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start")
+
+def chat(base_url, client, i):
+    """Send one unique question and return its latency in seconds"""
+    body = json.dumps({'message': f"Load test question {client}-{i}"}).encode('utf-8')
+    request = urllib.request.Request(f"{base_url}/chat", data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=120) as response:
+        assert response.status == 200
+        response.read()
+    return time.perf_counter() - start
+
+def run_load(base_url):
+    """Return (requests per second, p50 s, p99 s) for CLIENTS concurrent users"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        futures = [pool.submit(chat, base_url, c, i) for c in range(CLIENTS) for i in range(REQUESTS_PER_CLIENT)]
+        latencies = sorted(f.result() for f in futures)
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+def benchmark_mode(tmp, llm_url, worker_class, threads, port):
+    env = app_environment(tmp, llm_url, port)
+    env.update({'GUNICORN_WORKER_CLASS': worker_class, 'GUNICORN_THREADS': str(threads)})
+    server = subprocess.Popen(
+        ['gunicorn', '--config', 'gunicorn.conf.py', '--pid', os.path.join(tmp, f'{worker_class}.pid'),
+         '--access-logfile', '/dev/null', '--error-logfile', os.path.join(tmp, 'gunicorn.log'), 'wsgi:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_ready(base_url)
+        return run_load(base_url)
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    """Compare one sync worker with one gthread worker on a single core"""
+    llm = ThreadingHTTPServer(('127.0.0.1', 0), FakeLLM)
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+    llm_url = f"http://127.0.0.1:{llm.server_address[1]}/api/v1/chat/completions"
+
+    print("🚦 Concurrent Chat Load Test")
+    print("=" * 70)
+    print(f"Fake LLM latency {LLM_LATENCY * 1000:.0f} ms, {CLIENTS} concurrent clients, 1 worker process")
+    print(f"{'worker':>16} {'req/s':>10} {'p50 s':>10} {'p99 s':>10} {'chats in flight':>16}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        create_tables(app_environment(tmp, llm_url, 0))
+        for port, (worker_class, threads) in enumerate((('sync', 1), ('gthread', 16), ('gthread', 32)), start=18100):
+            rps, p50, p99 = benchmark_mode(tmp, llm_url, worker_class, threads, port)
+            label = f"{worker_class} x{threads}"
+            print(f"{label:>16} {rps:>10.1f} {p50:>10.2f} {p99:>10.2f} {rps * LLM_LATENCY:>16.1f}")
+
+    llm.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark conversation write latency as stored history grows
+"""
+
+import json
+import os
+import tempfile
+import time
+from conversation_store import ConversationStore
+
+def make_turn(i):
+    """A conversation record shaped like the ones save_conversation writes"""
+    return {
+        "timestamp": "2024-07-12T04:11:25.919652",
+        "session_id": f"session-{i % 5000}",
+        "user_message": f"When does cohort {i % 7} end?",
+        "bot_response": "Cohort 3 ends July 20th, 2024.",
+        "sentiment": "neutral",
+        "message_length": 24
+    }
+
+def prefill_log(path, count):
+    """Write count turns directly, as if they had been appended over time"""
+    with open(path, 'w') as f:
+        for i in range(count):
+            f.write(json.dumps(make_turn(i)) + '\n')
+
+def prefill_legacy(path, count):
+    """Write count turns in the old single-array format"""
+    with open(path, 'w') as f:
+        json.dump([make_turn(i) for i in range(count)], f, indent=2)
+
+def legacy_append(path, record):
+    """The old read-modify-write save_conversation"""
+    with open(path, 'r') as f:
+        conversations = json.load(f)
+    conversations.append(record)
+    with open(path, 'w') as f:
+        json.dump(conversations, f, indent=2)
+
+def time_appends(append, samples):
+    """Return (mean, p99) latency in milliseconds"""
+    latencies = []
+    for i in range(samples):
+        start = time.perf_counter()
+        append(make_turn(i))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return 1000 * sum(latencies) / samples, 1000 * latencies[int(samples * 0.99)]
+
+def main():
+    """Compare append-only writes with the legacy JSON rewrite"""
+    print("💾 Conversation Store Benchmark")
+    print("=" * 60)
+    print(f"{'stored turns':>12} {'format':>8} {'mean ms':>10} {'p99 ms':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (1_000, 10_000, 100_000, 1_000_000):
+            path = os.path.join(tmp, 'conversations.jsonl')
+            prefill_log(path, count)
+            store = ConversationStore(path, legacy_path=None, max_bytes=None)
+            mean_ms, p99_ms = time_appends(store.append, 1000)
+            print(f"{count:>12,} {'jsonl':>8} {mean_ms:>10.3f} {p99_ms:>10.3f}")
+
+            # The rewrite is linear in history, so only sample the small sizes
+            if count <= 10_000:
+                legacy_path = os.path.join(tmp, 'conversations.json')
+                prefill_legacy(legacy_path, count)
+                mean_ms, p99_ms = time_appends(lambda record: legacy_append(legacy_path, record), 20)
+                print(f"{count:>12,} {'json':>8} {mean_ms:>10.3f} {p99_ms:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat request validation on adversarial 10KB request bodies
+"""
+
+import html
+import json
+import re
+import time
+from input_validation import sanitize_chat_payload
+
+LEGACY_PATTERNS = [
+    r'<script[^>]*>.*?</script>',
+    r'javascript:',
+    r'on\w+\s*=',
+    r'<iframe[^>]*>',
+    r'<object[^>]*>',
+    r'<embed[^>]*>',
+]
+
+def body(message, size=10000):
+    """JSON body of about size bytes: the message plus padding in another field"""
+    payload = {'message': message, 'padding': ''}
+    payload['padding'] = 'p' * max(0, size - len(json.dumps(payload)))
+    return json.dumps(payload)
+
+MESSAGES = {
+    'benign question': ('When does cohort 3 end? I need help with my dashboard score. ' * 17)[:1000],
+    '"onon..." run': 'on' * 500,
+    'unclosed <script': '<script' * 142,
+    'open <script> tags': '<script>' * 125,
+    'unclosed <iframe': '<iframe' * 142,
+}
+
+def legacy_validate(raw):
+    """Middleware pass followed by the view's own parse, as before"""
+    data = json.loads(raw)
+    message = data.get('message', '')
+    if len(message) > 1000:
+        return None
+    text_lower = message.lower()
+    for pattern in LEGACY_PATTERNS:
+        if re.search(pattern, text_lower, re.IGNORECASE):
+            return None
+    html.escape(message)
+
+    # The view then parsed and escaped the body again
+    data = json.loads(raw)
+    return html.escape(data['message'].strip())
+
+def validate(raw):
+    """Single parse, one combined regex"""
+    return sanitize_chat_payload(json.loads(raw))[0]
+
+def time_validation(validate, raw, rounds):
+    """Average per-request latency in microseconds"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        validate(raw)
+    return 1e6 * (time.perf_counter() - start) / rounds
+
+def main():
+    """Compare the legacy validation with the single-pass pipeline"""
+    print("🛡️ Input Validation Benchmark (10KB bodies)")
+    print("=" * 70)
+    print(f"{'message':>20} {'legacy µs/req':>14} {'single-pass µs/req':>19} {'speedup':>8}")
+    for name, message in MESSAGES.items():
+        raw = body(message)
+        legacy_us = time_validation(legacy_validate, raw, 200)
+        single_us = time_validation(validate, raw, 200)
+        print(f"{name:>20} {legacy_us:>14.1f} {single_us:>19.1f} {legacy_us / single_us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-message intent matching as the number of intents grows
+"""
+
+import random
+import string
+import time
+from intent_matcher import IntentMatcher
+
+MESSAGES = [
+    "Why is my dashboard score different from Darey.io?",
+    "When does cohort 3 end?",
+    "Can I change my course after starting?",
+    "What financial support do you provide?",
+    "How can I contact support?",
+    "I'm having trouble logging in",
+    "What is the weather today?"
+]
+
+def synthetic_intents(count, rng):
+    """count intents with six keywords each, a third of them two-word phrases"""
+    def word():
+        return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+    intents = {}
+    for i in range(count):
+        keywords = [word() for _ in range(4)] + [f"{word()} {word()}", f"what {word()}"]
+        intents[f"intent_{i}"] = keywords
+    return intents
+
+def linear_best(message, intents):
+    """The per-template substring scan create_intelligent_response used to run"""
+    message_lower = message.lower()
+    best_match = None
+    max_matches = 0
+    for intent, keywords in intents.items():
+        matches = sum(1 for keyword in keywords if keyword in message_lower)
+        if matches > max_matches:
+            max_matches = matches
+            best_match = intent
+    return best_match
+
+def time_messages(match, rounds=200):
+    """Average per-message latency in microseconds"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in MESSAGES:
+            match(message)
+    return 1e6 * (time.perf_counter() - start) / (rounds * len(MESSAGES))
+
+def main():
+    """Compare the keyword scan with the compiled matcher"""
+    rng = random.Random(42)
+
+    print("🎯 Intent Matcher Benchmark")
+    print("=" * 70)
+    print(f"{'intents':>8} {'keywords':>9} {'build ms':>10} {'linear µs/msg':>14} {'compiled µs/msg':>16} {'speedup':>8}")
+
+    for count in (12, 100, 300, 1000):
+        intents = synthetic_intents(count, rng)
+
+        start = time.perf_counter()
+        matcher = IntentMatcher(intents)
+        build_ms = 1000 * (time.perf_counter() - start)
+
+        linear_us = time_messages(lambda m: linear_best(m, intents))
+        compiled_us = time_messages(matcher.best)
+        keywords = sum(len(keywords) for keywords in intents.values())
+        print(f"{count:>8} {keywords:>9} {build_ms:>10.1f} {linear_us:>14.1f} {compiled_us:>16.1f} {linear_us / compiled_us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
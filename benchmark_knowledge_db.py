@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark database full-text knowledge search as the knowledge base grows
+"""
+
+import json
+import os
+import tempfile
+import time
+from flask import Flask
+from models import db, KnowledgeBase
+from knowledge_db import KnowledgeSearch, knowledge_entries
+
+QUERIES = [
+    "Why is my dashboard score different from Darey.io?",
+    "When does cohort 3 end?",
+    "Can I change my course after starting?",
+    "What financial support do you provide?",
+    "How can I contact support?",
+    "I'm having trouble logging in",
+    "What is the weather today?"
+]
+
+def grown_entries(copies):
+    """Knowledge base entries replicated copies times under distinct categories"""
+    entries = {}
+    for path in ('knowledge_base.json', 'knowledge_base_expansion_ideas.json'):
+        with open(path, 'r') as f:
+            for entry in knowledge_entries(json.load(f)):
+                entries.setdefault(entry['id'], entry)
+    for i in range(copies):
+        for entry in entries.values():
+            yield {**entry, 'id': f"{entry['id'][:30]}{i:06d}", 'category': f"{entry['category']}_{i}", 'priority': 1 + i % 3}
+
+def time_queries(search, rounds=20):
+    """Average per-query latency in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in QUERIES:
+            search(query)
+    return 1000 * (time.perf_counter() - start) / (rounds * len(QUERIES))
+
+def main():
+    """Load growing knowledge bases into SQLite and time FTS5 searches"""
+    print("🗄️  Knowledge Database Search Benchmark (SQLite FTS5)")
+    print("=" * 70)
+    print(f"{'entries':>8} {'load s':>8} {'ms/query':>10}")
+
+    search = KnowledgeSearch()
+    for copies in (1, 100, 500, 1000):
+        with tempfile.TemporaryDirectory() as directory:
+            app = Flask(__name__)
+            app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'knowledge.db')}"
+            db.init_app(app)
+            with app.app_context():
+                db.create_all()
+                start = time.perf_counter()
+                db.session.execute(KnowledgeBase.__table__.insert(), list(grown_entries(copies)))
+                db.session.commit()
+                load_seconds = time.perf_counter() - start
+                count = KnowledgeBase.query.count()
+                print(f"{count:>8} {load_seconds:>8.2f} {time_queries(search.search):>10.3f}")
+                db.session.remove()
+                db.engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark knowledge base search as the knowledge base grows
+"""
+
+import json
+import time
+from bm25_index import BM25FIndex
+from knowledge_index import KnowledgeIndex, linear_search
+
+QUERIES = [
+    "Why is my dashboard score different from Darey.io?",
+    "When does cohort 3 end?",
+    "Can I change my course after starting?",
+    "What financial support do you provide?",
+    "How can I contact support?",
+    "I'm having trouble logging in",
+    "What is the weather today?"
+]
+
+def grow_knowledge_base(knowledge_base, copies):
+    """Replicate every section to simulate a larger knowledge base"""
+    grown = {}
+    for i in range(copies):
+        for section, content in knowledge_base.items():
+            grown[f"{section}_{i}"] = content
+    return grown
+
+def count_entries(knowledge_base):
+    """Count section.key entries"""
+    return sum(len(content) for content in knowledge_base.values() if isinstance(content, dict))
+
+def time_queries(search, rounds=5):
+    """Average per-query latency in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in QUERIES:
+            search(query)
+    return 1000 * (time.perf_counter() - start) / (rounds * len(QUERIES))
+
+def main():
+    """Compare the linear scan with the prebuilt index and BM25F ranking"""
+    with open('knowledge_base.json', 'r') as f:
+        knowledge_base = json.load(f)
+
+    print("🔍 Knowledge Search Benchmark")
+    print("=" * 70)
+    print(f"{'entries':>8} {'build ms':>10} {'linear ms/query':>16} {'index ms/query':>16} {'speedup':>8} {'bm25f build ms':>15} {'bm25f ms/query':>15}")
+
+    for copies in (1, 10, 50, 200):
+        grown = grow_knowledge_base(knowledge_base, copies)
+
+        start = time.perf_counter()
+        index = KnowledgeIndex(grown)
+        build_ms = 1000 * (time.perf_counter() - start)
+
+        linear_ms = time_queries(lambda q: linear_search(q, grown), rounds=1 if copies > 50 else 5)
+        index_ms = time_queries(index.search)
+
+        start = time.perf_counter()
+        bm25 = BM25FIndex(grown)
+        bm25_build_ms = 1000 * (time.perf_counter() - start)
+        bm25_ms = time_queries(bm25.search)
+        print(f"{count_entries(grown):>8} {build_ms:>10.1f} {linear_ms:>16.3f} {index_ms:>16.3f} {linear_ms / index_ms:>7.1f}x "
+              f"{bm25_build_ms:>15.1f} {bm25_ms:>15.3f}")
+
+if __name__ == "__main__":
+    main()
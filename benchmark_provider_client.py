@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request overhead of fresh vs pooled LLM provider connections
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from provider_clients import ProviderClients
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "Cohort 3 ends July 20th."}}]
+}).encode('utf-8')
+
+class StubProvider(BaseHTTPRequestHandler):
+    """Answers every chat completion instantly, with keep-alive"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body are separate writes
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, format, *args):
+        pass
+
+def payload():
+    return {
+        "model": "deepseek/deepseek-r1:free",
+        "messages": [{"role": "user", "content": "When does cohort 3 end?"}],
+        "max_tokens": 300
+    }
+
+def time_requests(post, url, samples):
+    """Return (mean, p99) latency in milliseconds"""
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        response = post(url, json=payload(), timeout=30)
+        response.json()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return 1000 * sum(latencies) / samples, 1000 * latencies[int(samples * 0.99)]
+
+def main():
+    """Compare a bare requests.post per message with the pooled session"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+    samples = 1000
+
+    print("🔌 Provider Client Benchmark")
+    print("=" * 60)
+    print(f"{'client':>20} {'mean ms':>10} {'p99 ms':>10}")
+
+    fresh_mean, fresh_p99 = time_requests(requests.post, url, samples)
+    print(f"{'requests.post':>20} {fresh_mean:>10.3f} {fresh_p99:>10.3f}")
+
+    clients = ProviderClients()
+    pooled_mean, pooled_p99 = time_requests(clients.http_session().post, url, samples)
+    print(f"{'pooled session':>20} {pooled_mean:>10.3f} {pooled_p99:>10.3f}")
+
+    print(f"\n⚡ Saved {fresh_mean - pooled_mean:.3f} ms per request on loopback "
+          "(TLS handshakes to a real provider add tens of milliseconds more)")
+    clients.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
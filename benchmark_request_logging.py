@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the time a request spends logging request_completed, with the
+event rendered inline versus handed to the background log writer
+"""
+
+import logging
+import os
+import threading
+import time
+import structlog
+from log_queue import BackgroundLogHandler
+from monitoring import configure_logging, logger
+
+THREADS = 16
+EVENTS_PER_THREAD = 500
+REQUEST_WAIT = 0.002  # Time each request spends waiting on I/O between log calls
+
+class SlowSink:
+    """A stdout whose reader occasionally falls behind, like a busy log pipe"""
+
+    def __init__(self, every=200, pause=0.002):
+        self.devnull = open(os.devnull, 'w')
+        self.every = every
+        self.pause = pause
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        if self.writes % self.every == 0:
+            time.sleep(self.pause)
+        return self.devnull.write(text)
+
+    def flush(self):
+        self.devnull.flush()
+
+def inline_logger(stream):
+    """The previous setup: the whole processor chain runs in the request thread"""
+    stdlib_logger = logging.getLogger('benchmark.inline')
+    stdlib_logger.handlers = [logging.StreamHandler(stream)]
+    stdlib_logger.setLevel(logging.INFO)
+    stdlib_logger.propagate = False
+    return structlog.wrap_logger(
+        stdlib_logger,
+        processors=[
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.JSONRenderer()
+        ],
+        wrapper_class=structlog.stdlib.BoundLogger
+    )
+
+def time_logging(log):
+    """Per-call latencies in microseconds across THREADS concurrent request threads"""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        mine = []
+        for i in range(EVENTS_PER_THREAD):
+            start = time.perf_counter()
+            log.info("request_completed", method='POST', endpoint='chat', status_code=200,
+                     duration=0.123, sample_rate=1.0, request_id=f"1700000000-{i}")
+            mine.append((time.perf_counter() - start) * 1e6)
+            time.sleep(REQUEST_WAIT)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return latencies
+
+def percentile(latencies, p):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+def main():
+    """Compare inline and background rendering of request events"""
+    print("🪵 Request Logging Benchmark")
+    print("=" * 60)
+    print(f"{THREADS} threads x {EVENTS_PER_THREAD} request_completed events")
+    print(f"{'setup':<22} {'p50 µs':>8} {'p99 µs':>8} {'max µs':>9}")
+    for sink_name, make_sink in (('devnull', lambda: open(os.devnull, 'w')), ('slow pipe', SlowSink)):
+        inline = time_logging(inline_logger(make_sink()))
+        handler = configure_logging(async_mode=True, stream=make_sink(), max_queue=THREADS * EVENTS_PER_THREAD)
+        queued = time_logging(logger)
+        assert isinstance(handler, BackgroundLogHandler)
+        handler.stop()
+        for name, latencies in ((f'inline, {sink_name}', inline), (f'background, {sink_name}', queued)):
+            print(f"{name:<22} {percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f} {latencies[-1]:>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Offline relevance benchmark for knowledge base retrieval
+
+Each training_data.json example is a query whose expected_response tells
+us what the retrieved context needed to contain. An item's graded
+relevance is the share of the expected answer's content words it holds;
+rankings are compared by nDCG@3 and by how much of the expected answer
+the top 3 items cover together.
+"""
+
+import json
+import math
+import time
+from bm25_index import BM25FIndex
+from knowledge_index import KnowledgeIndex
+from text_analysis import tokenize
+
+K = 3
+
+def answer_coverage(items, answer_terms):
+    """Share of answer_terms found in items"""
+    found = set()
+    for item in items:
+        found.update(tokenize(item.replace('_', ' ')))
+    return len(answer_terms & found) / len(answer_terms)
+
+def ndcg(ranked, gains, k=K):
+    """Normalised discounted cumulative gain of the first k results"""
+    dcg = sum(gains.get(item, 0.0) / math.log2(rank + 2) for rank, item in enumerate(ranked[:k]))
+    ideal = sum(gain / math.log2(rank + 2) for rank, gain in enumerate(sorted(gains.values(), reverse=True)[:k]))
+    return dcg / ideal if ideal else 0.0
+
+def evaluate(search, examples, displays):
+    """Mean nDCG@3 and answer coverage@3 of search over examples"""
+    total_ndcg = total_coverage = 0.0
+    for example in examples:
+        answer_terms = set(tokenize(example['expected_response']))
+        gains = {display: answer_coverage([display], answer_terms) for display in displays}
+        ranked = list(dict.fromkeys(search(example['user_input'])))
+        total_ndcg += ndcg(ranked, gains)
+        total_coverage += answer_coverage(ranked[:K], answer_terms)
+    count = len(examples)
+    return total_ndcg / count, total_coverage / count
+
+def time_queries(search, queries, rounds=200):
+    """Average per-query latency in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            search(query)
+    return 1000 * (time.perf_counter() - start) / (rounds * len(queries))
+
+def main():
+    """Compare the substring/category scoring with BM25F"""
+    with open('knowledge_base.json', 'r') as f:
+        knowledge_base = json.load(f)
+    with open('training_data.json', 'r') as f:
+        examples = [example for example in json.load(f).get('training_examples', [])
+                    if example.get('user_input') and example.get('expected_response')]
+
+    start = time.perf_counter()
+    bm25 = BM25FIndex(knowledge_base)
+    build_ms = 1000 * (time.perf_counter() - start)
+    current = KnowledgeIndex(knowledge_base)
+
+    print("🎯 Knowledge Retrieval Relevance Benchmark")
+    print("=" * 70)
+    print(f"{len(examples)} training examples, {len(bm25.displays)} knowledge base items, BM25F built in {build_ms:.1f}ms")
+    print()
+    print(f"{'engine':<22} {'nDCG@3':>8} {'coverage@3':>11} {'ms/query':>10}")
+    queries = [example['user_input'] for example in examples]
+    for name, search in (('substring + category', current.search), ('BM25F', bm25.search)):
+        mean_ndcg, coverage = evaluate(search, examples, bm25.displays)
+        print(f"{name:<22} {mean_ndcg:>8.3f} {coverage:>10.1%} {time_queries(search, queries):>10.4f}")
+
+    print()
+    print("Top result per example:")
+    for example in examples:
+        print(f"  {example['user_input'][:45]:<45}")
+        print(f"    substring + category: {(current.search(example['user_input']) or ['-'])[0][:60]}")
+        print(f"    BM25F:                {(bm25.search(example['user_input']) or ['-'])[0][:60]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark the semantic answer cache against recorded conversations
+"""
+
+import json
+import sys
+import time
+from response_cache import SemanticCache
+
+def load_conversations(path='conversations.json'):
+    """Load recorded conversations"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def run_benchmark(conversations, threshold):
+    """Replay conversations through a fresh cache and collect statistics"""
+    cache = SemanticCache(threshold=threshold)
+    hits = 0
+    latencies = []
+
+    for conv in conversations:
+        message = conv.get('user_message', '')
+        start = time.perf_counter()
+        response = cache.get(message)
+        latencies.append(time.perf_counter() - start)
+
+        if response is None:
+            cache.set(message, conv.get('bot_response', ''))
+        else:
+            hits += 1
+
+    latencies.sort()
+    return {
+        'threshold': threshold,
+        'lookups': len(latencies),
+        'hit_rate': hits / len(latencies) if latencies else 0.0,
+        'mean_ms': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+        'p95_ms': 1000 * latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    }
+
+def main():
+    """Run the benchmark for a few thresholds"""
+    path = sys.argv[1] if len(sys.argv) > 1 else 'conversations.json'
+    conversations = load_conversations(path)
+
+    print("🧪 Semantic Cache Benchmark")
+    print("=" * 50)
+    print(f"Conversations: {len(conversations)}")
+
+    for threshold in (0.8, 0.85, 0.9, 0.95):
+        stats = run_benchmark(conversations, threshold)
+        print(f"threshold={stats['threshold']:.2f}  hit_rate={stats['hit_rate']:.1%}  "
+              f"mean={stats['mean_ms']:.3f}ms  p95={stats['p95_ms']:.3f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark sentiment scoring as the lexicon and the message history grow
+"""
+
+import random
+import string
+import time
+from sentiment import SentimentAnalyzer, POSITIVE_WORDS, NEGATIVE_WORDS
+
+MESSAGES = [
+    "Thank you, that was really helpful!",
+    "I have a problem logging in to my dashboard",
+    "When does cohort 3 end?",
+    "This is terrible, I am so frustrated with the portal",
+    "Great program, I'm happy to be part of it"
+]
+
+def linear_sentiment(message, positive_words, negative_words):
+    """The per-word substring scan analyze_sentiment used to run"""
+    message_lower = message.lower()
+    positive_count = sum(1 for word in positive_words if word in message_lower)
+    negative_count = sum(1 for word in negative_words if word in message_lower)
+    if positive_count > negative_count:
+        return "positive"
+    elif negative_count > positive_count:
+        return "negative"
+    return "neutral"
+
+def grow_lexicon(words, size, rng):
+    """Pad a lexicon with random words up to size entries"""
+    grown = list(words)
+    while len(grown) < size:
+        grown.append(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))))
+    return grown
+
+def time_messages(score, rounds=500):
+    """Average per-message latency in microseconds"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in MESSAGES:
+            score(message)
+    return 1e6 * (time.perf_counter() - start) / (rounds * len(MESSAGES))
+
+def main():
+    """Compare the substring scan with the compiled lexicon"""
+    rng = random.Random(42)
+
+    print("💬 Sentiment Benchmark")
+    print("=" * 60)
+    print(f"{'lexicon':>8} {'linear µs/msg':>14} {'compiled µs/msg':>16} {'speedup':>8}")
+    for size in (10, 100, 1000, 10000):
+        positive_words = grow_lexicon(POSITIVE_WORDS, size // 2, rng)
+        negative_words = grow_lexicon(NEGATIVE_WORDS, size // 2, rng)
+        analyzer = SentimentAnalyzer(positive_words, negative_words)
+        rounds = 20 if size > 1000 else 500
+        linear_us = time_messages(lambda m: linear_sentiment(m, positive_words, negative_words), rounds)
+        compiled_us = time_messages(analyzer.analyze, rounds)
+        print(f"{size:>8} {linear_us:>14.1f} {compiled_us:>16.1f} {linear_us / compiled_us:>7.1f}x")
+
+    # Stored history: a few thousand distinct questions asked over and over
+    analyzer = SentimentAnalyzer()
+    distinct = [f"{rng.choice(MESSAGES)} #{i}" for i in range(5000)]
+    history = [{'user_message': rng.choice(distinct)} for _ in range(1_000_000)]
+    start = time.perf_counter()
+    counts = analyzer.distribution(history)
+    elapsed = time.perf_counter() - start
+    print(f"\nBatch: {len(history):,} stored messages scored in {elapsed:.2f} s -> {dict(counts)}")
+
+if __name__ == "__main__":
+    main()
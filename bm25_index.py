@@ -0,0 +1,89 @@
+import heapq
+import math
+from collections import Counter
+from knowledge_index import flatten_dict_value
+from text_analysis import tokenize
+
+# Field weights and length normalisation: a query word in an entry's key
+# ("course_change_policy") says more than one buried in a long value
+FIELDS = {
+    'section': {'weight': 1.0, 'b': 0.0},
+    'key': {'weight': 2.5, 'b': 0.3},
+    'value': {'weight': 1.0, 'b': 0.75},
+}
+
+class BM25FIndex:
+    """BM25F ranking over the section.key items of the knowledge base
+
+    Every item is a document with section, key and value fields. Term
+    frequencies are length-normalised per field, weighted and summed
+    before BM25 saturation, and the resulting score of each (term, item)
+    pair is computed once at build time. A query then only adds up the
+    precomputed scores from the postings of its terms and takes the top
+    k with a heap. search() returns "section.key: value" strings, the
+    same format as KnowledgeIndex.search.
+    """
+
+    def __init__(self, knowledge_base, k1=1.2, fields=None, max_results=3):
+        self.knowledge_base = knowledge_base
+        self.k1 = k1
+        self.fields = fields or FIELDS
+        self.max_results = max_results
+        self.displays = []
+        self.postings = {}  # term -> [(entry id, score contribution)]
+
+        documents = []
+        for section, content in knowledge_base.items():
+            if not isinstance(content, dict):
+                continue
+            for key, value in content.items():
+                flattened_value = flatten_dict_value(value, key)
+                self.displays.append(f"{section}.{key}: {value if isinstance(value, str) else flattened_value}")
+                documents.append({
+                    'section': tokenize(section.replace('_', ' ')),
+                    'key': tokenize(key.replace('_', ' ')),
+                    'value': tokenize(flattened_value),
+                })
+        self.build(documents)
+
+    def build(self, documents):
+        count = len(documents)
+        if not count:
+            return
+        average_lengths = {
+            field: (sum(len(document[field]) for document in documents) / count) or 1.0
+            for field in self.fields
+        }
+
+        weighted = []
+        document_frequency = Counter()
+        for document in documents:
+            frequencies = {}
+            for field, options in self.fields.items():
+                terms = document[field]
+                norm = 1 - options['b'] + options['b'] * len(terms) / average_lengths[field]
+                for term, tf in Counter(terms).items():
+                    frequencies[term] = frequencies.get(term, 0.0) + options['weight'] * tf / norm
+            weighted.append(frequencies)
+            document_frequency.update(frequencies.keys())
+
+        for entry_id, frequencies in enumerate(weighted):
+            for term, tf in frequencies.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                self.postings.setdefault(term, []).append((entry_id, idf * tf / (self.k1 + tf)))
+
+    def scores(self, query):
+        """BM25F score of every item that shares a term with query"""
+        scores = {}
+        for term in set(tokenize(query)):
+            for entry_id, score in self.postings.get(term, ()):
+                scores[entry_id] = scores.get(entry_id, 0.0) + score
+        return scores
+
+    def search(self, query, k=None):
+        """The k best matching knowledge base items, best first"""
+        scores = self.scores(query)
+        # Ties go to the earlier item, keeping knowledge base order
+        top = heapq.nlargest(k or self.max_results, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [self.displays[entry_id] for entry_id, _ in top]
@@ -14,21 +14,73 @@ class Config:
     # Rate Limiting
     RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL') or 'memory://'
     RATELIMIT_DEFAULT = os.environ.get('RATE_LIMIT_PER_MINUTE', '10 per minute')
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() == 'true'
     
     # AI Configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     OPENROUTER_API_KEY = os.environ.get('OPENROUTER_API_KEY')
+    OPENROUTER_API_URL = os.environ.get('OPENROUTER_API_URL', 'https://openrouter.ai/api/v1/chat/completions')
     AI_MODEL = os.environ.get('AI_MODEL', 'deepseek/deepseek-r1:free')
     AI_PROVIDER = os.environ.get('AI_PROVIDER', 'openrouter')  # 'openai' or 'openrouter'
     MAX_TOKENS = int(os.environ.get('MAX_TOKENS', '300'))
     TEMPERATURE = float(os.environ.get('TEMPERATURE', '0.7'))
     SITE_URL = os.environ.get('SITE_URL', 'https://3mtt-chatbot.com')
     SITE_NAME = os.environ.get('SITE_NAME', '3MTT Chatbot')
+    AI_HTTP_POOL_SIZE = int(os.environ.get('AI_HTTP_POOL_SIZE', '16'))
+    AI_HTTP_TIMEOUT = float(os.environ.get('AI_HTTP_TIMEOUT', '30'))
+    AI_HTTP_CONNECT_TIMEOUT = float(os.environ.get('AI_HTTP_CONNECT_TIMEOUT', '5'))
+    AI_HTTP2 = os.environ.get('AI_HTTP2', 'true').lower() == 'true'
+    AI_CACHE_TIMEOUT = int(os.environ.get('AI_CACHE_TIMEOUT', '3600'))
+    SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+    SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', '0.9'))
+    SEMANTIC_CACHE_SIZE = int(os.environ.get('SEMANTIC_CACHE_SIZE', '1000'))
+    
+    # Provider circuit breakers: a provider is skipped for AI_BREAKER_OPEN_SECONDS
+    # once this share of its recent calls failed or took AI_BREAKER_SLOW_SECONDS
+    AI_BREAKER_FAILURE_RATE = float(os.environ.get('AI_BREAKER_FAILURE_RATE', '0.5'))
+    AI_BREAKER_SLOW_SECONDS = float(os.environ.get('AI_BREAKER_SLOW_SECONDS', '10'))
+    AI_BREAKER_SLOW_RATE = float(os.environ.get('AI_BREAKER_SLOW_RATE', '0.5'))
+    AI_BREAKER_MIN_CALLS = int(os.environ.get('AI_BREAKER_MIN_CALLS', '5'))
+    AI_BREAKER_WINDOW = float(os.environ.get('AI_BREAKER_WINDOW', '60'))
+    AI_BREAKER_OPEN_SECONDS = float(os.environ.get('AI_BREAKER_OPEN_SECONDS', '30'))
+    # Hedging asks the other provider too once the first is slower than its p95
+    AI_HEDGING = os.environ.get('AI_HEDGING', 'false').lower() == 'true'
+    AI_HEDGE_PERCENTILE = float(os.environ.get('AI_HEDGE_PERCENTILE', '0.95'))
+    AI_HEDGE_MIN_DELAY = float(os.environ.get('AI_HEDGE_MIN_DELAY', '1.0'))
+    # Identical questions asked at the same time share one provider call;
+    # waiters call the provider themselves once the call they wait on has
+    # run SINGLE_FLIGHT_TIMEOUT seconds (the provider timeout plus a margin)
+    SINGLE_FLIGHT_STORAGE_URL = os.environ.get('REDIS_URL') or 'memory://'
+    SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', AI_HTTP_TIMEOUT + 2))
+    
+    # Knowledge base served from the knowledge_base table; `flask load-knowledge`
+    # imports KNOWLEDGE_FILES ("path=priority,..."), and search results rank
+    # KNOWLEDGE_PRIORITY_BOOST higher for every priority level above 1
+    KNOWLEDGE_FILES = {
+        path.strip(): int(priority)
+        for path, priority in (item.split('=') for item in os.environ.get(
+            'KNOWLEDGE_FILES', 'knowledge_base.json=2,knowledge_base_expansion_ideas.json=1'
+        ).split(',') if item)
+    }
+    KNOWLEDGE_SEARCH_LIMIT = int(os.environ.get('KNOWLEDGE_SEARCH_LIMIT', '3'))
+    KNOWLEDGE_PRIORITY_BOOST = float(os.environ.get('KNOWLEDGE_PRIORITY_BOOST', '0.25'))
+    
+    # Conversation write-behind queue
+    CONVERSATION_BATCH_SIZE = int(os.environ.get('CONVERSATION_BATCH_SIZE', '50'))
+    CONVERSATION_FLUSH_INTERVAL = float(os.environ.get('CONVERSATION_FLUSH_INTERVAL', '1.0'))
+    CONVERSATION_QUEUE_SIZE = int(os.environ.get('CONVERSATION_QUEUE_SIZE', '10000'))
+    CONVERSATION_WRITE_RETRIES = int(os.environ.get('CONVERSATION_WRITE_RETRIES', '3'))
+    CONVERSATION_RETRY_BACKOFF = float(os.environ.get('CONVERSATION_RETRY_BACKOFF', '0.5'))  # Seconds, doubled per retry
+    
+    # Chat page (served with an ETag, so clients revalidate after max-age)
+    CHAT_PAGE_MAX_AGE = int(os.environ.get('CHAT_PAGE_MAX_AGE', '300'))
     
     # Security
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or SECRET_KEY
     ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
     ADMIN_PASSWORD_HASH = os.environ.get('ADMIN_PASSWORD_HASH')
+    JWT_EXPIRES_SECONDS = int(os.environ.get('JWT_EXPIRES_SECONDS', '3600'))
+    ADMIN_AUTH_CACHE_TTL = float(os.environ.get('ADMIN_AUTH_CACHE_TTL', '60'))  # Seconds an admin check is reused
     
     # CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
@@ -36,6 +88,20 @@ class Config:
     # Monitoring
     SENTRY_DSN = os.environ.get('SENTRY_DSN')
     PROMETHEUS_PORT = int(os.environ.get('PROMETHEUS_PORT', '9090'))
+    SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '2.0'))  # Log a per-stage breakdown above this
+    
+    # Request logging: events are rendered and written by a background thread
+    # when LOG_ASYNC is on. Successful requests are logged at LOG_SAMPLE_RATE,
+    # or a per-endpoint rate from LOG_SAMPLE_RATES ("index=0.05,chat=1");
+    # server errors and slow requests are always logged.
+    LOG_ASYNC = os.environ.get('LOG_ASYNC', 'true').lower() == 'true'
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
+    LOG_SAMPLE_RATES = {
+        endpoint.strip(): float(rate)
+        for endpoint, rate in (item.split('=') for item in os.environ.get('LOG_SAMPLE_RATES', '').split(',') if item)
+    }
+    LOG_SKIP_ENDPOINTS = tuple(os.environ.get('LOG_SKIP_ENDPOINTS', 'health_check,metrics').split(','))
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Append-only JSON-lines conversation log for the 3MTT Chatbot
+"""
+
+import fcntl
+import glob
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger('chatbot')
+
+class ConversationStore:
+    """Conversation history stored as one JSON object per line
+
+    Each turn is a single O_APPEND write, so appends cost the same no
+    matter how much history exists and concurrent workers never clobber
+    each other. When the active file grows past max_bytes it is rotated
+    into a timestamped segment; keep_segments bounds how many are kept.
+    """
+
+    def __init__(self, path='conversations.jsonl', legacy_path='conversations.json',
+                 max_bytes=50 * 1024 * 1024, keep_segments=None, session_index=None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.max_bytes = max_bytes
+        self.keep_segments = keep_segments
+        self.session_index = session_index
+        self.lock_path = f"{path}.lock"
+
+    @contextmanager
+    def locked(self):
+        """Serialize migration and rotation across processes"""
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, record):
+        """Append one conversation turn"""
+        if not os.path.exists(self.path):
+            self.migrate_legacy()
+        if self.session_index is not None:
+            self.ensure_session_index()
+
+        data = (json.dumps(record) + '\n').encode('utf-8')
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+        if self.session_index is not None:
+            try:
+                self.session_index.add(record)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to index conversation: {e}")
+
+        if self.max_bytes and size > self.max_bytes:
+            self.rotate()
+
+    def ensure_session_index(self):
+        """Build the session index from the log the first time it is used"""
+        if self.session_index.is_built():
+            return
+        with self.locked():
+            if not self.session_index.is_built():
+                self.session_index.rebuild(self.read_all())
+
+    def history(self, session_id, limit=5):
+        """Return the last limit turns of one session, oldest first"""
+        if self.session_index is None:
+            return [c for c in self.read_all() if c.get('session_id') == session_id][-limit:]
+        self.ensure_session_index()
+        return self.session_index.recent(session_id, limit)
+
+    def migrate_legacy(self):
+        """One-time import of the old conversations.json array into the log"""
+        with self.locked():
+            if os.path.exists(self.path) or not self.legacy_path or not os.path.exists(self.legacy_path):
+                return 0
+            try:
+                with open(self.legacy_path, 'r') as f:
+                    conversations = json.load(f)
+            except json.JSONDecodeError as e:
+                logger.error(f"Cannot migrate corrupted {self.legacy_path}: {e}")
+                conversations = []
+
+            tmp_path = f"{self.path}.migrating"
+            with open(tmp_path, 'w') as f:
+                for conversation in conversations:
+                    f.write(json.dumps(conversation) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            logger.info(f"Migrated {len(conversations)} conversations from {self.legacy_path}")
+            return len(conversations)
+
+    def rotate(self):
+        """Move the active file into a read-only segment and start a new one"""
+        with self.locked():
+            try:
+                if os.path.getsize(self.path) <= self.max_bytes:
+                    return None  # Another worker rotated first
+            except FileNotFoundError:
+                return None
+
+            segment = f"{self.path}.{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+            while os.path.exists(segment):
+                segment += '0'
+            os.rename(self.path, segment)
+            # Keep the active file present so the legacy migration never re-runs
+            os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o644))
+
+            if self.keep_segments is not None:
+                for old_segment in self.segments()[:-self.keep_segments or None]:
+                    os.remove(old_segment)
+            return segment
+
+    def segments(self):
+        """Rotated segments, oldest first"""
+        return sorted(p for p in glob.glob(f"{glob.escape(self.path)}.*")
+                      if p not in (self.lock_path, f"{self.path}.migrating"))
+
+    def iter_file(self, path):
+        """Yield records from one log file, skipping torn or corrupted lines"""
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def read_all(self):
+        """Yield every stored conversation, oldest first"""
+        if not os.path.exists(self.path) and not self.segments():
+            # Not migrated yet; the legacy file is still the source of truth
+            try:
+                with open(self.legacy_path, 'r') as f:
+                    yield from json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError, TypeError):
+                pass
+            return
+
+        for path in self.segments() + [self.path]:
+            yield from self.iter_file(path)
+
+    def recent(self, limit):
+        """Return the last limit conversations without reading the whole log"""
+        if not os.path.exists(self.path) and not self.segments():
+            return list(self.read_all())[-limit:]
+
+        records = []
+        for path in reversed(self.segments() + [self.path]):
+            records = self.tail_file(path, limit - len(records)) + records
+            if len(records) >= limit:
+                break
+        return records
+
+    def tail_file(self, path, limit, block_size=8192):
+        """Read the last limit records of one file by scanning backwards"""
+        if limit <= 0:
+            return []
+        try:
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                position = f.tell()
+                data = b''
+                while position > 0 and data.count(b'\n') <= limit:
+                    step = min(block_size, position)
+                    position -= step
+                    f.seek(position)
+                    data = f.read(step) + data
+        except FileNotFoundError:
+            return []
+
+        records = []
+        lines = data.splitlines()
+        if position > 0:
+            lines = lines[1:]  # First line may be partial
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return records[-limit:]
+
+class SessionIndex:
+    """SQLite index of the most recent turns of every session
+
+    Lookups use the (session_id, id) index, so fetching a session's last
+    N turns costs the same however much traffic has been logged. Only
+    keep_per_session turns are retained per session.
+    """
+
+    def __init__(self, path='conversations.index.db', keep_per_session=20):
+        self.path = path
+        self.keep_per_session = keep_per_session
+        self.local = threading.local()
+        self.built = False
+
+    def connection(self):
+        """Per-thread connection, reopened after a fork"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS history ('
+                         'id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, record TEXT NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS history_session ON history (session_id, id)')
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def is_built(self):
+        """Whether the index has been populated from the log"""
+        if not self.built:
+            row = self.connection().execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+            self.built = row is not None
+        return self.built
+
+    def insert(self, conn, record):
+        """Insert one turn and drop the session's turns beyond keep_per_session"""
+        session_id = record.get('session_id') or 'anonymous'
+        conn.execute('INSERT INTO history (session_id, record) VALUES (?, ?)', (session_id, json.dumps(record)))
+        conn.execute(
+            'DELETE FROM history WHERE session_id = ? AND id <= ('
+            'SELECT id FROM history WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)',
+            (session_id, session_id, self.keep_per_session)
+        )
+
+    def add(self, record):
+        """Index one newly appended turn"""
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self.insert(conn, record)
+
+    def rebuild(self, records):
+        """Replace the index with the given records"""
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM history')
+            for record in records:
+                self.insert(conn, record)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+        self.built = True
+
+    def recent(self, session_id, limit=5):
+        """Return the last limit turns of session_id, oldest first"""
+        rows = self.connection().execute(
+            'SELECT record FROM history WHERE session_id = ? ORDER BY id DESC LIMIT ?',
+            (session_id, limit)
+        ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+def main():
+    """Migrate conversations.json into the append-only log"""
+    legacy_path = sys.argv[1] if len(sys.argv) > 1 else 'conversations.json'
+    path = sys.argv[2] if len(sys.argv) > 2 else 'conversations.jsonl'
+    store = ConversationStore(path, legacy_path)
+
+    if os.path.exists(path):
+        print(f"✅ {path} already exists - nothing to migrate")
+        return
+
+    count = store.migrate_legacy()
+    print(f"✅ Migrated {count} conversations from {legacy_path} to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from models import db, Conversation
+from analytics_db import DatabaseRollup
+from monitoring import log_conversation_dropped, log_conversation_flush, set_conversation_queue_depth, logger
+
+class ConversationWriter:
+    """Write-behind queue that persists Conversation rows in batches
+
+    Requests only enqueue a row; a background thread inserts queued rows
+    with a single executemany once batch_size rows are waiting or
+    flush_interval seconds have passed. The queue holds at most max_queue
+    rows: when it is full, submit() waits up to put_timeout and then
+    writes the row itself, so a slow database pushes back on requests
+    instead of growing memory or dropping conversations. Each batch also
+    updates the analytics rollups in the same transaction, inside a
+    savepoint: if that fails the conversations are still written and the
+    rollups are marked stale until `flask backfill-analytics` rebuilds them.
+
+    A failed batch is retried up to retries times with exponential
+    backoff, then written row by row so one bad row cannot sink the rest.
+    Rows that still fail are logged and counted in
+    conversation_rows_dropped_total.
+    """
+
+    def __init__(self, app, batch_size=50, flush_interval=1.0, max_queue=10000, put_timeout=0.5,
+                 retries=3, retry_backoff=0.5):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.rollup = DatabaseRollup()
+        app.extensions['conversation_writer'] = self
+        atexit.register(self.drain)
+
+    def ensure_started(self):
+        """Start the flush thread in this process (threads do not survive a fork)"""
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.stopping.clear()
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, name='conversation-writer', daemon=True)
+                self.thread.start()
+
+    def submit(self, **fields):
+        """Queue one conversation row for insertion"""
+        fields.setdefault('id', str(uuid.uuid4()))
+        fields.setdefault('created_at', datetime.utcnow())
+        self.ensure_started()
+        try:
+            self.queue.put(fields, timeout=self.put_timeout)
+        except queue.Full:
+            logger.warning("Conversation queue full, writing synchronously", depth=self.queue.qsize())
+            self.flush([fields])
+        set_conversation_queue_depth(self.queue.qsize())
+        return fields['id']
+
+    def take_batch(self, timeout):
+        """Collect up to batch_size rows, waiting at most timeout for the first"""
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while not self.stopping.is_set():
+            batch = self.take_batch(self.flush_interval)
+            if batch:
+                self.flush(batch)
+
+    def flush(self, batch):
+        """Insert a batch of rows, retrying and then falling back to one row at a time"""
+        start = time.time()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            if self.write(batch):
+                log_conversation_flush(len(batch), time.time() - start)
+                set_conversation_queue_depth(self.queue.qsize())
+                return True
+
+        written = 0
+        for row in batch:
+            if self.write([row]):
+                written += 1
+            else:
+                logger.error("Conversation dropped", conversation_id=row.get('id'), session_id=row.get('session_id'))
+        if written:
+            log_conversation_flush(written, time.time() - start)
+        if written < len(batch):
+            log_conversation_dropped(len(batch) - written)
+        set_conversation_queue_depth(self.queue.qsize())
+        return written == len(batch)
+
+    def write(self, rows):
+        """Insert rows and their rollup updates in one transaction"""
+        with self.app.app_context():
+            try:
+                self.rollup.ensure_tables()
+            except Exception as e:
+                logger.warning("Could not create analytics rollup tables", error=str(e))
+            try:
+                db.session.execute(db.insert(Conversation), rows)
+                self.apply_rollup(rows)
+                db.session.commit()
+                return True
+            except Exception as e:
+                db.session.rollback()
+                logger.warning("Conversation write failed", error=str(e), rows=len(rows))
+                return False
+            finally:
+                db.session.remove()
+
+    def apply_rollup(self, rows):
+        """Update the analytics rollups in a savepoint, so a failure cannot lose the conversations"""
+        try:
+            with db.session.begin_nested():
+                self.rollup.apply(db.session, self.rollup.delta(rows))
+        except Exception as e:
+            logger.error("Analytics rollup update failed; run flask backfill-analytics", error=str(e), rows=len(rows))
+            try:
+                self.rollup.mark_stale(db.session, len(rows))
+            except Exception as e:
+                logger.error("Could not mark analytics rollups stale", error=str(e))
+
+    def drain(self, timeout=10):
+        """Stop the flush thread and write everything still queued"""
+        self.stopping.set()
+        if self.thread is not None and self.pid == os.getpid():
+            self.thread.join(timeout)
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self.flush(batch)
@@ -1,3 +1,4 @@
+import glob
 import os
 
 # Server socket
@@ -6,7 +7,11 @@ backlog = 2048
 
 # Worker processes
 workers = int(os.environ.get('GUNICORN_WORKERS', '4'))
-worker_class = "sync"
+# gthread serves each request on a thread, so a chat blocked on the LLM
+# only occupies one of the worker's threads instead of the whole worker.
+# Keep AI_HTTP_POOL_SIZE >= threads so every thread gets a pooled connection.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '16'))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -25,13 +30,37 @@ access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"
 proc_name = '3mtt-chatbot'
 
 # Server mechanics
-preload_app = True
+# gevent/eventlet must monkey-patch before the app imports its clients
+preload_app = worker_class not in ('gevent', 'eventlet')
 daemon = False
 pidfile = '/tmp/gunicorn.pid'
 user = None
 group = None
 tmp_upload_dir = None
 
+# Prometheus multiprocess mode: workers write metrics to mmap files in this
+# directory and /metrics aggregates them. It must be set before the app
+# (and prometheus_client) is imported, which preload_app does right after
+# this file is read.
+prometheus_multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/3mtt-chatbot-metrics')
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
 # SSL (if certificates are provided)
 keyfile = os.environ.get('SSL_KEYFILE')
-certfile = os.environ.get('SSL_CERTFILE')
\ No newline at end of file
+certfile = os.environ.get('SSL_CERTFILE')
+
+def on_starting(server):
+    """Discard metric files left by a previous run"""
+    for path in glob.glob(os.path.join(prometheus_multiproc_dir, '*.db')):
+        os.remove(path)
+
+def child_exit(server, worker):
+    """Drop the exited worker's live gauges from the aggregated metrics"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def worker_exit(server, worker):
+    """Write out queued conversations before the worker exits"""
+    writer = getattr(worker.wsgi, 'extensions', {}).get('conversation_writer')
+    if writer is not None:
+        writer.drain()
@@ -0,0 +1,94 @@
+import re
+
+def build_trie_pattern(keywords):
+    """Regex matching the longest keyword that starts at the current position
+
+    Keywords are merged into a character trie so the regex engine only
+    follows branches that agree with the text, instead of trying every
+    keyword in turn. Greedy optional groups make the deepest terminal on
+    the matched path win, which is always the longest matching keyword.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def render(node):
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return render(trie)
+
+class IntentMatcher:
+    """Maps every keyword to its intents in a single pass over a message
+
+    Keywords are matched as case-insensitive substrings, exactly like the
+    `keyword in message.lower()` checks this replaces. intents maps each
+    intent to its keywords in priority order. exclusions optionally maps an
+    intent to keywords that veto it, so first() can express chains such as
+    "change or course, unless end or finish".
+    """
+
+    def __init__(self, intents, exclusions=None):
+        self.priority = {intent: rank for rank, intent in enumerate(intents)}
+        self.exclusions = {intent: frozenset(keyword.lower() for keyword in keywords)
+                           for intent, keywords in (exclusions or {}).items()}
+
+        self.keyword_intents = {}
+        for intent, keywords in intents.items():
+            for keyword in dict.fromkeys(keyword.lower() for keyword in keywords):
+                if keyword:
+                    self.keyword_intents.setdefault(keyword, []).append(intent)
+
+        keywords = set(self.keyword_intents)
+        for vetoes in self.exclusions.values():
+            keywords.update(keyword for keyword in vetoes if keyword)
+
+        # The regex reports only the longest keyword at each position; every
+        # shorter keyword that starts there is one of its prefixes
+        self.prefixes = {
+            keyword: frozenset(keyword[:end] for end in range(1, len(keyword) + 1) if keyword[:end] in keywords)
+            for keyword in keywords
+        }
+        self.pattern = re.compile('(?=(' + build_trie_pattern(keywords) + '))') if keywords else None
+
+    def matched_keywords(self, text):
+        """Set of distinct keywords that occur anywhere in text"""
+        if self.pattern is None:
+            return set()
+        matched = set()
+        for match in self.pattern.finditer(text.lower()):
+            matched.update(self.prefixes[match.group(1)])
+        return matched
+
+    def counts(self, text):
+        """Number of distinct keywords each intent has in text"""
+        counts = {}
+        for keyword in self.matched_keywords(text):
+            for intent in self.keyword_intents.get(keyword, ()):
+                counts[intent] = counts.get(intent, 0) + 1
+        return counts
+
+    def first(self, text, default=None):
+        """Highest-priority intent with any keyword in text (an if/elif chain)"""
+        matched = self.matched_keywords(text)
+        candidates = set()
+        for keyword in matched:
+            candidates.update(self.keyword_intents.get(keyword, ()))
+        candidates = [intent for intent in candidates
+                      if not self.exclusions.get(intent, frozenset()) & matched]
+        if not candidates:
+            return default
+        return min(candidates, key=self.priority.__getitem__)
+
+    def best(self, text, default=None):
+        """Intent with the most distinct keywords in text; ties go to the higher priority"""
+        counts = self.counts(text)
+        if not counts:
+            return default
+        return min(counts, key=lambda intent: (-counts[intent], self.priority[intent]))
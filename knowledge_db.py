@@ -0,0 +1,189 @@
+import json
+import uuid
+from collections import namedtuple
+from sqlalchemy import DDL, event, or_, text
+from models import db, KnowledgeBase
+from knowledge_index import flatten_dict_value
+from text_analysis import content_words
+
+# Full-text index kept in step with knowledge_base by the database itself,
+# so every worker and node searches the same, current entries.
+# SQLite: an external-content FTS5 table over the knowledge_base rows.
+# VACUUM can renumber rowids, so rebuild the index after one
+# (flask load-knowledge --rebuild-index).
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_base_fts USING fts5(
+        category, question, answer, keywords,
+        content='knowledge_base', content_rowid='rowid', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS knowledge_base_fts_insert AFTER INSERT ON knowledge_base BEGIN
+        INSERT INTO knowledge_base_fts (rowid, category, question, answer, keywords)
+        VALUES (new.rowid, new.category, new.question, new.answer, new.keywords);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS knowledge_base_fts_delete AFTER DELETE ON knowledge_base BEGIN
+        INSERT INTO knowledge_base_fts (knowledge_base_fts, rowid, category, question, answer, keywords)
+        VALUES ('delete', old.rowid, old.category, old.question, old.answer, old.keywords);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS knowledge_base_fts_update AFTER UPDATE ON knowledge_base BEGIN
+        INSERT INTO knowledge_base_fts (knowledge_base_fts, rowid, category, question, answer, keywords)
+        VALUES ('delete', old.rowid, old.category, old.question, old.answer, old.keywords);
+        INSERT INTO knowledge_base_fts (rowid, category, question, answer, keywords)
+        VALUES (new.rowid, new.category, new.question, new.answer, new.keywords);
+    END""",
+]
+
+# Postgres: a weighted tsvector column generated from the row, with a GIN
+# index over the active entries (needs PostgreSQL 12+)
+POSTGRES_SEARCH_DDL = [
+    """ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(question, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(keywords, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(answer, '')), 'C')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_knowledge_base_search ON knowledge_base USING GIN (search_vector) WHERE active",
+]
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(KnowledgeBase.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(KnowledgeBase.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+event.listen(KnowledgeBase.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS knowledge_base_fts').execute_if(dialect='sqlite'))
+
+def install_search_index(session=None, rebuild=False):
+    """Add the full-text index to an existing knowledge_base table (safe to repeat)"""
+    session = session or db.session
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        exists = session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'knowledge_base_fts'"
+        )).first()
+        for statement in SQLITE_SEARCH_DDL:
+            session.execute(text(statement))
+        if rebuild or not exists:
+            session.execute(text("INSERT INTO knowledge_base_fts (knowledge_base_fts) VALUES ('rebuild')"))
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_SEARCH_DDL:
+            session.execute(text(statement))
+    session.commit()
+
+KnowledgeMatch = namedtuple('KnowledgeMatch', 'id category question answer priority score')
+
+SQLITE_SEARCH = text("""
+    SELECT knowledge_base.id, knowledge_base.category, knowledge_base.question, knowledge_base.answer,
+           knowledge_base.priority,
+           -bm25(knowledge_base_fts, 1.0, 2.5, 1.0, 2.0) * (1 + :boost * (coalesce(knowledge_base.priority, 1) - 1)) AS score
+    FROM knowledge_base_fts JOIN knowledge_base ON knowledge_base.rowid = knowledge_base_fts.rowid
+    WHERE knowledge_base_fts MATCH :query AND knowledge_base.active
+    ORDER BY score DESC
+    LIMIT :limit
+""")
+
+POSTGRES_SEARCH = text("""
+    SELECT id, category, question, answer, priority,
+           ts_rank_cd(search_vector, query) * (1 + :boost * (coalesce(priority, 1) - 1)) AS score
+    FROM knowledge_base, to_tsquery('english', :query) AS query
+    WHERE active AND search_vector @@ query
+    ORDER BY score DESC
+    LIMIT :limit
+""")
+
+class KnowledgeSearch:
+    """Full-text search over the active KnowledgeBase entries
+
+    Entries are ranked by text relevance (BM25 on SQLite, ts_rank_cd on
+    Postgres), with question and keywords weighted above category and
+    answer, and then scaled up by priority_boost for every priority level
+    above 1. Query words are OR-ed, so an entry only needs one of them.
+    Other databases fall back to substring matches ordered by priority.
+    """
+
+    def __init__(self, priority_boost=0.25, limit=3, max_terms=16):
+        self.priority_boost = priority_boost
+        self.limit = limit
+        self.max_terms = max_terms
+
+    def terms(self, query):
+        return list(dict.fromkeys(content_words(query)))[:self.max_terms]
+
+    def search(self, query, limit=None, session=None):
+        """Best matching active entries for query, best first"""
+        session = session or db.session
+        terms = self.terms(query)
+        if not terms:
+            return []
+        limit = limit or self.limit
+        params = {'boost': self.priority_boost, 'limit': limit}
+        dialect = session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            rows = session.execute(SQLITE_SEARCH, {**params, 'query': ' OR '.join(f'"{term}"' for term in terms)})
+        elif dialect == 'postgresql':
+            rows = session.execute(POSTGRES_SEARCH, {**params, 'query': ' | '.join(terms)})
+        else:
+            return self.like_search(session, terms, limit)
+        return [KnowledgeMatch(*row) for row in rows]
+
+    def like_search(self, session, terms, limit):
+        columns = (KnowledgeBase.question, KnowledgeBase.answer, KnowledgeBase.keywords)
+        entries = session.query(KnowledgeBase).filter(
+            KnowledgeBase.active.is_(True),
+            or_(*(column.ilike(f"%{term}%") for term in terms for column in columns))
+        ).order_by(KnowledgeBase.priority.desc()).limit(limit)
+        return [KnowledgeMatch(entry.id, entry.category, entry.question, entry.answer, entry.priority, 0.0)
+                for entry in entries]
+
+# Entry ids derive from section.key, so loading a file again updates its entries
+KNOWLEDGE_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'https://3mtt-chatbot.com/knowledge-base')
+
+# Top-level keys that nest a file's sections (knowledge_base_expansion_ideas.json)
+WRAPPER_KEYS = ('expanded_knowledge_suggestions',)
+
+def knowledge_entries(data, priority=1):
+    """KnowledgeBase column values for every section.key item of a knowledge file"""
+    for wrapper in WRAPPER_KEYS:
+        if list(data) == [wrapper]:
+            data = data[wrapper]
+    for section, content in data.items():
+        if not isinstance(content, dict):
+            continue
+        for key, value in content.items():
+            yield {
+                'id': str(uuid.uuid5(KNOWLEDGE_NAMESPACE, f"{section}.{key}")),
+                'category': section,
+                'question': key.replace('_', ' ').capitalize(),
+                'answer': value if isinstance(value, str) else flatten_dict_value(value, key),
+                'keywords': json.dumps(content_words(key.replace('_', ' '))),
+                'priority': priority,
+            }
+
+def import_knowledge_files(files, session=None, batch_size=500):
+    """Insert or update entries from {path: priority}; returns (added, updated)
+
+    Files are read in order and the first file to define a section.key
+    wins. Updates leave active alone, so entries an admin switched off stay off.
+    """
+    session = session or db.session
+    entries = {}
+    for path, priority in files.items():
+        with open(path, 'r') as f:
+            for entry in knowledge_entries(json.load(f), priority):
+                entries.setdefault(entry['id'], entry)
+
+    added = updated = 0
+    ids = list(entries)
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        existing = {row.id: row for row in session.query(KnowledgeBase).filter(KnowledgeBase.id.in_(batch))}
+        for entry_id in batch:
+            row = existing.get(entry_id)
+            if row is None:
+                session.add(KnowledgeBase(active=True, **entries[entry_id]))
+                added += 1
+            else:
+                for column, value in entries[entry_id].items():
+                    setattr(row, column, value)
+                updated += 1
+        session.flush()
+    session.commit()
+    return added, updated
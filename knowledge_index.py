@@ -0,0 +1,184 @@
+from collections import Counter, defaultdict
+
+# Keyword categories used to boost related knowledge base entries
+KEYWORD_MAPPINGS = {
+    'dashboard': ['dashboard', 'score', 'sync', 'darey', 'different'],
+    'course': ['course', 'track', 'change', 'switch', 'program'],
+    'assessment': ['assessment', 'test', 'exam', 'evaluation', 'entry'],
+    'financial': ['financial', 'cost', 'fee', 'money', 'payment', 'support'],
+    'timeline': ['end', 'finish', 'when', 'date', 'timeline', 'cohort'],
+    'community': ['community', 'learning', 'group', 'assigned'],
+    'support': ['support', 'help', 'contact', 'assistance', 'hours'],
+    'onboarding': ['onboard', 'wait', 'waiting', 'start'],
+    'platform': ['platform', 'portal', 'login', 'access']
+}
+
+def flatten_dict_value(value, key_context=""):
+    """Flatten dictionary values for better searching"""
+    if isinstance(value, dict):
+        result = []
+        for k, v in value.items():
+            if isinstance(v, str):
+                result.append(f"{k}: {v}")
+            elif isinstance(v, list):
+                result.append(f"{k}: {', '.join(str(item) for item in v)}")
+            else:
+                result.append(f"{k}: {str(v)}")
+        return "; ".join(result)
+    elif isinstance(value, list):
+        return ", ".join(str(item) for item in value)
+    else:
+        return str(value)
+
+def linear_search(query, knowledge_base):
+    """Reference search that scans every entry; KnowledgeIndex.search must match it"""
+    query_lower = query.lower()
+    query_words = [word.strip() for word in query_lower.split() if len(word.strip()) > 2]
+
+    # Score each section based on relevance
+    section_scores = {}
+
+    for section, content in knowledge_base.items():
+        score = 0
+        matched_content = []
+
+        if isinstance(content, dict):
+            for key, value in content.items():
+                key_lower = key.lower()
+
+                # Flatten complex values for better searching
+                flattened_value = flatten_dict_value(value, key)
+                value_str = flattened_value.lower()
+
+                # Direct word matching
+                for word in query_words:
+                    if word in key_lower or word in value_str:
+                        score += 2
+                        content_key = f"{section}.{key}"
+                        if content_key not in [item.split(': ')[0] for item in matched_content]:
+                            # Use original value for display, not flattened
+                            if isinstance(value, str):
+                                matched_content.append(f"{content_key}: {value}")
+                            else:
+                                matched_content.append(f"{content_key}: {flattened_value}")
+
+                # Keyword category matching
+                for category, keywords in KEYWORD_MAPPINGS.items():
+                    if any(kw in query_lower for kw in keywords):
+                        if any(kw in key_lower or kw in value_str for kw in keywords):
+                            score += 3
+                            content_key = f"{section}.{key}"
+                            if content_key not in [item.split(': ')[0] for item in matched_content]:
+                                if isinstance(value, str):
+                                    matched_content.append(f"{content_key}: {value}")
+                                else:
+                                    matched_content.append(f"{content_key}: {flattened_value}")
+
+        if score > 0:
+            section_scores[section] = {'score': score, 'content': matched_content}
+
+    return rank_sections(section_scores)
+
+def rank_sections(section_scores):
+    """Pick the top items from the highest scoring sections"""
+    if not section_scores:
+        return []
+
+    # Sort by score and return top matches
+    sorted_sections = sorted(section_scores.items(), key=lambda x: x[1]['score'], reverse=True)
+    relevant_info = []
+
+    for section, data in sorted_sections[:2]:  # Top 2 sections
+        relevant_info.extend(data['content'][:2])  # Top 2 items per section
+
+    return relevant_info[:3]  # Maximum 3 items total
+
+def trigrams(text):
+    """Return the set of 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class KnowledgeEntry:
+    """A single section.key item of the knowledge base, pre-flattened"""
+
+    def __init__(self, section, key, value):
+        self.section = section
+        self.key_lower = key.lower()
+        flattened_value = flatten_dict_value(value, key)
+        self.value_str = flattened_value.lower()
+        content_key = f"{section}.{key}"
+        self.display = f"{content_key}: {value if isinstance(value, str) else flattened_value}"
+        # Keys containing ': ' defeat the de-duplication in linear_search
+        self.repeats = ': ' in content_key
+
+    def contains(self, text):
+        return text in self.key_lower or text in self.value_str
+
+class KnowledgeIndex:
+    """Inverted index over the knowledge base, built once and reused for every query
+
+    Query words are matched as substrings, so postings are keyed by
+    character trigrams: a word can only occur in entries that contain
+    all of its trigrams, and those few candidates are then checked exactly.
+    Results are identical to linear_search.
+    """
+
+    def __init__(self, knowledge_base):
+        self.knowledge_base = knowledge_base
+        self.entries = []
+        self.postings = defaultdict(set)
+        self.category_entries = {}
+
+        for section, content in knowledge_base.items():
+            if not isinstance(content, dict):
+                continue
+            for key, value in content.items():
+                entry = KnowledgeEntry(section, key, value)
+                entry_id = len(self.entries)
+                self.entries.append(entry)
+                for gram in trigrams(entry.key_lower) | trigrams(entry.value_str):
+                    self.postings[gram].add(entry_id)
+
+        for category, keywords in KEYWORD_MAPPINGS.items():
+            self.category_entries[category] = [
+                entry_id for entry_id, entry in enumerate(self.entries)
+                if any(entry.contains(kw) for kw in keywords)
+            ]
+
+    def entries_containing(self, word):
+        """Return ids of entries whose key or value contains word (len(word) >= 3)"""
+        candidate_sets = sorted((self.postings.get(gram, set()) for gram in trigrams(word)), key=len)
+        if not candidate_sets or not candidate_sets[0]:
+            return []
+        candidates = set.intersection(*candidate_sets)
+        return [entry_id for entry_id in candidates if self.entries[entry_id].contains(word)]
+
+    def search(self, query):
+        """Search the knowledge base for information relevant to query"""
+        query_lower = query.lower()
+        query_words = [word for word in query_lower.split() if len(word) > 2]
+
+        scores = Counter()
+        matches = Counter()
+        word_hits = {}
+        for word in query_words:
+            if word not in word_hits:
+                word_hits[word] = self.entries_containing(word)
+            for entry_id in word_hits[word]:
+                scores[entry_id] += 2
+                matches[entry_id] += 1
+
+        for category, keywords in KEYWORD_MAPPINGS.items():
+            if any(kw in query_lower for kw in keywords):
+                for entry_id in self.category_entries[category]:
+                    scores[entry_id] += 3
+                    matches[entry_id] += 1
+
+        # Entry ids follow knowledge base order, which keeps ties stable
+        section_scores = {}
+        for entry_id in sorted(scores):
+            entry = self.entries[entry_id]
+            data = section_scores.setdefault(entry.section, {'score': 0, 'content': []})
+            data['score'] += scores[entry_id]
+            data['content'].extend([entry.display] * (matches[entry_id] if entry.repeats else 1))
+
+        return rank_sections(section_scores)
@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bm25_index import BM25FIndex
+
+logger = logging.getLogger('chatbot')
+
+class KnowledgeSnapshot:
+    """An immutable view of the knowledge base together with its derived indexes"""
+
+    def __init__(self, knowledge_base, signature=None):
+        self.knowledge_base = knowledge_base
+        self.index = BM25FIndex(knowledge_base)
+        self.signature = signature
+
+class KnowledgeStore:
+    """Process-wide knowledge base that is parsed once and served from memory
+
+    The file is only re-read when its inode, size or mtime changes, or when
+    update() writes a new version. Each reload builds a complete new
+    snapshot before swapping it in, so readers always see either the old
+    or the new knowledge base, never a mix of the two.
+    """
+
+    def __init__(self, path='knowledge_base.json', check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.last_check = 0.0
+        self.snapshot = KnowledgeSnapshot({})
+        self.reload()
+
+    def file_signature(self):
+        """Identify the current version of the file on disk"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def reload(self, force=False):
+        """Re-read the file if it changed since the last load"""
+        with self.lock:
+            self.last_check = time.monotonic()
+            signature = self.file_signature()
+            if not force and signature == self.snapshot.signature:
+                return self.snapshot
+
+            if signature is None:
+                logger.warning("Knowledge base file not found. Using basic knowledge.")
+                self.snapshot = KnowledgeSnapshot({})
+                return self.snapshot
+
+            try:
+                with open(self.path, 'r') as f:
+                    knowledge_base = json.load(f)
+            except json.JSONDecodeError as e:
+                # Keep serving the last good version until the file is fixed
+                logger.error(f"Knowledge base JSON decode error: {e}")
+                return self.snapshot
+
+            self.snapshot = KnowledgeSnapshot(knowledge_base, signature)
+            logger.info("Knowledge base loaded", extra={'sections': len(knowledge_base)})
+            return self.snapshot
+
+    def current(self):
+        """Return the current snapshot, picking up on-disk changes"""
+        if time.monotonic() - self.last_check >= self.check_interval:
+            return self.reload()
+        return self.snapshot
+
+    def get(self):
+        """Return the current knowledge base (shared; do not mutate)"""
+        return self.current().knowledge_base
+
+    def update(self, knowledge_base):
+        """Atomically replace the knowledge base on disk and in memory"""
+        if not isinstance(knowledge_base, dict):
+            raise ValueError("Knowledge base must be a JSON object")
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.knowledge_base.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                # mkstemp creates the file 0600; keep the permissions of the file it replaces
+                if os.path.exists(self.path):
+                    os.fchmod(f.fileno(), os.stat(self.path).st_mode)
+                json.dump(knowledge_base, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self.lock:
+            self.snapshot = KnowledgeSnapshot(knowledge_base, self.file_signature())
+            self.last_check = time.monotonic()
+        return self.snapshot
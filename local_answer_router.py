@@ -0,0 +1,165 @@
+import json
+import math
+import threading
+import time
+from collections import namedtuple
+from text_analysis import tokenize
+
+# A possible local answer: source is 'training' or 'intent' (intent names
+# the response template that answer was rendered from)
+Candidate = namedtuple('Candidate', 'confidence source intent answer')
+
+def load_training_examples(path='training_data.json'):
+    """(question, answer) pairs from the training data file"""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return [(example['user_input'], example['expected_response'])
+            for example in data.get('training_examples', [])
+            if example.get('user_input') and example.get('expected_response')]
+
+class LocalAnswerRouter:
+    """Decide whether a message can be answered locally instead of by the LLM
+
+    Two kinds of local answer are scored between 0 and 1:
+
+    - a training example, by the cosine similarity of its question's
+      content words to the message's;
+    - an intent template, by how strongly the message matches it (0.3 per
+      keyword, up to two, 0.15 for beating every other intent and 0.25
+      when the knowledge base search returns an entry from one of the
+      template's sections), multiplied by the share of the message's
+      content words that the rendered answer or the matched keywords
+      contain. Keyword hits alone never make a canned answer confident.
+
+    A candidate that leaves out a number from the message (a cohort or
+    phase the answer is not about) scores 0. The best candidate is served
+    when it reaches threshold. The router also keeps the share of routed
+    messages it answered and an estimate of the provider time that saved.
+    """
+
+    def __init__(self, examples=(), intents=None, intent_sections=None, threshold=0.8):
+        self.intents = intents
+        self.intent_sections = {intent: frozenset(sections) for intent, sections in (intent_sections or {}).items()}
+        self.threshold = threshold
+        self.examples = []
+        self.postings = {}  # term -> ids of examples whose question has it
+        for question, answer in examples:
+            self.add_example(question, answer)
+
+        self.lock = threading.Lock()
+        self.routed = 0
+        self.answered = 0
+        self.local_seconds = 0.0
+        self.provider_calls = 0
+        self.provider_seconds = 0.0
+
+    def add_example(self, question, answer):
+        terms = frozenset(tokenize(question))
+        if not terms:
+            return
+        example_id = len(self.examples)
+        self.examples.append((terms, answer))
+        for term in terms:
+            self.postings.setdefault(term, []).append(example_id)
+
+    def best_example(self, terms):
+        """(similarity, answer, question terms) of the training question closest to terms"""
+        overlaps = {}
+        for term in terms:
+            for example_id in self.postings.get(term, ()):
+                overlaps[example_id] = overlaps.get(example_id, 0) + 1
+        best = (0.0, None, frozenset())
+        for example_id, overlap in overlaps.items():
+            example_terms, answer = self.examples[example_id]
+            similarity = overlap / math.sqrt(len(terms) * len(example_terms))
+            if similarity > best[0]:
+                best = (similarity, answer, example_terms)
+        return best
+
+    def best_intent(self, message, relevant_info):
+        """(strength, intent, matched keyword terms) of the strongest matching response template"""
+        if self.intents is None:
+            return 0.0, None, frozenset()
+        counts = self.intents.counts(message)
+        if not counts:
+            return 0.0, None, frozenset()
+        ranked = sorted(counts, key=lambda intent: (-counts[intent], self.intents.priority[intent]))
+        intent = ranked[0]
+        strength = 0.3 * min(counts[intent], 2)
+        if len(ranked) == 1 or counts[ranked[1]] < counts[intent]:
+            strength += 0.15
+        sections = {info.split('.', 1)[0] for info in relevant_info or ()}
+        if sections & self.intent_sections.get(intent, frozenset()):
+            strength += 0.25
+        keyword_terms = set()
+        for keyword in self.intents.matched_keywords(message):
+            if intent in self.intents.keyword_intents.get(keyword, ()):
+                keyword_terms.update(tokenize(keyword))
+        return strength, intent, frozenset(keyword_terms)
+
+    @staticmethod
+    def numbers_covered(terms, covered):
+        """Whether every number in terms (a cohort, a phase) is also in covered"""
+        return all(term in covered for term in terms if term.isdigit())
+
+    def coverage(self, terms, covered):
+        """Share of terms in covered; 0 if a number in terms is missing from covered"""
+        if not terms or not self.numbers_covered(terms, covered):
+            return 0.0
+        return len(terms & covered) / len(terms)
+
+    def score(self, message, relevant_info=None, render=None):
+        """Best local Candidate for message (confidence 0 if there is none)
+
+        render(intent) returns the text of a response template, or None if
+        it cannot be rendered; without it templates are never candidates.
+        """
+        terms = set(tokenize(message))
+        similarity, answer, question_terms = self.best_example(terms) if terms else (0.0, None, frozenset())
+        if not self.numbers_covered(terms, question_terms):
+            similarity = 0.0
+
+        confidence, intent, intent_answer = 0.0, None, None
+        strength, matched_intent, keyword_terms = self.best_intent(message, relevant_info)
+        if matched_intent is not None and render is not None:
+            intent_answer = render(matched_intent)
+            if intent_answer:
+                intent = matched_intent
+                confidence = round(strength * self.coverage(terms, set(tokenize(intent_answer)) | keyword_terms), 2)
+
+        if answer is not None and similarity >= confidence:
+            return Candidate(similarity, 'training', None, answer)
+        return Candidate(confidence, 'intent', intent, intent_answer)
+
+    def route(self, message, relevant_info=None, render=None):
+        """The Candidate to serve instead of calling the provider, or None"""
+        start = time.perf_counter()
+        candidate = self.score(message, relevant_info, render)
+        local = candidate.confidence >= self.threshold
+        with self.lock:
+            self.routed += 1
+            if local:
+                self.answered += 1
+                self.local_seconds += time.perf_counter() - start
+        return candidate if local else None
+
+    def record_provider_call(self, seconds):
+        """Record how long a message the router passed on took the provider"""
+        with self.lock:
+            self.provider_calls += 1
+            self.provider_seconds += seconds
+
+    def stats(self):
+        """Share of routed messages answered locally and provider time saved"""
+        with self.lock:
+            average_provider = self.provider_seconds / self.provider_calls if self.provider_calls else 0.0
+            return {
+                'routed': self.routed,
+                'answered_locally': self.answered,
+                'offload_rate': self.answered / self.routed if self.routed else 0.0,
+                'average_provider_seconds': average_provider,
+                'estimated_seconds_saved': max(0.0, self.answered * average_provider - self.local_seconds)
+            }
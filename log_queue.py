@@ -0,0 +1,72 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+class StdoutHandler(logging.StreamHandler):
+    """StreamHandler for whatever sys.stdout is when a record is written"""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+class BackgroundLogHandler(QueueHandler):
+    """Hand log records to a background thread that formats and writes them
+
+    emit() only puts the record on a bounded queue, so a request never
+    waits on JSON rendering or a slow stdout/pipe. When the queue is full
+    the record is dropped and counted rather than blocking the request.
+    The writer thread is started lazily in each process, since threads do
+    not survive gunicorn's fork of a preloaded app.
+    """
+
+    def __init__(self, target, max_queue=10000):
+        super().__init__(queue.Queue(maxsize=max_queue))
+        self.target = target
+        self.dropped = 0
+        self.listener = None
+        self.pid = None
+        self.start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def ensure_started(self):
+        """Start the writer thread in this process"""
+        if self.pid == os.getpid():
+            return
+        with self.start_lock:
+            if self.pid != os.getpid():
+                # A listener inherited over fork has no thread, so it is discarded
+                self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                self.listener.start()
+                self.pid = os.getpid()
+
+    def prepare(self, record):
+        # The target's formatter runs on the writer thread and needs the
+        # original record (structlog passes its event dict as record.msg)
+        return record
+
+    def enqueue(self, record):
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Write out queued records and stop the writer thread"""
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.pid = None
+        self.target.flush()
+
+    def close(self):
+        atexit.unregister(self.stop)
+        self.stop()
+        self.target.close()
+        super().close()
@@ -63,4 +63,19 @@ class AdminUser(db.Model):
     email = db.Column(db.String(120))
     active = db.Column(db.Boolean, default=True)
     last_login = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AnalyticsCounter(db.Model):
+    __tablename__ = 'analytics_counters'
+    
+    period = db.Column(db.String(8), primary_key=True)  # 'all', 'day' or 'hour'
+    bucket = db.Column(db.String(16), primary_key=True)  # '', '2024-07-20' or '2024-07-20T13'
+    sentiment = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class SessionSketch(db.Model):
+    __tablename__ = 'session_sketches'
+    
+    period = db.Column(db.String(8), primary_key=True)
+    bucket = db.Column(db.String(16), primary_key=True)
+    registers = db.Column(db.LargeBinary, nullable=False)  # HyperLogLog of session IDs
@@ -1,29 +1,59 @@
+import logging
+import os
+import random
 import time
+from datetime import datetime, timezone
 import structlog
-from prometheus_client import Counter, Histogram, Gauge, generate_latest
-from flask import request, g
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, generate_latest, multiprocess
+from flask import current_app, request, g
+from stage_timer import add_observer, start_request, stage_breakdown
+from log_queue import BackgroundLogHandler, StdoutHandler
 import sentry_sdk
 from sentry_sdk.integrations.flask import FlaskIntegration
 
+# Buckets spanning fast cached answers to LLM calls near the 30s worker timeout
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, float('inf'))
+
 # Prometheus metrics
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py) makes
+# every worker write its values to mmap files that get_metrics() aggregates
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status'])
-REQUEST_DURATION = Histogram('http_request_duration_seconds', 'HTTP request duration')
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'HTTP request duration', ['endpoint'], buckets=LATENCY_BUCKETS)
 CHAT_REQUESTS = Counter('chat_requests_total', 'Total chat requests', ['sentiment'])
-ACTIVE_SESSIONS = Gauge('active_sessions', 'Number of active chat sessions')
-AI_RESPONSE_TIME = Histogram('ai_response_time_seconds', 'AI response time')
+ACTIVE_SESSIONS = Gauge('active_sessions', 'Number of active chat sessions', multiprocess_mode='livesum')
+AI_RESPONSE_TIME = Histogram('ai_response_time_seconds', 'AI response time', buckets=LATENCY_BUCKETS)
+AI_TIME_TO_FIRST_TOKEN = Histogram('ai_time_to_first_token_seconds', 'Time until the first streamed AI token', buckets=LATENCY_BUCKETS)
+AI_CACHE_EVENTS = Counter('ai_response_cache_total', 'AI response cache events (evict counts evictions made by the app; '
+                          'Redis TTL and maxmemory evictions are not available here, see its INFO stats)', ['result'])
+CONVERSATION_QUEUE_DEPTH = Gauge('conversation_write_queue_depth', 'Conversations waiting to be written', multiprocess_mode='livesum')
+CONVERSATION_FLUSH_DURATION = Histogram('conversation_flush_duration_seconds', 'Conversation batch write duration')
+CONVERSATION_ROWS_WRITTEN = Counter('conversation_rows_written_total', 'Conversations written to the database')
+CONVERSATION_ROWS_DROPPED = Counter('conversation_rows_dropped_total', 'Conversations that could not be written after retries')
+PROVIDER_CIRCUIT_STATE = Gauge(
+    'ai_provider_circuit_state', 'LLM provider circuit breaker state (0 closed, 1 half-open, 2 open)',
+    ['provider'], multiprocess_mode='max'
+)
+AI_COALESCED_REQUESTS = Counter('ai_coalesced_requests_total', 'AI requests by single-flight role (leader, follower or fallback)', ['role'])
+AI_HEDGED_REQUESTS = Counter('ai_hedged_requests_total', 'Hedged AI requests by which provider answered first', ['winner'])
+CHAT_STAGE_DURATION = Histogram(
+    'chat_stage_duration_seconds', 'Time spent in each stage of the chat pipeline', ['stage'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05) + LATENCY_BUCKETS
+)
 
 # Configure structured logging
+# Only the cheap processors run in the request thread; the event dict is
+# then handed to the stdlib handler, whose ProcessorFormatter timestamps
+# and renders it (on a background thread when LOG_ASYNC is on). Exception
+# and stack info are captured here because they belong to this thread.
 structlog.configure(
     processors=[
         structlog.stdlib.filter_by_level,
         structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
         structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
+        structlog.stdlib.ProcessorFormatter.wrap_for_formatter
     ],
     context_class=dict,
     logger_factory=structlog.stdlib.LoggerFactory(),
@@ -31,10 +61,77 @@ structlog.configure(
     cache_logger_on_first_use=True,
 )
 
-logger = structlog.get_logger()
+LOGGER_NAME = 'chatbot.events'
+logger = structlog.get_logger(LOGGER_NAME)
+
+def add_record_timestamp(_, __, event_dict):
+    """Timestamp an event with when it was logged, not when it was rendered"""
+    record = event_dict.get('_record')
+    if record is not None:
+        event_dict['timestamp'] = datetime.fromtimestamp(record.created, timezone.utc).isoformat()
+    return event_dict
+
+def configure_logging(async_mode=True, max_queue=10000, stream=None):
+    """Send structured events to stream as JSON lines, rendered off the request thread if async_mode"""
+    target = logging.StreamHandler(stream) if stream is not None else StdoutHandler()
+    target.setFormatter(structlog.stdlib.ProcessorFormatter(
+        processors=[
+            add_record_timestamp,
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.JSONRenderer()
+        ],
+        foreign_pre_chain=[structlog.stdlib.add_log_level]
+    ))
+    handler = BackgroundLogHandler(target, max_queue) if async_mode else target
+
+    events = logging.getLogger(LOGGER_NAME)
+    for old in list(events.handlers):
+        events.removeHandler(old)
+        old.close()
+    events.addHandler(handler)
+    events.setLevel(logging.INFO)
+    events.propagate = False
+    return handler
+
+class RequestLogSampler:
+    """Decide which finished requests get a request_completed event
+
+    Endpoints in skip (health probes, metrics scrapes) are never logged.
+    Server errors and slow requests are always logged; anything else is
+    logged with its endpoint's rate from rates, or default_rate.
+    """
+
+    def __init__(self, default_rate=1.0, rates=None, skip=('health_check', 'metrics'),
+                 slow_seconds=2.0, random=random.random):
+        self.default_rate = default_rate
+        self.rates = rates or {}
+        self.skip = frozenset(skip)
+        self.slow_seconds = slow_seconds
+        self.random = random
+
+    def rate(self, endpoint):
+        return self.rates.get(endpoint, self.default_rate)
+
+    def should_log(self, endpoint, status_code, duration):
+        if endpoint in self.skip:
+            return False
+        if status_code >= 500 or duration >= self.slow_seconds:
+            return True
+        rate = self.rate(endpoint)
+        return rate >= 1.0 or (rate > 0 and self.random() < rate)
+
+default_sampler = RequestLogSampler()
 
 def init_monitoring(app):
     """Initialize monitoring and logging"""
+    configure_logging(app.config.get('LOG_ASYNC', True), app.config.get('LOG_QUEUE_SIZE', 10000))
+    app.extensions['request_log_sampler'] = RequestLogSampler(
+        default_rate=app.config.get('LOG_SAMPLE_RATE', 1.0),
+        rates=app.config.get('LOG_SAMPLE_RATES'),
+        skip=app.config.get('LOG_SKIP_ENDPOINTS', ('health_check', 'metrics')),
+        slow_seconds=app.config.get('SLOW_REQUEST_SECONDS', 2.0)
+    )
     if app.config.get('SENTRY_DSN'):
         sentry_sdk.init(
             dsn=app.config['SENTRY_DSN'],
@@ -43,8 +140,21 @@ def init_monitoring(app):
             environment=app.config.get('FLASK_ENV', 'production')
         )
 
+# One histogram child per stage, so recording a stage skips the labels() lookup
+stage_histograms = {}
+
+def observe_stage(name, seconds):
+    """Record a chat pipeline stage duration"""
+    histogram = stage_histograms.get(name)
+    if histogram is None:
+        histogram = stage_histograms[name] = CHAT_STAGE_DURATION.labels(stage=name)
+    histogram.observe(seconds)
+
+add_observer(observe_stage)
+
 def before_request():
     """Track request start time"""
+    start_request()
     g.start_time = time.time()
     g.request_id = f"{int(time.time())}-{id(request)}"
 
@@ -52,21 +162,34 @@ def after_request(response):
     """Log request metrics"""
     if hasattr(g, 'start_time'):
         duration = time.time() - g.start_time
-        REQUEST_DURATION.observe(duration)
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_DURATION.labels(endpoint=endpoint).observe(duration)
         REQUEST_COUNT.labels(
             method=request.method,
-            endpoint=request.endpoint or 'unknown',
+            endpoint=endpoint,
             status=response.status_code
         ).inc()
         
-        logger.info(
-            "request_completed",
-            method=request.method,
-            endpoint=request.endpoint,
-            status_code=response.status_code,
-            duration=duration,
-            request_id=getattr(g, 'request_id', 'unknown')
-        )
+        sampler = current_app.extensions.get('request_log_sampler', default_sampler)
+        if sampler.should_log(endpoint, response.status_code, duration):
+            logger.info(
+                "request_completed",
+                method=request.method,
+                endpoint=request.endpoint,
+                status_code=response.status_code,
+                duration=duration,
+                sample_rate=sampler.rate(endpoint),
+                request_id=getattr(g, 'request_id', 'unknown')
+            )
+        
+        if duration >= sampler.slow_seconds:
+            logger.warning(
+                "slow_request",
+                endpoint=endpoint,
+                duration=duration,
+                stages_ms=stage_breakdown(),
+                request_id=getattr(g, 'request_id', 'unknown')
+            )
     
     return response
 
@@ -75,6 +198,45 @@ def log_chat_interaction(sentiment, response_time):
     CHAT_REQUESTS.labels(sentiment=sentiment).inc()
     AI_RESPONSE_TIME.observe(response_time)
 
+def log_time_to_first_token(seconds):
+    """Log how long a streamed AI response took to start"""
+    AI_TIME_TO_FIRST_TOKEN.observe(seconds)
+
+def log_cache_event(result):
+    """Log AI response cache metrics (hit, miss, evict or a semantic_* event)"""
+    AI_CACHE_EVENTS.labels(result=result).inc()
+
+CIRCUIT_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def set_circuit_state(provider, state):
+    """Record an LLM provider's circuit breaker state"""
+    PROVIDER_CIRCUIT_STATE.labels(provider=provider).set(CIRCUIT_STATE_VALUES[state])
+
+def log_hedge_outcome(winner):
+    """Log which provider won a hedged request (primary, secondary or failed)"""
+    AI_HEDGED_REQUESTS.labels(winner=winner).inc()
+
+def log_coalesced_request(role):
+    """Log whether a request called the provider itself or shared another request's call"""
+    AI_COALESCED_REQUESTS.labels(role=role).inc()
+
+def set_conversation_queue_depth(depth):
+    """Record how many conversations are waiting to be written"""
+    CONVERSATION_QUEUE_DEPTH.set(depth)
+
+def log_conversation_flush(rows, duration):
+    """Log conversation batch write metrics"""
+    CONVERSATION_FLUSH_DURATION.observe(duration)
+    CONVERSATION_ROWS_WRITTEN.inc(rows)
+
+def log_conversation_dropped(rows):
+    """Count conversations given up on after every write attempt failed"""
+    CONVERSATION_ROWS_DROPPED.inc(rows)
+
 def get_metrics():
-    """Get Prometheus metrics"""
+    """Get Prometheus metrics, aggregated over all workers in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
     return generate_latest()
\ No newline at end of file
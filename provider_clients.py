@@ -0,0 +1,94 @@
+import os
+import threading
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # openai bundles its own transport; pool limits then use its defaults
+    httpx = None
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class ProviderClients:
+    """Per-worker HTTP clients for the LLM providers
+
+    Connections are pooled and kept alive between chat requests, so only
+    the first request to a provider pays for the TCP and TLS handshakes.
+    Clients are created lazily and rebuilt after a fork, because pooled
+    sockets must never be shared between gunicorn workers.
+    """
+
+    def __init__(self, pool_size=10, timeout=30, connect_timeout=5, http2=True):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.lock = threading.Lock()
+        self.pid = None
+        self.session = None
+        self.openai_clients = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            pool_size=config['AI_HTTP_POOL_SIZE'],
+            timeout=config['AI_HTTP_TIMEOUT'],
+            connect_timeout=config['AI_HTTP_CONNECT_TIMEOUT'],
+            http2=config['AI_HTTP2']
+        )
+
+    def check_pid(self):
+        """Drop clients inherited from the parent process"""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.session = None
+            self.openai_clients = {}
+
+    def http_session(self):
+        """Shared keep-alive requests session (used for OpenRouter)"""
+        with self.lock:
+            self.check_pid()
+            if self.session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self.session = session
+            return self.session
+
+    def request_timeout(self):
+        """(connect, read) timeout for requests calls"""
+        return (self.connect_timeout, self.timeout)
+
+    def openai_client(self, api_key):
+        """Shared OpenAI client for api_key"""
+        with self.lock:
+            self.check_pid()
+            client = self.openai_clients.get(api_key)
+            if client is None:
+                options = {'api_key': api_key, 'timeout': self.timeout}
+                if httpx is not None:
+                    options['http_client'] = httpx.Client(
+                        http2=self.http2,
+                        timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                        limits=httpx.Limits(max_connections=self.pool_size,
+                                            max_keepalive_connections=self.pool_size)
+                    )
+                client = self.openai_clients[api_key] = openai.OpenAI(**options)
+            return client
+
+    def close(self):
+        """Close pooled connections"""
+        with self.lock:
+            if self.session is not None:
+                self.session.close()
+            for client in self.openai_clients.values():
+                client.close()
+            self.session = None
+            self.openai_clients = {}
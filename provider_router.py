@@ -0,0 +1,273 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from monitoring import set_circuit_state, log_hedge_outcome, logger
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+
+class ProviderUnavailable(Exception):
+    """No provider could answer: every breaker is open or every call failed"""
+
+class CircuitBreaker:
+    """Stop calling a provider that keeps failing or answering slowly
+
+    Outcomes of the last window seconds are kept. Once at least min_calls
+    have been seen, the breaker opens if the share of failures reaches
+    failure_rate or the share of calls slower than slow_seconds reaches
+    slow_rate. An open breaker rejects calls for open_seconds, then lets
+    half_open_calls probes through: if they all succeed it closes, and if
+    one fails it opens again.
+    """
+
+    def __init__(self, name, failure_rate=0.5, slow_seconds=10.0, slow_rate=0.5, min_calls=5,
+                 window=60.0, open_seconds=30.0, half_open_calls=1, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.outcomes = deque()  # (finished at, failed, slow)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes_started = 0
+        self.probes_passed = 0
+        set_circuit_state(name, CLOSED)
+
+    def transition(self, state):
+        self.state = state
+        if state == OPEN:
+            self.opened_at = self.clock()
+        self.outcomes.clear()
+        self.probes_started = self.probes_passed = 0
+        set_circuit_state(self.name, state)
+        logger.warning("Provider circuit changed", provider=self.name, state=state)
+
+    def allow(self):
+        """Whether a call may go to the provider now (a half-open probe counts as taken)"""
+        with self.lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.open_seconds:
+                    return False
+                self.transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self.probes_started >= self.half_open_calls:
+                    return False
+                self.probes_started += 1
+            return True
+
+    def record(self, success, duration):
+        """Record the outcome of a call allow() let through"""
+        slow = duration >= self.slow_seconds
+        with self.lock:
+            if self.state == HALF_OPEN:
+                if not success or slow:
+                    self.transition(OPEN)
+                else:
+                    self.probes_passed += 1
+                    if self.probes_passed >= self.half_open_calls:
+                        self.transition(CLOSED)
+                return
+            if self.state == OPEN:
+                return  # A call that started before the breaker opened
+
+            now = self.clock()
+            self.outcomes.append((now, not success, slow))
+            while self.outcomes and now - self.outcomes[0][0] > self.window:
+                self.outcomes.popleft()
+            calls = len(self.outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for _, failed, _ in self.outcomes if failed)
+            slow_calls = sum(1 for _, _, was_slow in self.outcomes if was_slow)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_rate:
+                self.transition(OPEN)
+
+class LatencyTracker:
+    """Recent successful response times of one provider"""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction, min_samples=20):
+        """The fraction-th latency, or None until min_samples calls have been seen"""
+        if len(self.samples) < min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class Provider:
+    """A named LLM backend: call(messages) returns text, stream(messages) yields tokens"""
+
+    def __init__(self, name, call, stream=None):
+        self.name = name
+        self.call = call
+        self.stream = stream
+
+class ProviderRouter:
+    """Send each message to the first provider whose circuit is closed
+
+    A provider that fails (or whose breaker is open) is skipped in favour of
+    the next one, so an outage costs one failed call instead of a timeout per
+    request. With hedging on, a secondary provider is also asked once the
+    primary has taken longer than its recent hedge_percentile latency (at
+    least hedge_min_delay), and whichever answers first wins.
+    """
+
+    def __init__(self, providers, breaker_options=None, hedging=False, hedge_percentile=0.95,
+                 hedge_min_delay=1.0, max_workers=16):
+        self.providers = list(providers)
+        self.breakers = {p.name: CircuitBreaker(p.name, **(breaker_options or {})) for p in self.providers}
+        self.latencies = {p.name: LatencyTracker() for p in self.providers}
+        self.hedging = hedging and len(self.providers) > 1
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pid = None
+
+    @classmethod
+    def from_config(cls, providers, config):
+        return cls(
+            providers,
+            breaker_options={
+                'failure_rate': config['AI_BREAKER_FAILURE_RATE'],
+                'slow_seconds': config['AI_BREAKER_SLOW_SECONDS'],
+                'slow_rate': config['AI_BREAKER_SLOW_RATE'],
+                'min_calls': config['AI_BREAKER_MIN_CALLS'],
+                'window': config['AI_BREAKER_WINDOW'],
+                'open_seconds': config['AI_BREAKER_OPEN_SECONDS']
+            },
+            hedging=config['AI_HEDGING'],
+            hedge_percentile=config['AI_HEDGE_PERCENTILE'],
+            hedge_min_delay=config['AI_HEDGE_MIN_DELAY'],
+            max_workers=config['AI_HTTP_POOL_SIZE']
+        )
+
+    def __bool__(self):
+        return bool(self.providers)
+
+    def get_executor(self):
+        """Thread pool for hedged calls, recreated after a fork"""
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='provider')
+            return self.executor
+
+    def timed_call(self, provider, message):
+        """Call a provider whose breaker allowed it, recording the outcome"""
+        start = time.monotonic()
+        try:
+            response = provider.call(message)
+        except Exception:
+            self.breakers[provider.name].record(False, time.monotonic() - start)
+            raise
+        duration = time.monotonic() - start
+        self.breakers[provider.name].record(True, duration)
+        self.latencies[provider.name].add(duration)
+        return response
+
+    def hedge_delay(self, provider):
+        p95 = self.latencies[provider.name].percentile(self.hedge_percentile)
+        return max(self.hedge_min_delay, p95 or 0.0)
+
+    def next_allowed(self, providers):
+        """Pop providers until one's breaker lets a call through"""
+        while providers:
+            provider = providers.pop(0)
+            if self.breakers[provider.name].allow():
+                return provider
+        return None
+
+    def call(self, message):
+        """Return (provider name, response) from the first provider to answer"""
+        remaining = list(self.providers)
+        errors = []
+        while True:
+            provider = self.next_allowed(remaining)
+            if provider is None:
+                raise ProviderUnavailable('; '.join(errors) or 'all provider circuits are open')
+            try:
+                if self.hedging and remaining:
+                    return self.hedged_call(provider, remaining, message)
+                return provider.name, self.timed_call(provider, message)
+            except ProviderUnavailable as e:
+                errors.append(str(e))
+            except Exception as e:
+                logger.warning("Provider call failed", provider=provider.name, error=str(e))
+                errors.append(f"{provider.name}: {e}")
+
+    def hedged_call(self, primary, remaining, message):
+        """Race primary against the next allowed provider once primary is slow"""
+        executor = self.get_executor()
+        futures = {executor.submit(self.timed_call, primary, message): primary}
+        done, _ = wait(futures, timeout=self.hedge_delay(primary))
+        if done:
+            return primary.name, next(iter(done)).result()  # Failures fall through to call()
+
+        secondary = self.next_allowed(remaining)
+        if secondary is None:
+            return primary.name, next(iter(futures)).result()
+        futures[executor.submit(self.timed_call, secondary, message)] = secondary
+
+        errors = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = futures[future]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    logger.warning("Provider call failed", provider=provider.name, error=str(e))
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+                log_hedge_outcome('primary' if provider is primary else 'secondary')
+                return provider.name, response
+        log_hedge_outcome('failed')
+        raise ProviderUnavailable('; '.join(errors))
+
+    def stream(self, message):
+        """Yield (provider name, token) pairs from the first provider that starts answering
+
+        A provider that fails before its first token is skipped like in
+        call(); once tokens have been sent a failure is raised to the caller.
+        """
+        remaining = [p for p in self.providers if p.stream is not None]
+        errors = []
+        while True:
+            provider = self.next_allowed(remaining)
+            if provider is None:
+                raise ProviderUnavailable('; '.join(errors) or 'all provider circuits are open')
+            start = time.monotonic()
+            started = False
+            try:
+                for token in provider.stream(message):
+                    started = True
+                    yield provider.name, token
+            except GeneratorExit:
+                # The client went away mid-answer; the provider itself was fine
+                self.breakers[provider.name].record(True, time.monotonic() - start)
+                raise
+            except Exception as e:
+                self.breakers[provider.name].record(False, time.monotonic() - start)
+                if started:
+                    raise
+                logger.warning("Provider stream failed", provider=provider.name, error=str(e))
+                errors.append(f"{provider.name}: {e}")
+                continue
+            duration = time.monotonic() - start
+            self.breakers[provider.name].record(True, duration)
+            self.latencies[provider.name].add(duration)
+            return
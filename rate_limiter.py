@@ -0,0 +1,155 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger('chatbot')
+
+class MemoryBackend:
+    """Per-process counters with least-recently-used eviction
+
+    Each key holds the request counts of the current and previous fixed
+    windows, so memory per client is constant and at most max_keys clients
+    are tracked; the least recently seen client is evicted first.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.counters = OrderedDict()  # key -> [window, previous, current]
+
+    def acquire(self, key, window, weight, limit):
+        with self.lock:
+            counter = self.counters.get(key)
+            if counter is None:
+                counter = self.counters[key] = [window, 0, 0]
+                if len(self.counters) > self.max_keys:
+                    self.counters.popitem(last=False)
+            else:
+                self.counters.move_to_end(key)
+                if counter[0] != window:
+                    counter[1] = counter[2] if counter[0] == window - 1 else 0
+                    counter[2] = 0
+                    counter[0] = window
+
+            if counter[1] * weight + counter[2] >= limit:
+                return False
+            counter[2] += 1
+            return True
+
+class SQLiteBackend:
+    """Counters in a SQLite file shared by every worker on the host
+
+    Clients idle for two windows are deleted once per window, so the
+    table only holds recently active clients.
+    """
+
+    def __init__(self, path='ratelimit.db'):
+        self.path = path
+        self.local = threading.local()
+        self.pruned_window = None
+
+    def connection(self):
+        """Per-thread connection, reopened after a fork"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # Counters are disposable
+            conn.execute('CREATE TABLE IF NOT EXISTS counters ('
+                         'key TEXT PRIMARY KEY, window INTEGER NOT NULL, '
+                         'previous INTEGER NOT NULL, current INTEGER NOT NULL)')
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def acquire(self, key, window, weight, limit):
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if self.pruned_window != window:
+                conn.execute('DELETE FROM counters WHERE window < ?', (window - 1,))
+                self.pruned_window = window
+
+            row = conn.execute('SELECT window, previous, current FROM counters WHERE key = ?', (key,)).fetchone()
+            previous, current = 0, 0
+            if row is not None:
+                if row[0] == window:
+                    previous, current = row[1], row[2]
+                elif row[0] == window - 1:
+                    previous = row[2]
+
+            if previous * weight + current >= limit:
+                return False
+            conn.execute('INSERT OR REPLACE INTO counters (key, window, previous, current) VALUES (?, ?, ?, ?)',
+                         (key, window, previous, current + 1))
+            return True
+
+class RedisBackend:
+    """Counters in Redis, shared by every worker that uses the same server
+
+    The check and the increment run as one Lua script, so concurrent
+    workers cannot both take the last slot. Window keys expire on their own.
+    """
+
+    SCRIPT = """
+    local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if previous * tonumber(ARGV[1]) + current >= tonumber(ARGV[2]) then
+        return 0
+    end
+    redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return 1
+    """
+
+    def __init__(self, client, window_seconds, prefix='ratelimit'):
+        self.script = client.register_script(self.SCRIPT)
+        self.expire = int(window_seconds * 2) + 1
+        self.prefix = prefix
+
+    def acquire(self, key, window, weight, limit):
+        keys = [f"{self.prefix}:{key}:{window}", f"{self.prefix}:{key}:{window - 1}"]
+        return bool(self.script(keys=keys, args=[repr(weight), limit, self.expire]))
+
+class RateLimiter:
+    """Sliding-window rate limiter with O(1) work per request
+
+    The request rate is estimated from two fixed-window counters: the
+    previous window's count, weighted by how much of it still overlaps
+    the sliding window, plus the current window's count. Rejected requests
+    are not counted. If a shared backend fails, limits fall back to this
+    process's own counters rather than blocking or waving every request through.
+    """
+
+    def __init__(self, limit, window=60, backend=None, clock=time.time, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self.fallback = MemoryBackend(max_keys)
+        self.backend = backend or self.fallback
+
+    def allow(self, key):
+        """Record a request for key; False if it is over the limit"""
+        window, offset = divmod(self.clock(), self.window)
+        weight = 1 - offset / self.window
+        try:
+            return self.backend.acquire(key, int(window), weight, self.limit)
+        except Exception as e:
+            if self.backend is self.fallback:
+                raise
+            logger.warning(f"Rate limit backend failed, using per-process limits: {e}")
+            return self.fallback.acquire(key, int(window), weight, self.limit)
+
+def create_rate_limiter(limit, window=60, storage_url='memory://', max_keys=10000):
+    """Rate limiter for a memory://, sqlite:///path or redis:// storage URL"""
+    if storage_url.startswith('redis://') or storage_url.startswith('rediss://'):
+        import redis
+        backend = RedisBackend(redis.Redis.from_url(storage_url, socket_timeout=0.5), window)
+    elif storage_url.startswith('sqlite:///'):
+        backend = SQLiteBackend(storage_url[len('sqlite:///'):])
+    else:
+        backend = None
+    return RateLimiter(limit, window, backend=backend, max_keys=max_keys)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+import zlib
+import numpy as np
+from monitoring import log_cache_event, logger
+from text_analysis import meaning_markers
+
+def normalize_message(message):
+    """Normalize a user message so trivially different phrasings share a key"""
+    return re.sub(r'\s+', ' ', message.strip().lower())
+
+def build_cache_key(message, provider, model, temperature, system_prompt, knowledge_version=''):
+    """Build a process-independent cache key for an AI response"""
+    payload = json.dumps({
+        'message': normalize_message(message),
+        'provider': provider,
+        'model': model,
+        'temperature': temperature,
+        'system_prompt': system_prompt,
+        'knowledge_version': knowledge_version
+    }, sort_keys=True)
+    return f"ai_response:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+class ResponseCache:
+    """AI response cache on top of a Flask-Caching backend"""
+
+    def __init__(self, cache, timeout=3600):
+        self.cache = cache
+        self.timeout = timeout
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss"""
+        try:
+            response = self.cache.get(key)
+        except Exception as e:
+            logger.warning("AI response cache unavailable", error=str(e))
+            response = None
+
+        if response is not None and not isinstance(response, str):
+            # Entry written by an older format; drop it
+            self.delete(key)
+            response = None
+
+        log_cache_event('hit' if response else 'miss')
+        return response or None
+
+    def peek(self, key):
+        """Return the cached response for key without recording a hit or miss"""
+        try:
+            response = self.cache.get(key)
+        except Exception:
+            return None
+        return response if isinstance(response, str) and response else None
+
+    def set(self, key, response):
+        """Store a response under key"""
+        try:
+            self.cache.set(key, response, timeout=self.timeout)
+        except Exception as e:
+            logger.warning("AI response cache write failed", error=str(e))
+
+    def delete(self, key):
+        """Evict a single cached response
+
+        Counted as 'evict'. Entries the backend drops by itself (TTL expiry,
+        maxmemory eviction) never pass through here and are not counted.
+        """
+        try:
+            self.cache.delete(key)
+        except Exception as e:
+            logger.warning("AI response cache delete failed", error=str(e))
+        log_cache_event('evict')
+
+class KnowledgeVersion:
+    """Version of the knowledge base that cached answers were written from
+
+    Kept in the shared cache backend, so flask load-knowledge, which runs in
+    its own process, moves every worker to a new version at once.
+    """
+
+    KEY = 'knowledge_version'
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self):
+        """The current version ('' if none was ever set or the backend is down)"""
+        try:
+            return self.cache.get(self.KEY) or ''
+        except Exception as e:
+            logger.warning("Knowledge version unavailable", error=str(e))
+            return ''
+
+    def bump(self):
+        """Start a new version, so answers cached from the old knowledge stop being served"""
+        version = uuid.uuid4().hex
+        self.cache.set(self.KEY, version, timeout=0)
+        return version
+
+class SemanticCache:
+    """In-process near-duplicate answer cache using character n-gram vectors
+
+    Messages are hashed into fixed-size, L2-normalized character trigram
+    vectors, so a lookup is a single matrix-vector product against every
+    stored question. A stored question only answers one whose numbers and
+    negation match its own, however close the vectors are. Entries expire
+    after ttl seconds and the least recently used entry is evicted when the
+    cache is full.
+    """
+
+    def __init__(self, threshold=0.9, max_entries=1000, ttl=3600, dimensions=2048, ngram=3):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.dimensions = dimensions
+        self.ngram = ngram
+        self.vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self.expires_at = np.zeros(max_entries, dtype=np.float64)
+        self.last_used = np.zeros(max_entries, dtype=np.float64)
+        self.responses = [None] * max_entries
+        self.markers = [None] * max_entries
+        self.knowledge_version = ''
+        self.lock = threading.Lock()
+
+    def vectorize(self, message):
+        """Hash the character n-grams of message into a unit vector"""
+        text = f" {normalize_message(message)} "
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for i in range(max(len(text) - self.ngram + 1, 1)):
+            gram = text[i:i + self.ngram]
+            vector[zlib.crc32(gram.encode('utf-8')) % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, message):
+        """Return the response stored for the closest previous message, if close enough"""
+        vector = self.vectorize(message)
+        markers = meaning_markers(message)
+        now = time.time()
+        with self.lock:
+            scores = self.vectors @ vector
+            scores[self.expires_at <= now] = -1.0
+            close = np.flatnonzero(scores >= self.threshold)
+            for slot in close[np.argsort(-scores[close])]:
+                if self.markers[slot] == markers:
+                    self.last_used[slot] = now
+                    log_cache_event('semantic_hit')
+                    return self.responses[slot]
+            log_cache_event('semantic_miss')
+            return None
+
+    def set(self, message, response):
+        """Remember response as the answer to message"""
+        vector = self.vectorize(message)
+        now = time.time()
+        with self.lock:
+            free = np.flatnonzero(self.expires_at <= now)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self.last_used))
+                log_cache_event('semantic_evict')
+            self.vectors[slot] = vector
+            self.expires_at[slot] = now + self.ttl
+            self.last_used[slot] = now
+            self.responses[slot] = response
+            self.markers[slot] = meaning_markers(message)
+
+    def sync(self, knowledge_version):
+        """Forget every entry when the knowledge they were answered from has changed"""
+        with self.lock:
+            if knowledge_version == self.knowledge_version:
+                return
+            self.knowledge_version = knowledge_version
+            self.expires_at[:] = 0.0
+            self.responses = [None] * self.max_entries
+            self.markers = [None] * self.max_entries
+
+    def __len__(self):
+        return int(np.count_nonzero(self.expires_at > time.time()))
@@ -7,13 +7,14 @@ from flask import request, jsonify, g
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from functools import wraps
-import time
-import re
-import html
+import os
+from input_validation import contains_malicious_content, sanitize_chat_payload
 
 class SecurityMiddleware:
     """Security middleware for the Flask app"""
     
+    CHAT_ENDPOINTS = ('chat', 'chat_stream')
+    
     def __init__(self, app):
         self.app = app
         self.setup_rate_limiting()
@@ -59,49 +60,21 @@ class SecurityMiddleware:
         """Setup input validation"""
         @self.app.before_request
         def validate_input():
-            if request.endpoint == 'chat' and request.method == 'POST':
+            if request.endpoint in self.CHAT_ENDPOINTS and request.method == 'POST':
                 # Check content length
                 if request.content_length and request.content_length > 10000:  # 10KB limit
                     return jsonify({'error': 'Request too large'}), 413
                 
-                # Validate JSON structure
-                try:
-                    data = request.get_json()
-                    if not data:
-                        return jsonify({'error': 'Invalid JSON'}), 400
-                    
-                    message = data.get('message', '')
-                    
-                    # Message length validation
-                    if len(message) > 1000:  # 1KB message limit
-                        return jsonify({'error': 'Message too long'}), 400
-                    
-                    # Basic XSS prevention
-                    if self.contains_malicious_content(message):
-                        return jsonify({'error': 'Invalid content detected'}), 400
-                    
-                    # Store sanitized message
-                    g.sanitized_message = html.escape(message)
-                    
-                except Exception:
-                    return jsonify({'error': 'Invalid request format'}), 400
+                # Parse once; the view reads the sanitized message from g
+                data = request.get_json(silent=True)
+                message, error = sanitize_chat_payload(data)
+                if error:
+                    return jsonify({'error': error}), 400
+                g.sanitized_message = message
     
     def contains_malicious_content(self, text):
         """Check for potentially malicious content"""
-        malicious_patterns = [
-            r'<script[^>]*>.*?</script>',  # Script tags
-            r'javascript:',                # JavaScript URLs
-            r'on\w+\s*=',                 # Event handlers
-            r'<iframe[^>]*>',             # Iframes
-            r'<object[^>]*>',             # Objects
-            r'<embed[^>]*>',              # Embeds
-        ]
-        
-        text_lower = text.lower()
-        for pattern in malicious_patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return True
-        return False
+        return contains_malicious_content(text)
 
 def require_api_key(f):
     """Decorator to require API key for admin endpoints"""
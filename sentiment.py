@@ -0,0 +1,61 @@
+from collections import Counter
+from intent_matcher import IntentMatcher
+
+POSITIVE_WORDS = ['good', 'great', 'excellent', 'happy', 'thank']
+NEGATIVE_WORDS = ['bad', 'terrible', 'angry', 'frustrated', 'problem']
+
+# app_simple's longer lexicon; train_chatbot scores app_simple's conversation
+# log with it too, so a message gets the same label live and in the reports
+CONVERSATION_LOG_POSITIVE_WORDS = ['good', 'great', 'excellent', 'happy', 'satisfied', 'thank', 'thanks', 'helpful']
+CONVERSATION_LOG_NEGATIVE_WORDS = ['bad', 'terrible', 'awful', 'angry', 'frustrated', 'disappointed', 'problem', 'issue', 'error']
+
+class SentimentAnalyzer:
+    """Lexicon sentiment scoring compiled into a single matcher
+
+    A message is positive or negative when it contains more distinct words
+    from that lexicon than from the other, matched as substrings of the
+    lowercased message. Both lexicons share one trie-shaped regex, so the
+    cost per character of message does not grow with the lexicon.
+    """
+
+    def __init__(self, positive_words=POSITIVE_WORDS, negative_words=NEGATIVE_WORDS):
+        self.matcher = IntentMatcher({'positive': positive_words, 'negative': negative_words})
+
+    def analyze(self, message):
+        """'positive', 'negative' or 'neutral' for one message"""
+        counts = self.matcher.counts(message)
+        positive_count = counts.get('positive', 0)
+        negative_count = counts.get('negative', 0)
+        if positive_count > negative_count:
+            return "positive"
+        elif negative_count > positive_count:
+            return "negative"
+        return "neutral"
+
+    def analyze_many(self, messages):
+        """Sentiment of each message, scoring each distinct message once"""
+        scored = {}
+        results = []
+        for message in messages:
+            sentiment = scored.get(message)
+            if sentiment is None:
+                sentiment = scored[message] = self.analyze(message)
+            results.append(sentiment)
+        return results
+
+    def distribution(self, conversations):
+        """Counter of sentiments over conversation dicts
+
+        Conversations that were stored with a sentiment keep it; the rest
+        are scored from their user_message in one batch.
+        """
+        counts = Counter()
+        unscored = []
+        for conv in conversations:
+            sentiment = conv.get('sentiment')
+            if sentiment:
+                counts[sentiment] += 1
+            else:
+                unscored.append(conv.get('user_message', ''))
+        counts.update(self.analyze_many(unscored))
+        return counts
@@ -0,0 +1,142 @@
+import threading
+import time
+import uuid
+from monitoring import log_coalesced_request, logger
+
+class Flight:
+    """One in-progress call that other requests can wait on"""
+
+    __slots__ = ('done', 'result', 'failed', 'started')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+        self.started = time.monotonic()
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one
+
+    Within a process, the first caller for a key (the leader) runs the
+    call and everyone else arriving before it finishes waits for its
+    result. Across processes, leaders take a short Redis lock; a leader
+    that finds the lock held polls lookup() (normally the shared response
+    cache) for the other worker's result instead of calling the provider.
+
+    wait_timeout should be the provider timeout plus a small margin: it is
+    counted from when the leader started, so a waiter never waits longer
+    than the leader's call can take. Waiters give up at that point, or as
+    soon as the leader fails, and make the call themselves.
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, redis_client=None, wait_timeout=32.0, lock_ttl=37.0, poll_interval=0.05,
+                 prefix='singleflight'):
+        self.redis = redis_client
+        self.release_script = redis_client.register_script(self.RELEASE_SCRIPT) if redis_client else None
+        self.wait_timeout = wait_timeout
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def do(self, key, fn, lookup=None):
+        """Return fn(), shared with every concurrent caller using the same key"""
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+
+        if not leader:
+            remaining = flight.started + self.wait_timeout - time.monotonic()
+            if flight.done.wait(max(0.0, remaining)) and not flight.failed:
+                log_coalesced_request('follower')
+                return flight.result
+            log_coalesced_request('fallback')
+            return fn()
+
+        try:
+            flight.result = self.lead(key, fn, lookup)
+            return flight.result
+        except BaseException:
+            flight.failed = True
+            raise
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight.done.set()
+
+    def lead(self, key, fn, lookup):
+        """Run fn for this process, unless another worker is already running it"""
+        if self.redis is None or lookup is None:
+            log_coalesced_request('leader')
+            return fn()
+
+        lock_key = f"{self.prefix}:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = bool(self.redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000)))
+            held_elsewhere = not acquired
+        except Exception as e:
+            logger.warning("Single-flight lock unavailable", error=str(e))
+            acquired = held_elsewhere = False
+
+        if not held_elsewhere:
+            log_coalesced_request('leader')
+            try:
+                return fn()
+            finally:
+                if acquired:
+                    self.release(lock_key, token)
+
+        result = self.wait_for_worker(lock_key, lookup)
+        if result is not None:
+            log_coalesced_request('follower')
+            return result
+        log_coalesced_request('fallback')
+        return fn()
+
+    def leader_deadline(self, lock_key):
+        """When to stop waiting for the worker holding lock_key: wait_timeout after it took the lock"""
+        try:
+            remaining = self.redis.pttl(lock_key) / 1000 - (self.lock_ttl - self.wait_timeout)
+        except Exception:
+            remaining = self.wait_timeout
+        return time.monotonic() + min(remaining, self.wait_timeout)
+
+    def wait_for_worker(self, lock_key, lookup):
+        """Poll for another worker's result until its lock goes away or its wait_timeout passes"""
+        deadline = self.leader_deadline(lock_key)
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            result = lookup()
+            if result is not None:
+                return result
+            try:
+                if not self.redis.exists(lock_key):
+                    return lookup()  # The leader finished; it may have stored a result just now
+            except Exception:
+                return None
+        return lookup()
+
+    def release(self, lock_key, token):
+        try:
+            self.release_script(keys=[lock_key], args=[token])
+        except Exception as e:
+            logger.warning("Single-flight lock release failed", error=str(e))
+
+def create_single_flight(storage_url='memory://', wait_timeout=32.0):
+    """Single-flight group for a memory:// or redis:// storage URL"""
+    client = None
+    if storage_url.startswith('redis://') or storage_url.startswith('rediss://'):
+        import redis
+        client = redis.Redis.from_url(storage_url, socket_timeout=0.5)
+    return SingleFlight(client, wait_timeout=wait_timeout, lock_ttl=wait_timeout + 5)
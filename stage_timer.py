@@ -0,0 +1,52 @@
+import time
+from contextvars import ContextVar
+
+# Stage name -> seconds for the request being served; a plain context
+# variable is much cheaper to read than flask.g on every span
+current_timings = ContextVar('stage_timings', default=None)
+
+# Callables taking (stage, seconds), run for every finished stage
+observers = []
+
+def add_observer(observer):
+    """Call observer(stage, seconds) whenever a stage finishes"""
+    observers.append(observer)
+
+def start_request():
+    """Begin collecting stage timings for a new request (call from before_request)"""
+    current_timings.set({})
+
+def record_stage(name, seconds):
+    """Add seconds to the current request's total for stage name"""
+    timings = current_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+    for observer in observers:
+        observer(name, seconds)
+
+class stage:
+    """Time a block of the request pipeline
+
+        with stage('knowledge_search'):
+            results = search_knowledge_base(message, knowledge_base)
+
+    A stage entered several times in one request is summed.
+    """
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        record_stage(self.name, time.perf_counter() - self.start)
+        return False
+
+def stage_breakdown():
+    """The current request's stage durations in milliseconds"""
+    timings = current_timings.get() or {}
+    return {name: round(seconds * 1000, 3) for name, seconds in timings.items()}
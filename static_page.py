@@ -0,0 +1,59 @@
+import gzip
+import hashlib
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # gzip variants are still served
+    brotli = None
+
+class StaticPage:
+    """A page rendered once and served as precompressed bytes
+
+    Every variant is compressed up front, so serving the page is a header
+    lookup. Each variant has its own strong ETag, and a request whose
+    If-None-Match lists the ETag of the variant it negotiates gets 304 Not
+    Modified with no body (holding another variant's ETag is not enough).
+    """
+
+    # Preferred order when the client accepts several encodings equally
+    ENCODINGS = ('br', 'gzip', 'identity')
+
+    def __init__(self, body, mimetype='text/html', max_age=300):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.mimetype = mimetype
+        self.cache_control = f"public, max-age={max_age}, must-revalidate"
+
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {'identity': (body, f'"{digest}"')}
+        self.variants['gzip'] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"')
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(body, mode=brotli.MODE_TEXT), f'"{digest}-br"')
+
+    def choose_encoding(self, accept_encodings):
+        """Best available encoding for a werkzeug Accept-Encoding header"""
+        best, best_quality = 'identity', 0
+        for encoding in self.ENCODINGS:
+            if encoding not in self.variants:
+                continue
+            quality = accept_encodings.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def response(self, request):
+        """Response for request: the negotiated variant, or 304 if it is cached"""
+        encoding = self.choose_encoding(request.accept_encodings)
+        body, etag = self.variants[encoding]
+        headers = {
+            'ETag': etag,
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding'
+        }
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+
+        if request.if_none_match.contains_weak(etag.strip('"')):
+            return Response(status=304, headers=headers)
+        return Response(body, mimetype=self.mimetype, headers=headers)
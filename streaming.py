@@ -0,0 +1,35 @@
+import json
+
+def format_sse(data, event=None):
+    """Encode one Server-Sent Events message"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def iter_sse_data(lines):
+    """Yield the JSON payloads of an OpenAI-style completion stream
+
+    Comment lines (OpenRouter sends ': OPENROUTER PROCESSING' keep-alives),
+    blank lines and malformed events are skipped; the stream ends at [DONE].
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.startswith('data:'):
+            continue
+        payload = line[len('data:'):].strip()
+        if payload == '[DONE]':
+            return
+        try:
+            yield json.loads(payload)
+        except json.JSONDecodeError:
+            continue
+
+def iter_completion_tokens(lines):
+    """Yield the content deltas of an OpenAI-style completion stream"""
+    for chunk in iter_sse_data(lines):
+        if 'error' in chunk:
+            raise Exception(f"Streaming API error: {chunk['error']}")
+        choices = chunk.get('choices') or [{}]
+        content = (choices[0].get('delta') or {}).get('content')
+        if content:
+            yield content
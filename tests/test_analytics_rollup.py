@@ -0,0 +1,49 @@
+from datetime import datetime
+from analytics_rollup import HyperLogLog, RollupDelta, SQLiteRollup
+
+def test_hyperloglog_estimates_distinct_sessions():
+    """Test the sketch stays close to the true count and merges like a set union"""
+    first, second = HyperLogLog(), HyperLogLog()
+    for n in range(20000):
+        first.add(f"session-{n}")
+        first.add(f"session-{n}")
+    for n in range(10000, 30000):
+        second.add(f"session-{n}")
+    assert abs(first.count() - 20000) < 20000 * 0.05
+    assert abs(first.merge(second).count() - 30000) < 30000 * 0.05
+    assert HyperLogLog().count() == 0
+    assert HyperLogLog.from_bytes(first.to_bytes()).count() == first.count()
+
+def test_rollup_delta_counts_each_period():
+    """Test one conversation lands in its hour, day and all-time buckets"""
+    delta = RollupDelta().add(datetime(2024, 7, 20, 13, 5), 'positive', 'abc')
+    assert delta.counts == {
+        ('all', '', 'positive'): 1,
+        ('day', '2024-07-20', 'positive'): 1,
+        ('hour', '2024-07-20T13', 'positive'): 1
+    }
+    assert set(delta.sketches) == {('all', '')}
+
+def test_sqlite_rollup_backfills_then_updates_incrementally(tmp_path):
+    """Test the rollup matches a full recount after a backfill plus new conversations"""
+    now = datetime(2024, 7, 20, 13, 30)
+    records = [
+        {'timestamp': '2024-07-20T09:00:00', 'session_id': 'a', 'sentiment': 'positive'},
+        {'timestamp': '2024-07-19T22:00:00', 'session_id': 'b', 'sentiment': 'negative'},
+        {'timestamp': '2024-07-10T10:00:00', 'session_id': 'a', 'sentiment': 'neutral'}
+    ]
+    rollup = SQLiteRollup(str(tmp_path / 'analytics.db'))
+    assert not rollup.is_built()
+    assert rollup.rebuild(records) == 3
+    rollup.add({'timestamp': '2024-07-20T13:10:00', 'session_id': 'c', 'sentiment': 'positive'})
+
+    summary = rollup.summary(now=now)
+    assert summary['total_conversations'] == 4
+    assert summary['unique_sessions'] == 3
+    assert summary['sentiment_distribution'] == {'positive': 2, 'neutral': 1, 'negative': 1}
+    assert summary['daily_conversations'][-2:] == [
+        {'day': '2024-07-19', 'conversations': 1},
+        {'day': '2024-07-20', 'conversations': 2}
+    ]
+    assert summary['hourly_conversations'][-1] == {'hour': '2024-07-20T13', 'conversations': 1}
+    assert SQLiteRollup(str(tmp_path / 'analytics.db')).is_built()
@@ -18,12 +18,22 @@ def app():
         db.session.add(admin)
         db.session.commit()
         yield app
+        app.extensions['conversation_writer'].drain()
         db.drop_all()
 
 @pytest.fixture
 def client(app):
     return app.test_client()
 
+class DictCache(dict):
+    """Stand-in for the Flask-Caching backend"""
+
+    def set(self, key, value, timeout=None):
+        self[key] = value
+
+    def delete(self, key):
+        self.pop(key, None)
+
 def test_health_check(client):
     """Test health check endpoint"""
     response = client.get('/health')
@@ -65,8 +75,393 @@ def test_invalid_login(client):
                           content_type='application/json')
     assert response.status_code == 401
 
+def test_admin_auth_is_cached_until_deactivation(app, client):
+    """Test admin checks are reused per token and dropped when the admin is deactivated"""
+    from sqlalchemy import update
+    token = client.post('/admin/login', json={'username': 'testadmin', 'password': 'testpass'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/admin/analytics', headers=headers).status_code == 200
+
+    # Bypassing the ORM skips the invalidation hook, so the cached check stands
+    db.session.execute(update(AdminUser).values(active=False))
+    db.session.commit()
+    assert client.get('/admin/analytics', headers=headers).status_code == 200
+
+    admin = AdminUser.query.filter_by(username='testadmin').first()
+    admin.active = False
+    db.session.commit()
+    assert client.get('/admin/analytics', headers=headers).status_code == 401
+
+def test_admin_tokens_expire(app, client):
+    """Test tokens carry an expiry and expired or unexpiring tokens are rejected"""
+    import jwt
+    from auth import decode_token
+    token = client.post('/admin/login', json={'username': 'testadmin', 'password': 'testpass'}).get_json()['token']
+    payload = decode_token(token)
+    assert payload['exp'] - payload['iat'] == app.config['JWT_EXPIRES_SECONDS']
+
+    secret = app.config['JWT_SECRET_KEY']
+    expired = jwt.encode(dict(payload, exp=payload['iat'] - 1), secret, algorithm='HS256')
+    unexpiring = jwt.encode({'user_id': payload['user_id']}, secret, algorithm='HS256')
+    for bad in (expired, unexpiring):
+        response = client.get('/admin/analytics', headers={'Authorization': f'Bearer {bad}'})
+        assert response.status_code == 401
+
+def test_analytics_are_served_from_rollups(app, client):
+    """Test saved conversations update the analytics rollups, and a backfill rebuilds them"""
+    from models import AnalyticsCounter
+    client.post('/chat', json={'message': 'Thank you, this is great'})
+    client.post('/chat', json={'message': 'When does the cohort end?'})
+    app.extensions['conversation_writer'].drain()
+
+    token = client.post('/admin/login', json={'username': 'testadmin', 'password': 'testpass'}).get_json()['token']
+    data = client.get('/admin/analytics', headers={'Authorization': f'Bearer {token}'}).get_json()
+    assert data['total_conversations'] == 2
+    assert sum(data['sentiment_distribution'].values()) == 2
+    assert data['daily_conversations'][-1]['conversations'] == 2
+    assert len(data['recent_conversations']) == 2
+
+    db.session.query(AnalyticsCounter).delete()
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['backfill-analytics'])
+    assert 'for 2 conversations' in result.output
+    assert app.extensions['conversation_writer'].rollup.summary() == {k: v for k, v in data.items() if k != 'recent_conversations'}
+
+def test_rollup_failure_keeps_conversations_and_marks_rollups_stale(app, monkeypatch):
+    """Test a failing rollup update never rolls back the conversations it counts"""
+    writer = app.extensions['conversation_writer']
+
+    def broken(session, delta):
+        raise RuntimeError('no such table: analytics_counters')
+
+    monkeypatch.setattr(writer.rollup, 'apply', broken)
+    assert writer.flush([{'id': 'kept', 'session_id': 'stale', 'user_message': 'hi', 'bot_response': 'hello'}])
+    assert db.session.get(Conversation, 'kept') is not None
+    assert writer.rollup.summary()['rollup_stale']
+
+    monkeypatch.undo()
+    writer.rollup.backfill()
+    summary = writer.rollup.summary()
+    assert not summary['rollup_stale']
+    assert summary['total_conversations'] == 1
+
+def test_rollup_tables_are_created_on_older_databases(app):
+    """Test databases created before the analytics tables get them on first write"""
+    from models import AnalyticsCounter, SessionSketch
+    from sqlalchemy import inspect
+    writer = app.extensions['conversation_writer']
+    SessionSketch.__table__.drop(db.engine)
+    AnalyticsCounter.__table__.drop(db.engine)
+    writer.rollup.tables_ready = False
+
+    assert writer.flush([{'id': 'old-db', 'session_id': 'old', 'user_message': 'hi', 'bot_response': 'hello'}])
+    assert {'analytics_counters', 'session_sketches'} <= set(inspect(db.engine).get_table_names())
+    assert writer.rollup.summary()['total_conversations'] == 1
+
 def test_metrics_endpoint(client):
     """Test Prometheus metrics endpoint"""
     response = client.get('/metrics')
     assert response.status_code == 200
-    assert 'text/plain' in response.content_type
\ No newline at end of file
+    assert 'text/plain' in response.content_type
+
+def test_request_latency_is_recorded_per_endpoint(client):
+    """Test request durations are labelled by endpoint with LLM-scale buckets"""
+    client.get('/health')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_duration_seconds_bucket{endpoint="health_check",le="30.0"}' in body
+
+def test_ai_cache_key_is_stable():
+    """Test AI response cache keys are deterministic and config-aware"""
+    from response_cache import build_cache_key
+    key = build_cache_key('When does cohort 3 end?', 'openrouter', 'deepseek', 0.7, 'prompt')
+    assert key == build_cache_key('  when does COHORT 3 end? ', 'openrouter', 'deepseek', 0.7, 'prompt')
+    assert key != build_cache_key('When does cohort 3 end?', 'openai', 'gpt-4', 0.7, 'prompt')
+    assert key != build_cache_key('When does cohort 3 end?', 'openrouter', 'deepseek', 0.2, 'prompt')
+
+def test_semantic_cache_matches_near_duplicates():
+    """Test semantic cache hits on rephrasings and evicts least recently used"""
+    from response_cache import SemanticCache
+    cache = SemanticCache(threshold=0.8, max_entries=2)
+    cache.set('When does cohort 3 end?', 'July 20th')
+    assert cache.get('when does cohort 3 end') == 'July 20th'
+    assert cache.get('How do I reset my password?') is None
+
+    cache.set('Why is my dashboard score different?', 'It syncs')
+    cache.get('When does cohort 3 end?')
+    cache.set('What courses are available?', 'Many')
+    assert len(cache) == 2
+    assert cache.get('Why is my dashboard score different?') is None
+    assert cache.get('When does cohort 3 end?') == 'July 20th'
+
+def test_semantic_cache_keeps_numbers_and_negation_apart():
+    """Test near-identical questions about another cohort or the opposite problem are misses"""
+    from response_cache import SemanticCache
+    cache = SemanticCache()
+    pairs = [
+        ('When does cohort 3 of the training programme end?', 'When does cohort 4 of the training programme end?'),
+        ('I cannot log in to the 3MTT learning platform with my email address',
+         'I can now log in to the 3MTT learning platform with my email address')
+    ]
+    for stored, asked in pairs:
+        assert cache.vectorize(stored) @ cache.vectorize(asked) >= cache.threshold
+        cache.set(stored, f"answer to {stored}")
+        assert cache.get(asked) is None
+        assert cache.get(stored.upper()) == f"answer to {stored}"
+
+def test_new_knowledge_version_retires_cached_answers():
+    """Test answers cached before a knowledge change are neither looked up nor near-matched"""
+    from response_cache import KnowledgeVersion, SemanticCache, build_cache_key
+    version = KnowledgeVersion(DictCache())
+    before = version.get()
+    key = build_cache_key('When does cohort 3 end?', 'openrouter', 'deepseek', 0.7, 'prompt', before)
+    semantic = SemanticCache()
+    semantic.sync(before)
+    semantic.set('When does cohort 3 end?', 'July 20th')
+
+    after = version.bump()
+    assert version.get() == after != before
+    assert key != build_cache_key('When does cohort 3 end?', 'openrouter', 'deepseek', 0.7, 'prompt', after)
+    semantic.sync(after)
+    assert semantic.get('When does cohort 3 end?') is None
+    assert len(semantic) == 0
+
+def test_cache_evictions_are_counted():
+    """Test response cache evictions and semantic LRU evictions are counted under their own labels"""
+    from monitoring import AI_CACHE_EVENTS
+    from response_cache import ResponseCache, SemanticCache
+
+    def count(result):
+        return AI_CACHE_EVENTS.labels(result=result)._value.get()
+
+    before = {result: count(result) for result in ('semantic_evict', 'evict')}
+    cache = ResponseCache(DictCache())
+    cache.set('key', 'July 20th')
+    cache.delete('key')
+    semantic = SemanticCache(max_entries=1)
+    semantic.set('When does cohort 3 end?', 'July 20th')
+    semantic.set('How do I reset my password?', 'Use the link')
+    assert count('evict') == before['evict'] + 1
+    assert count('semantic_evict') == before['semantic_evict'] + 1
+
+def test_conversations_are_written_in_batches(app):
+    """Test queued conversations are persisted by the write-behind queue"""
+    writer = app.extensions['conversation_writer']
+    for i in range(5):
+        writer.submit(session_id='batch', user_message=f"question {i}", bot_response='answer')
+    writer.drain()
+    assert Conversation.query.filter_by(session_id='batch').count() == 5
+
+def test_one_bad_row_does_not_drop_its_batch(app):
+    """Test a failing batch is retried row by row and only the bad row is dropped"""
+    from monitoring import CONVERSATION_ROWS_DROPPED
+    dropped = CONVERSATION_ROWS_DROPPED._value.get()
+    writer = app.extensions['conversation_writer']
+    writer.retry_backoff = 0
+    rows = [{'id': f"row-{i}", 'session_id': 'retry', 'user_message': f"question {i}", 'bot_response': 'answer'}
+            for i in range(4)]
+    rows[2]['bot_response'] = None  # Violates NOT NULL
+    assert not writer.flush(rows)
+    assert Conversation.query.filter_by(session_id='retry').count() == 3
+    assert CONVERSATION_ROWS_DROPPED._value.get() == dropped + 1
+
+def test_chat_stream_endpoint(app, client):
+    """Test streamed chat sends tokens, a final event, and persists the reply"""
+    response = client.post('/chat/stream', json={'message': 'When does the cohort end?'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert 'data: {"token"' in body
+    assert 'event: done' in body
+
+    app.extensions['conversation_writer'].drain()
+    assert Conversation.query.filter_by(user_message='When does the cohort end?').count() == 1
+
+def test_chat_stream_failing_mid_answer_is_not_saved(app, client):
+    """Test a provider failing after some tokens ends the stream with an error and stores nothing"""
+    from provider_router import CircuitBreaker, LatencyTracker, Provider
+
+    def broken(message):
+        yield 'Cohort 3 '
+        raise ConnectionError('provider dropped the connection')
+
+    router = app.extensions['provider_router']
+    router.providers.append(Provider('broken', None, broken))
+    router.breakers['broken'] = CircuitBreaker('broken')
+    router.latencies['broken'] = LatencyTracker()
+
+    body = client.post('/chat/stream', json={'message': 'When does cohort 3 end?'}).get_data(as_text=True)
+    assert 'data: {"token": "Cohort 3 "}' in body
+    assert 'event: error' in body
+    assert 'event: done' not in body
+
+    app.extensions['conversation_writer'].drain()
+    assert Conversation.query.filter_by(user_message='When does cohort 3 end?').count() == 0
+
+def test_knowledge_search_runs_once_across_provider_fail_over(app, client, monkeypatch):
+    """Test every provider tried for a message gets the same prompt from a single knowledge search"""
+    from provider_router import CircuitBreaker, LatencyTracker, Provider
+    knowledge_search = app.extensions['knowledge_search']
+    searches = []
+    search = knowledge_search.search
+    monkeypatch.setattr(knowledge_search, 'search', lambda query: searches.append(query) or search(query))
+
+    received = []
+
+    def broken(messages):
+        received.append(messages)
+        raise ConnectionError('provider is down')
+
+    def working(messages):
+        received.append(messages)
+        return 'Cohort 3 ends July 20th.'
+
+    router = app.extensions['provider_router']
+    for name, call in (('broken', broken), ('working', working)):
+        router.providers.append(Provider(name, call))
+        router.breakers[name] = CircuitBreaker(name)
+        router.latencies[name] = LatencyTracker()
+
+    response = client.post('/chat', json={'message': 'When does the second cohort finish?'})
+    assert response.get_json()['response'] == 'Cohort 3 ends July 20th.'
+    assert searches == ['When does the second cohort finish?']
+    assert len(received) == 2 and received[0] is received[1]
+
+def test_failed_knowledge_search_does_not_break_the_request(app, client, monkeypatch):
+    """Test a failed search query is rolled back so the conversation is still saved"""
+    from sqlalchemy import text
+    from provider_router import CircuitBreaker, LatencyTracker, Provider
+    knowledge_search = app.extensions['knowledge_search']
+    rollbacks = []
+    rollback = db.session.rollback
+    monkeypatch.setattr(db.session, 'rollback', lambda: rollbacks.append(1) or rollback())
+
+    def broken_search(query):
+        db.session.execute(text('SELECT * FROM no_such_table'))
+
+    monkeypatch.setattr(knowledge_search, 'search', broken_search)
+    router = app.extensions['provider_router']
+    router.providers.append(Provider('working', lambda messages: 'Cohort 3 ends July 20th.'))
+    router.breakers['working'] = CircuitBreaker('working')
+    router.latencies['working'] = LatencyTracker()
+
+    response = client.post('/chat', json={'message': 'When does cohort 3 end?'})
+    assert response.get_json()['response'] == 'Cohort 3 ends July 20th.'
+    assert rollbacks
+    app.extensions['conversation_writer'].drain()
+    assert Conversation.query.filter_by(user_message='When does cohort 3 end?').count() == 1
+
+def test_fail_over_answers_are_not_cached_as_the_primary(app, client, monkeypatch):
+    """Test only answers from the configured provider are stored under its cache key"""
+    from provider_router import CircuitBreaker, LatencyTracker, Provider
+    stored = []
+    monkeypatch.setattr('response_cache.ResponseCache.set', lambda cache, key, response: stored.append(response))
+    monkeypatch.setattr('response_cache.SemanticCache.set', lambda cache, message, response: stored.append(response))
+    monkeypatch.setitem(app.config, 'AI_PROVIDER', 'openrouter')
+    monkeypatch.setitem(app.config, 'OPENROUTER_API_KEY', 'test-key')
+
+    primary_up = False
+
+    def primary(messages):
+        if not primary_up:
+            raise ConnectionError('provider is down')
+        return 'From the primary'
+
+    def stream_primary(messages):
+        yield primary(messages)
+
+    router = app.extensions['provider_router']
+    router.providers.extend([Provider('openrouter', primary, stream_primary),
+                             Provider('openai', lambda messages: 'From the secondary', lambda messages: iter(['From the secondary']))])
+    for name in ('openrouter', 'openai'):
+        router.breakers[name] = CircuitBreaker(name)
+        router.latencies[name] = LatencyTracker()
+
+    assert client.post('/chat', json={'message': 'When does cohort 3 end?'}).get_json()['response'] == 'From the secondary'
+    assert 'From the secondary' in client.post('/chat/stream', json={'message': 'When does cohort 4 end?'}).get_data(as_text=True)
+    assert stored == []
+
+    primary_up = True
+    assert client.post('/chat', json={'message': 'When does cohort 3 end?'}).get_json()['response'] == 'From the primary'
+    assert stored == ['From the primary', 'From the primary']
+
+def test_completion_stream_parsing():
+    """Test OpenAI-style SSE chunks are turned into content tokens"""
+    from streaming import iter_completion_tokens
+    lines = [
+        b': OPENROUTER PROCESSING',
+        b'',
+        b'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        b'data: {"choices": [{"delta": {"content": "Cohort 3 "}}]}',
+        b'data: {"choices": [{"delta": {"content": "ends July 20th."}}]}',
+        b'data: [DONE]',
+        b'data: {"choices": [{"delta": {"content": "ignored"}}]}'
+    ]
+    assert list(iter_completion_tokens(lines)) == ['Cohort 3 ', 'ends July 20th.']
+
+def test_provider_clients_are_pooled_per_process(monkeypatch):
+    """Test provider clients are reused, and rebuilt after a fork"""
+    from provider_clients import ProviderClients
+    clients = ProviderClients(pool_size=4)
+    session = clients.http_session()
+    assert clients.http_session() is session
+    assert clients.openai_client('key') is clients.openai_client('key')
+
+    monkeypatch.setattr('os.getpid', lambda: -1)
+    assert clients.http_session() is not session
+
+def test_index_is_precompressed_and_cacheable(client):
+    """Test the chat page is served gzipped with an ETag, and revalidates to 304"""
+    import gzip
+    plain = client.get('/', headers={'Accept-Encoding': 'identity'})
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert b'<!DOCTYPE html>' in plain.data
+    assert 'max-age' in plain.headers['Cache-Control']
+
+    zipped = client.get('/', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert zipped.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(zipped.data) == plain.data
+    assert zipped.headers['ETag'] != plain.headers['ETag']
+
+    cached = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+def test_index_revalidates_only_the_negotiated_variant(client):
+    """Test an ETag for another encoding of the page does not get a 304"""
+    plain = client.get('/', headers={'Accept-Encoding': 'identity'})
+    switched = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['ETag']})
+    assert switched.status_code == 200
+    assert switched.headers['Content-Encoding'] == 'gzip'
+    assert switched.data
+
+    both = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f"{plain.headers['ETag']}, {switched.headers['ETag']}"})
+    assert both.status_code == 304
+
+def test_chat_stages_are_timed(app, client):
+    """Test chat pipeline stages are recorded per request and exported"""
+    from stage_timer import stage, start_request, stage_breakdown
+    with app.test_request_context('/chat'):
+        start_request()
+        with stage('provider'):
+            pass
+        with stage('provider'):
+            pass
+        assert list(stage_breakdown()) == ['provider']
+
+    client.post('/chat', json={'message': 'When does the cohort end?'})
+    body = client.get('/metrics').get_data(as_text=True)
+    for name in ('sentiment', 'cache_lookup', 'provider', 'persist'):
+        assert f'chat_stage_duration_seconds_count{{stage="{name}"}}' in body
+
+def test_load_knowledge_command_fills_the_searchable_knowledge_base(app):
+    """Test the loader imports the JSON files and the prompt picks up matching entries"""
+    knowledge_version = app.extensions['knowledge_version']
+    knowledge_version.cache = DictCache()
+    result = app.test_cli_runner().invoke(args=['load-knowledge'])
+    assert 'added' in result.output, result.output
+    assert knowledge_version.get() != ''
+
+    matches = app.extensions['knowledge_search'].search('Is the training online or in-person?')
+    assert matches[0].question == 'Training format'
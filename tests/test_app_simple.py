@@ -0,0 +1,11 @@
+import app_simple
+
+def test_chat_stages_reach_the_metrics_endpoint():
+    """Test app_simple exports its per-stage chat timings to Prometheus"""
+    client = app_simple.app.test_client()
+    response = client.post('/chat', json={'message': 'When does cohort 3 end?'})
+    assert response.status_code == 200
+
+    body = client.get('/metrics').get_data(as_text=True)
+    for name in ('sentiment', 'persist'):
+        assert f'chat_stage_duration_seconds_count{{stage="{name}"}}' in body
@@ -0,0 +1,37 @@
+import json
+import pytest
+from bm25_index import BM25FIndex
+
+@pytest.fixture
+def knowledge_base():
+    with open('knowledge_base.json', 'r') as f:
+        return json.load(f)
+
+def test_training_questions_rank_their_answer_first(knowledge_base):
+    """Test the item holding the answer is the top result for known questions"""
+    index = BM25FIndex(knowledge_base)
+    expected = {
+        "Why is my dashboard score different from Darey.io?": 'platform.dashboard_sync',
+        "Can I change my course after starting?": 'courses.course_change_policy',
+        "What financial support is available?": 'support.financial_support',
+        "Is the training online or in-person?": '3mtt_program.training_format',
+    }
+    for query, key in expected.items():
+        assert index.search(query)[0].startswith(key + ': '), query
+
+def test_key_matches_outrank_long_values():
+    """Test a term in an item's key beats the same term in a long value"""
+    index = BM25FIndex({
+        'faq': {'common_issues': 'For office hours, login trouble, dashboard sync and anything else, ' * 5},
+        'support': {'office_hours': 'Monday-Friday 9AM-5PM', 'contact_methods': ['email', 'phone']},
+    })
+    assert index.search('office hours')[0] == 'support.office_hours: Monday-Friday 9AM-5PM'
+
+def test_search_returns_top_k_and_nothing_for_unknown_words(knowledge_base):
+    """Test results are capped at k and unrelated queries return no items"""
+    index = BM25FIndex(knowledge_base)
+    assert len(index.search('program cohort course support')) == 3
+    assert len(index.search('program cohort course support', k=5)) == 5
+    assert index.search('what is the weather today?') == []
+    assert index.search('') == []
+    assert BM25FIndex({}).search('cohort') == []
@@ -0,0 +1,63 @@
+import json
+import multiprocessing
+from conversation_store import ConversationStore, SessionIndex
+
+def make_store(tmp_path, **kwargs):
+    return ConversationStore(str(tmp_path / 'conversations.jsonl'),
+                             legacy_path=str(tmp_path / 'conversations.json'), **kwargs)
+
+def append_many(path, legacy_path, worker, count):
+    store = ConversationStore(path, legacy_path=legacy_path)
+    for i in range(count):
+        store.append({'user_message': f"{worker}-{i}"})
+
+def test_legacy_conversations_are_migrated_before_new_turns(tmp_path):
+    """Test conversations.json is imported once, ahead of new appends"""
+    (tmp_path / 'conversations.json').write_text(json.dumps([{'user_message': 'old'}]))
+    store = make_store(tmp_path)
+
+    assert [c['user_message'] for c in store.read_all()] == ['old']
+    store.append({'user_message': 'new'})
+    store.append({'user_message': 'newer'})
+    assert [c['user_message'] for c in store.read_all()] == ['old', 'new', 'newer']
+    assert [c['user_message'] for c in store.recent(2)] == ['new', 'newer']
+
+def test_concurrent_appends_are_not_lost(tmp_path):
+    """Test appends from several processes all survive"""
+    path, legacy_path = str(tmp_path / 'conversations.jsonl'), str(tmp_path / 'conversations.json')
+    workers = [multiprocessing.Process(target=append_many, args=(path, legacy_path, w, 200)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(list(ConversationStore(path, legacy_path=legacy_path).read_all())) == 800
+
+def test_rotation_keeps_history_readable(tmp_path):
+    """Test rotated segments are still read in order and torn lines are skipped"""
+    store = make_store(tmp_path, max_bytes=200)
+    for i in range(20):
+        store.append({'user_message': f"message {i}"})
+    with open(store.path, 'a') as f:
+        f.write('{"user_message": "torn')
+
+    assert len(store.segments()) > 1
+    assert [c['user_message'] for c in store.read_all()] == [f"message {i}" for i in range(20)]
+    assert [c['user_message'] for c in store.recent(7)] == [f"message {i}" for i in range(13, 20)]
+
+def test_session_history_is_indexed_per_session(tmp_path):
+    """Test history comes from the session index, including pre-existing turns"""
+    (tmp_path / 'conversations.json').write_text(json.dumps([{'session_id': 'a', 'user_message': 'old'}]))
+    index = SessionIndex(str(tmp_path / 'index.db'), keep_per_session=3)
+    store = make_store(tmp_path, session_index=index)
+    for i in range(5):
+        store.append({'session_id': 'a', 'user_message': f"a{i}"})
+        store.append({'session_id': 'b', 'user_message': f"b{i}"})
+
+    assert [c['user_message'] for c in store.history('a', 2)] == ['a3', 'a4']
+    assert [c['user_message'] for c in store.history('b', 10)] == ['b2', 'b3', 'b4']
+    assert store.history('missing') == []
+
+    # A fresh index is rebuilt from the log
+    rebuilt = make_store(tmp_path, session_index=SessionIndex(str(tmp_path / 'new.db')))
+    assert [c['user_message'] for c in rebuilt.history('a', 10)] == ['old', 'a0', 'a1', 'a2', 'a3', 'a4']
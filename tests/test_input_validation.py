@@ -0,0 +1,49 @@
+import random
+import re
+from input_validation import MALICIOUS_CONTENT, contains_malicious_content, sanitize_chat_payload
+
+LEGACY_PATTERNS = [
+    r'<script[^>]*>.*?</script>',
+    r'javascript:',
+    r'on\w+\s*=',
+    r'<iframe[^>]*>',
+    r'<object[^>]*>',
+    r'<embed[^>]*>',
+]
+
+def legacy_contains_malicious_content(text):
+    """Reference: the six patterns run one at a time"""
+    text_lower = text.lower()
+    return any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in LEGACY_PATTERNS)
+
+def test_detects_markup():
+    """Test each kind of markup is caught and ordinary questions are not"""
+    assert contains_malicious_content('<script>alert(1)</script>')
+    assert contains_malicious_content('<SCRIPT src=x>y</script>')
+    assert contains_malicious_content('click JavaScript:void(0)')
+    assert contains_malicious_content('<img onerror = "x">')
+    assert contains_malicious_content('<iframe src="x">')
+    assert contains_malicious_content('<object data="x">')
+    assert contains_malicious_content('<embed src="x">')
+    assert not contains_malicious_content('When does cohort 3 end?')
+    assert not contains_malicious_content('<script> without a closing tag')
+    assert not contains_malicious_content('<script>\n</script>')
+
+def test_combined_regex_matches_legacy_patterns():
+    """Test the combined regex flags exactly what the six patterns flagged"""
+    rng = random.Random(1)
+    pieces = ['<script', '<script>', '</script>', '>', '<', '\n', 'on', 'o', 'n', 'x', ' ', '=',
+              'javascript:', '<iframe', '<object', '<embed', 'ON', '_', '1', '\t', '<SCRIPT']
+    for _ in range(20000):
+        text = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 10)))
+        assert (MALICIOUS_CONTENT.search(text) is not None) == legacy_contains_malicious_content(text), repr(text)
+
+def test_sanitize_chat_payload():
+    """Test the payload is validated once and returned escaped"""
+    assert sanitize_chat_payload({'message': '  Is 5 < 6?  '}) == ('Is 5 &lt; 6?', None)
+    assert sanitize_chat_payload(None) == (None, 'Invalid JSON')
+    assert sanitize_chat_payload(['message']) == (None, 'Invalid JSON')
+    assert sanitize_chat_payload({'message': '   '}) == (None, 'No message provided')
+    assert sanitize_chat_payload({'message': 42}) == (None, 'No message provided')
+    assert sanitize_chat_payload({'message': 'x' * 1001}) == (None, 'Message too long')
+    assert sanitize_chat_payload({'message': '<iframe src=x>'}) == (None, 'Invalid content detected')
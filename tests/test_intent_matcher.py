@@ -0,0 +1,75 @@
+import random
+from intent_matcher import IntentMatcher
+
+INTENTS = {
+    'dashboard': ['dashboard', 'score', 'darey'],
+    'course': ['change course', 'change', 'course', 'location'],
+    'onboarding': ['onboard', 'waiting', 'wait'],
+    'timeline': ['end', 'finish', 'cohort end', 'when end'],
+    'support': ['support', 'help', 'contact'],
+}
+
+def linear_first(message, intents, exclusions=None):
+    """Reference if/elif chain"""
+    message_lower = message.lower()
+    for intent, keywords in intents.items():
+        vetoes = (exclusions or {}).get(intent, [])
+        if any(word in message_lower for word in keywords) and not any(word in message_lower for word in vetoes):
+            return intent
+    return None
+
+def linear_best(message, intents):
+    """Reference max-count scan"""
+    message_lower = message.lower()
+    best_match, max_matches = None, 0
+    for intent, keywords in intents.items():
+        matches = sum(1 for keyword in dict.fromkeys(keywords) if keyword in message_lower)
+        if matches > max_matches:
+            best_match, max_matches = intent, matches
+    return best_match
+
+def test_first_keeps_if_elif_priority():
+    """Test the earliest intent wins even when a later one has more keywords"""
+    matcher = IntentMatcher(INTENTS)
+    assert matcher.first("When does my cohort end? I need help with support") == 'timeline'
+    assert matcher.first("My DASHBOARD score is waiting to finish") == 'dashboard'
+    assert matcher.first("hello there") is None
+    assert matcher.first("hello there", default='default') == 'default'
+
+def test_exclusions_veto_an_intent():
+    """Test an excluded keyword skips the intent and falls through the chain"""
+    exclusions = {'course': ['end', 'finish']}
+    matcher = IntentMatcher(INTENTS, exclusions=exclusions)
+    assert matcher.first("Can I change my course?") == 'course'
+    assert matcher.first("Can I change my course before the end?") == 'timeline'
+
+def test_overlapping_and_nested_keywords_are_all_counted():
+    """Test keywords that are prefixes or substrings of each other all match"""
+    matcher = IntentMatcher(INTENTS)
+    assert matcher.matched_keywords("still waiting") == {'waiting', 'wait'}
+    assert matcher.matched_keywords("when end") == {'when end', 'end'}
+    assert matcher.matched_keywords("changed courses") == {'change', 'course'}
+    assert matcher.counts("change course now") == {'course': 3}
+    assert matcher.best("change course, please help") == 'course'
+
+def test_matches_linear_scan_on_random_messages():
+    """Test first() and best() agree with the substring scans they replace"""
+    rng = random.Random(7)
+    alphabet = 'abcde '
+    intents = {
+        f"intent_{i}": [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 5))]
+        for i in range(40)
+    }
+    exclusions = {f"intent_{i}": ['aa', 'e e'] for i in range(0, 40, 3)}
+    matcher = IntentMatcher(intents, exclusions=exclusions)
+    plain = IntentMatcher(intents)
+    for _ in range(500):
+        message = ''.join(rng.choice(alphabet + 'ABC') for _ in range(rng.randint(0, 30)))
+        assert matcher.first(message) == linear_first(message, intents, exclusions), message
+        assert plain.best(message) == linear_best(message, intents), message
+
+def test_empty_matcher():
+    """Test a matcher with no keywords never matches"""
+    matcher = IntentMatcher({})
+    assert matcher.first("anything", default='default') == 'default'
+    assert matcher.best("anything") is None
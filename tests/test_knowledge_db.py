@@ -0,0 +1,69 @@
+import json
+import pytest
+from flask import Flask
+from models import db, KnowledgeBase
+from knowledge_db import KnowledgeSearch, import_knowledge_files, knowledge_entries
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'knowledge.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def add_entry(question, answer, priority=1, active=True, category='support'):
+    entry = KnowledgeBase(category=category, question=question, answer=answer, priority=priority, active=active)
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+def test_loader_imports_both_knowledge_files(app):
+    """Test the JSON files load once and reloading updates instead of duplicating"""
+    files = {'knowledge_base.json': 2, 'knowledge_base_expansion_ideas.json': 1}
+    added, updated = import_knowledge_files(files)
+    assert added == KnowledgeBase.query.count() > 41
+    assert import_knowledge_files(files) == (0, added)
+
+    matches = KnowledgeSearch().search("Can I change my course after starting?")
+    assert (matches[0].category, matches[0].question) == ('courses', 'Course change policy')
+    assert KnowledgeSearch().search("what is the curriculum for data science")[0].question == 'Data science'
+
+def test_search_honours_active_and_priority(app):
+    """Test inactive entries are never returned and priority breaks near-ties"""
+    low = add_entry('Office hours', 'Monday to Friday, 9AM to 5PM')
+    high = add_entry('Office hours', 'Monday to Friday, 9AM to 5PM', priority=3)
+    hidden = add_entry('Office hours', 'Closed', priority=5, active=False)
+
+    ids = [match.id for match in KnowledgeSearch().search('what are your office hours?')]
+    assert ids == [high.id, low.id]
+
+    high.active = False
+    db.session.commit()
+    assert [match.id for match in KnowledgeSearch().search('office hours')] == [low.id]
+    assert hidden.id not in [match.id for match in KnowledgeSearch().search('closed')]
+
+def test_index_follows_updates_and_deletes(app):
+    """Test the full-text index tracks edits made through the table"""
+    entry = add_entry('Cohort end', 'Cohort 3 ends July 20th')
+    entry.answer = 'Cohort 3 ends August 1st'
+    db.session.commit()
+    assert KnowledgeSearch().search('july') == []
+    assert KnowledgeSearch().search('august')[0].id == entry.id
+
+    db.session.delete(entry)
+    db.session.commit()
+    assert KnowledgeSearch().search('august') == []
+    assert KnowledgeSearch().search('the and of') == []
+
+def test_knowledge_entries_unwrap_nested_files():
+    """Test wrapped sections and nested values become flat entries"""
+    data = {'expanded_knowledge_suggestions': {'detailed_course_info': {'data_science': {'duration': '6 months', 'tools': ['SQL', 'R']}}}}
+    [entry] = knowledge_entries(data, priority=1)
+    assert entry['category'] == 'detailed_course_info'
+    assert entry['question'] == 'Data science'
+    assert entry['answer'] == 'duration: 6 months; tools: SQL, R'
+    assert json.loads(entry['keywords']) == ['data', 'science']
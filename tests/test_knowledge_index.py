@@ -0,0 +1,48 @@
+import json
+import pytest
+from knowledge_index import KnowledgeIndex, linear_search
+
+QUERIES = [
+    "Why is my dashboard score different from Darey.io?",
+    "When does cohort 3 end?",
+    "Can I change my course after starting?",
+    "What financial support do you provide?",
+    "How can I contact support?",
+    "What courses are available?",
+    "Tell me about 3MTT program",
+    "I'm having trouble logging in",
+    "what is the weather today?",
+    "end end end the the",
+    "",
+    "ab cd",
+]
+
+@pytest.fixture
+def knowledge_base():
+    with open('knowledge_base.json', 'r') as f:
+        return json.load(f)
+
+def test_index_matches_linear_search(knowledge_base):
+    """Test indexed search returns exactly what the linear scan returns"""
+    with open('conversations.json', 'r') as f:
+        queries = QUERIES + [conv['user_message'] for conv in json.load(f)]
+
+    index = KnowledgeIndex(knowledge_base)
+    for query in queries:
+        assert index.search(query) == linear_search(query, knowledge_base), query
+
+def test_index_matches_linear_search_on_edge_cases():
+    """Test parity for nested values, lists, non-dict sections and odd keys"""
+    knowledge_base = {
+        'notes': 'a plain string section is ignored',
+        'support': {
+            'hours': 'Monday-Friday',
+            'contact_methods': ['email', 'phone'],
+            'details': {'help desk': 'open daily', 'count': 3},
+            'faq: login': 'Reset your password from the portal',
+        },
+        'timeline': {'cohort end': 'July 20th', 'start': 'January'},
+    }
+    index = KnowledgeIndex(knowledge_base)
+    for query in ['help with login', 'when does the cohort end', 'email phone', 'faq', 'count daily']:
+        assert index.search(query) == linear_search(query, knowledge_base), query
@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import pytest
+from knowledge_store import KnowledgeStore
+
+def write_json(path, data, mtime=None):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+def test_store_serves_from_memory_until_file_changes(tmp_path):
+    """Test the knowledge base is reloaded only when the file changes"""
+    path = tmp_path / 'knowledge_base.json'
+    write_json(path, {'support': {'hours': '9-5'}}, mtime=1000)
+    store = KnowledgeStore(str(path), check_interval=0)
+
+    first = store.get()
+    assert store.get() is first
+
+    write_json(path, {'support': {'hours': '8-6'}}, mtime=2000)
+    assert store.get()['support']['hours'] == '8-6'
+    assert store.current().index.search('hours')[0] == 'support.hours: 8-6'
+
+def test_store_keeps_last_good_version_on_bad_json(tmp_path):
+    """Test a half-written or invalid file never replaces the loaded knowledge base"""
+    path = tmp_path / 'knowledge_base.json'
+    write_json(path, {'support': {'hours': '9-5'}}, mtime=1000)
+    store = KnowledgeStore(str(path), check_interval=0)
+
+    path.write_text('{"support": {"hours":')
+    assert store.get() == {'support': {'hours': '9-5'}}
+
+def test_store_update_replaces_file_and_index(tmp_path):
+    """Test updates are written atomically and picked up immediately"""
+    path = tmp_path / 'knowledge_base.json'
+    write_json(path, {}, mtime=1000)
+    store = KnowledgeStore(str(path), check_interval=0)
+
+    store.update({'timeline': {'cohort_end': 'July 20th'}})
+    assert json.loads(path.read_text()) == {'timeline': {'cohort_end': 'July 20th'}}
+    assert store.current().index.search('cohort end') == ['timeline.cohort_end: July 20th']
+    assert [p.name for p in tmp_path.iterdir()] == ['knowledge_base.json']
+
+def test_store_update_keeps_file_permissions(tmp_path):
+    """Test the replacement file keeps the mode of the file it replaces"""
+    path = tmp_path / 'knowledge_base.json'
+    write_json(path, {})
+    os.chmod(path, 0o644)
+    store = KnowledgeStore(str(path), check_interval=0)
+
+    store.update({'support': {'hours': '9-5'}})
+    assert os.stat(path).st_mode & 0o777 == 0o644
+
+def test_store_update_cleans_up_when_the_temporary_file_fails(tmp_path, monkeypatch):
+    """Test a failed update leaves neither a temporary file nor an open descriptor behind"""
+    path = tmp_path / 'knowledge_base.json'
+    write_json(path, {})
+    store = KnowledgeStore(str(path), check_interval=0)
+    descriptors = []
+    mkstemp = tempfile.mkstemp
+    monkeypatch.setattr('tempfile.mkstemp', lambda **kwargs: descriptors.append(mkstemp(**kwargs)) or descriptors[-1])
+
+    def fchmod(fd, mode):
+        raise PermissionError('read-only')
+
+    monkeypatch.setattr('os.fchmod', fchmod)
+    with pytest.raises(PermissionError):
+        store.update({'support': {'hours': '9-5'}})
+    assert [p.name for p in tmp_path.iterdir()] == ['knowledge_base.json']
+    assert json.loads(path.read_text()) == {}
+    with pytest.raises(OSError):
+        os.fstat(descriptors[0][0])
@@ -0,0 +1,87 @@
+import time
+import pytest
+from provider_router import CircuitBreaker, Provider, ProviderRouter, ProviderUnavailable
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_breaker_opens_on_failures_and_probes_before_closing():
+    """Test the breaker trips on the failure rate, rejects calls while open, then probes"""
+    clock = FakeClock()
+    breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=4, open_seconds=30, clock=clock)
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success, 0.1)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    clock.now = 31
+    assert breaker.allow()  # The single half-open probe
+    assert not breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == 'open'
+
+    clock.now = 62
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == 'closed'
+
+def test_breaker_opens_on_slow_calls():
+    """Test calls slower than slow_seconds count against the provider"""
+    breaker = CircuitBreaker('test', slow_seconds=5, slow_rate=0.5, min_calls=2, clock=FakeClock())
+    breaker.record(True, 6)
+    breaker.record(True, 7)
+    assert breaker.state == 'open'
+
+def test_router_fails_over_and_skips_open_circuits():
+    """Test a failing primary is skipped without being called once its circuit opens"""
+    calls = []
+
+    def broken(message):
+        calls.append('primary')
+        raise ConnectionError('down')
+
+    router = ProviderRouter(
+        [Provider('primary', broken), Provider('secondary', lambda m: f"answer: {m}")],
+        breaker_options={'min_calls': 2}
+    )
+    for _ in range(4):
+        assert router.call('hi') == ('secondary', 'answer: hi')
+    assert calls == ['primary', 'primary']
+
+    router.breakers['secondary'].transition('open')
+    with pytest.raises(ProviderUnavailable):
+        router.call('hi')
+
+def test_hedged_request_takes_the_faster_provider():
+    """Test the secondary is asked once the primary is slow, and its answer wins"""
+    from monitoring import AI_HEDGED_REQUESTS
+    before = AI_HEDGED_REQUESTS.labels(winner='secondary')._value.get()
+
+    def slow(message):
+        time.sleep(0.5)
+        return 'slow'
+
+    router = ProviderRouter([Provider('primary', slow), Provider('secondary', lambda m: 'fast')],
+                            hedging=True, hedge_min_delay=0.05)
+    start = time.monotonic()
+    assert router.call('hi') == ('secondary', 'fast')
+    assert time.monotonic() - start < 0.4
+    assert AI_HEDGED_REQUESTS.labels(winner='secondary')._value.get() == before + 1
+
+def test_stream_fails_over_before_the_first_token():
+    """Test a stream that fails before producing tokens moves on to the next provider"""
+    def broken(message):
+        raise ConnectionError('down')
+        yield
+
+    router = ProviderRouter([
+        Provider('primary', None, broken),
+        Provider('secondary', None, lambda m: iter(['Cohort ', '3']))
+    ])
+    assert list(router.stream('hi')) == [('secondary', 'Cohort '), ('secondary', '3')]
+    assert len(router.breakers['primary'].outcomes) == 1
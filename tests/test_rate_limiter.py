@@ -0,0 +1,79 @@
+import pytest
+from rate_limiter import RateLimiter, MemoryBackend, SQLiteBackend, create_rate_limiter
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteBackend(str(tmp_path / 'ratelimit.db'))
+    return MemoryBackend()
+
+def test_limit_within_a_window(backend):
+    """Test requests beyond the limit are rejected and not counted"""
+    clock = Clock(600.0)
+    limiter = RateLimiter(3, window=60, backend=backend, clock=clock)
+    assert [limiter.allow('1.2.3.4') for _ in range(5)] == [True, True, True, False, False]
+    assert limiter.allow('5.6.7.8')
+
+def test_previous_window_slides_out(backend):
+    """Test the previous window's count is weighted by its remaining overlap"""
+    clock = Clock(600.0)
+    limiter = RateLimiter(4, window=60, backend=backend, clock=clock)
+    for _ in range(4):
+        assert limiter.allow('client')
+
+    clock.now = 660.0 + 15  # 3/4 of the previous window still overlaps: 4 * 0.75 = 3
+    assert limiter.allow('client')
+    assert not limiter.allow('client')
+
+    clock.now = 660.0 + 45  # 4 * 0.25 + 1 = 2
+    assert limiter.allow('client')
+    assert limiter.allow('client')
+    assert not limiter.allow('client')
+
+    clock.now = 900.0  # Idle for more than a window
+    assert [limiter.allow('client') for _ in range(5)] == [True, True, True, True, False]
+
+def test_memory_backend_evicts_least_recently_used():
+    """Test memory stays bounded by evicting the idlest client"""
+    backend = MemoryBackend(max_keys=2)
+    limiter = RateLimiter(1, window=60, backend=backend, clock=Clock(0.0))
+    assert limiter.allow('a')
+    assert limiter.allow('b')
+    assert not limiter.allow('a')  # 'a' is now the most recently used
+    assert limiter.allow('c')      # evicts 'b'
+    assert list(backend.counters) == ['a', 'c']
+    assert limiter.allow('b')
+
+def test_sqlite_limits_are_shared(tmp_path):
+    """Test two limiters on the same file enforce one limit"""
+    path = str(tmp_path / 'ratelimit.db')
+    clock = Clock(0.0)
+    first = RateLimiter(2, backend=SQLiteBackend(path), clock=clock)
+    second = RateLimiter(2, backend=SQLiteBackend(path), clock=clock)
+    assert first.allow('client')
+    assert second.allow('client')
+    assert not first.allow('client')
+    assert not second.allow('client')
+
+def test_failed_backend_falls_back_to_process_limits():
+    """Test a broken shared backend still enforces per-process limits"""
+    class Broken:
+        def acquire(self, key, window, weight, limit):
+            raise ConnectionError('down')
+
+    limiter = RateLimiter(1, backend=Broken(), clock=Clock(0.0))
+    assert limiter.allow('client')
+    assert not limiter.allow('client')
+
+def test_create_rate_limiter_from_storage_url(tmp_path):
+    """Test storage URLs select the backend"""
+    assert isinstance(create_rate_limiter(5).backend, MemoryBackend)
+    limiter = create_rate_limiter(5, storage_url=f"sqlite:///{tmp_path / 'ratelimit.db'}")
+    assert isinstance(limiter.backend, SQLiteBackend)
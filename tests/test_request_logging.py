@@ -0,0 +1,42 @@
+import io
+import json
+import logging
+from monitoring import RequestLogSampler, configure_logging, logger, LOGGER_NAME
+
+def test_sampler_skips_probes_and_keeps_errors_and_slow_requests():
+    """Test health and metrics are never logged, while errors and slow requests always are"""
+    sampler = RequestLogSampler(default_rate=0.0, rates={'chat': 1.0}, slow_seconds=2.0)
+    assert not sampler.should_log('health_check', 500, 5.0)
+    assert not sampler.should_log('metrics', 200, 0.01)
+    assert not sampler.should_log('index', 200, 0.01)
+    assert sampler.should_log('index', 503, 0.01)
+    assert sampler.should_log('index', 200, 2.5)
+    assert sampler.should_log('chat', 200, 0.01)
+
+def test_sampler_rate_is_per_endpoint():
+    """Test a fractional rate logs roughly that share of requests"""
+    draws = iter([0.05, 0.5, 0.09, 0.95])
+    sampler = RequestLogSampler(rates={'index': 0.1}, random=lambda: next(draws))
+    assert [sampler.should_log('index', 200, 0.01) for _ in range(4)] == [True, False, True, False]
+    assert sampler.rate('chat') == 1.0
+
+def test_async_logging_renders_json_on_background_thread():
+    """Test queued events are written as JSON lines once the writer drains"""
+    stream = io.StringIO()
+    handler = configure_logging(async_mode=True, stream=stream)
+    try:
+        logger.info("request_completed", endpoint='chat', status_code=200)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.error("chat_failed", exc_info=True)
+        handler.stop()
+    finally:
+        logging.getLogger(LOGGER_NAME).removeHandler(handler)
+
+    completed, failed = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert completed['event'] == 'request_completed'
+    assert completed['level'] == 'info'
+    assert completed['endpoint'] == 'chat'
+    assert 'timestamp' in completed
+    assert 'ValueError: boom' in failed['exception']
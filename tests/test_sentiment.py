@@ -0,0 +1,58 @@
+import random
+from sentiment import SentimentAnalyzer, POSITIVE_WORDS, NEGATIVE_WORDS
+
+def linear_sentiment(message, positive_words=POSITIVE_WORDS, negative_words=NEGATIVE_WORDS):
+    """Reference per-word substring count the analyzer replaces"""
+    message_lower = message.lower()
+    positive_count = sum(1 for word in positive_words if word in message_lower)
+    negative_count = sum(1 for word in negative_words if word in message_lower)
+    if positive_count > negative_count:
+        return "positive"
+    elif negative_count > positive_count:
+        return "negative"
+    return "neutral"
+
+def test_analyze_labels_messages():
+    """Test positive, negative and neutral messages"""
+    analyzer = SentimentAnalyzer()
+    assert analyzer.analyze("Thank you, this was GREAT") == "positive"
+    assert analyzer.analyze("I have a terrible problem") == "negative"
+    assert analyzer.analyze("Good, but a bad problem") == "negative"
+    assert analyzer.analyze("good but bad") == "neutral"
+    assert analyzer.analyze("") == "neutral"
+
+def test_analyze_matches_linear_scan():
+    """Test overlapping lexicon words count exactly like substring checks"""
+    positive_words = ['thank', 'thanks', 'good', 'goodness']
+    negative_words = ['issue', 'issues', 'error', 'no good']
+    analyzer = SentimentAnalyzer(positive_words, negative_words)
+    rng = random.Random(3)
+    vocabulary = positive_words + negative_words + ['no', 'the', 'ok', 'thanksgiving', 'errors']
+    for _ in range(500):
+        message = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(0, 6)))
+        assert analyzer.analyze(message) == linear_sentiment(message, positive_words, negative_words), message
+
+def test_analyze_many_matches_analyze():
+    """Test the batch API returns one sentiment per message in order"""
+    analyzer = SentimentAnalyzer()
+    messages = ["great", "bad", "hello", "great", "", "bad"]
+    assert analyzer.analyze_many(messages) == [analyzer.analyze(message) for message in messages]
+
+def test_distribution_keeps_stored_sentiment():
+    """Test stored sentiments are counted as-is and missing ones are scored"""
+    conversations = [
+        {'user_message': 'terrible', 'sentiment': 'positive'},
+        {'user_message': 'thank you'},
+        {'user_message': 'a problem', 'sentiment': ''},
+        {}
+    ]
+    assert SentimentAnalyzer().distribution(conversations) == {'positive': 2, 'negative': 1, 'neutral': 1}
+
+def test_chat_and_reports_share_the_lexicon():
+    """Test app_simple's /chat labels messages exactly as train_chatbot's reports do"""
+    import app_simple
+    import train_chatbot
+    for message in ["Thanks, very helpful", "I'm disappointed, there is an error", "awful", "satisfied", "hello"]:
+        assert app_simple.analyze_sentiment(message) == train_chatbot.sentiment_analyzer.analyze(message)
+    assert app_simple.analyze_sentiment("I'm disappointed, there is an error") == "negative"
+    assert SentimentAnalyzer().analyze("I'm disappointed, there is an error") == "neutral"
@@ -0,0 +1,136 @@
+import threading
+import time
+import pytest
+from single_flight import SingleFlight
+
+def run_concurrently(count, target):
+    results = [None] * count
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_calls_share_one_result():
+    """Test identical concurrent requests make a single provider call"""
+    group = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'Cohort 3 ends July 20th.'
+
+    results = run_concurrently(10, lambda: group.do('cohort', fetch))
+    assert results == ['Cohort 3 ends July 20th.'] * 10
+    assert len(calls) == 1
+    assert group.flights == {}
+
+def test_waiters_fall_back_when_the_leader_fails():
+    """Test a failed leader does not take its waiters down with it"""
+    group = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        if len(calls) == 1:
+            raise ConnectionError('provider down')
+        return 'answer'
+
+    results = run_concurrently(5, lambda: group.do('cohort', fetch))
+    assert sum(isinstance(result, ConnectionError) for result in results) == 1
+    assert results.count('answer') == 4
+
+def test_waiters_give_up_after_the_timeout():
+    """Test a slow leader only delays waiters by wait_timeout"""
+    group = SingleFlight(wait_timeout=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=group.do, args=('cohort', lambda: release.wait(1) and 'slow'))
+    leader.start()
+    time.sleep(0.02)
+    assert group.do('cohort', lambda: 'fallback') == 'fallback'
+    release.set()
+    leader.join()
+
+def test_late_waiters_only_wait_out_the_leaders_timeout():
+    """Test wait_timeout counts from when the leader started, not from when a waiter arrived"""
+    group = SingleFlight(wait_timeout=0.3)
+    release = threading.Event()
+    leader = threading.Thread(target=group.do, args=('cohort', lambda: release.wait(1) and 'slow'))
+    leader.start()
+    time.sleep(0.2)
+    start = time.monotonic()
+    assert group.do('cohort', lambda: 'fallback') == 'fallback'
+    assert time.monotonic() - start < 0.25
+    release.set()
+    leader.join()
+
+class FakeRedis:
+    """Just enough of redis-py for the cross-worker lock"""
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        self.expires[key] = time.monotonic() + px / 1000
+        return True
+
+    def pttl(self, key):
+        return int((self.expires[key] - time.monotonic()) * 1000) if key in self.values else -2
+
+    def exists(self, key):
+        return int(key in self.values)
+
+    def register_script(self, script):
+        def release(keys, args):
+            if self.values.get(keys[0]) == args[0]:
+                del self.values[keys[0]]
+        return release
+
+def test_workers_wait_for_the_worker_holding_the_lock():
+    """Test a second worker reads the shared cache instead of calling the provider"""
+    redis, shared_cache = FakeRedis(), {}
+    first = SingleFlight(redis, poll_interval=0.01)
+    second = SingleFlight(redis, poll_interval=0.01)
+    started = threading.Event()
+
+    def fetch():
+        started.set()
+        time.sleep(0.1)
+        shared_cache['cohort'] = 'from first worker'
+        return shared_cache['cohort']
+
+    leader = threading.Thread(target=first.do, args=('cohort', fetch, lambda: shared_cache.get('cohort')))
+    leader.start()
+    started.wait(1)
+    result = second.do('cohort', lambda: pytest.fail('second worker called the provider'),
+                       lambda: shared_cache.get('cohort'))
+    leader.join()
+    assert result == 'from first worker'
+    assert redis.values == {}
+
+def test_workers_stop_waiting_when_the_lock_holders_time_is_up():
+    """Test a worker arriving late waits only for what is left of the lock holder's wait_timeout"""
+    redis = FakeRedis()
+    first = SingleFlight(redis, wait_timeout=0.3, lock_ttl=0.5, poll_interval=0.01)
+    second = SingleFlight(redis, wait_timeout=0.3, lock_ttl=0.5, poll_interval=0.01)
+    release = threading.Event()
+    leader = threading.Thread(target=first.do, args=('cohort', lambda: release.wait(1) and 'slow', lambda: None))
+    leader.start()
+    time.sleep(0.2)
+    start = time.monotonic()
+    assert second.do('cohort', lambda: 'fallback', lambda: None) == 'fallback'
+    assert time.monotonic() - start < 0.25
+    release.set()
+    leader.join()
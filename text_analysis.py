@@ -0,0 +1,77 @@
+import re
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# Function words, plus the greetings and fillers fellows often wrap
+# questions in ("abeg, pls sir, when does cohort 3 end o?")
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be been before being but by can could
+did do does doing for from had has have having he her here hers him his how i if in into is it its
+just me more most my no nor not now of off on once only or other our ours out over own same she
+should so some such than that the their theirs them then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you
+your yours
+
+abeg biko pls plz please sir ma madam hello hi hey dear kindly o oo oh eh na abi sha oga wetin
+thanks thank u ur im
+""".split())
+
+# British and Nigerian spellings, and ways of saying "log in", that the
+# knowledge base writes differently
+SPELLINGS = {
+    'programme': 'program', 'programmes': 'programs', 'centre': 'center', 'centres': 'centers',
+    'enrol': 'enroll', 'enrolment': 'enrollment', 'organisation': 'organization',
+    'signin': 'login', 'logon': 'login', 'log': 'login', 'logging': 'login', 'logged': 'login'
+}
+
+# Words that flip a question's meaning; TOKEN splits "can't" into "can" and "t"
+NEGATIONS = frozenset("""
+not no nor never cannot cant dont doesnt didnt isnt wasnt wont aint havent hasnt couldnt nothing
+none nobody t
+""".split())
+
+NUMBER = re.compile(r"[0-9]+")
+
+def meaning_markers(text):
+    """The numbers in text, plus 'not' if it is negated
+
+    Questions that look alike but differ in these ("cohort 3" and "cohort
+    4", "I cannot log in" and "I can now log in") ask different things.
+    """
+    lowered = text.lower()
+    markers = set(NUMBER.findall(lowered))
+    if any(word in NEGATIONS for word in TOKEN.findall(lowered)):
+        markers.add('not')
+    return frozenset(markers)
+
+def stem(word):
+    """Strip common English inflections so 'changes', 'changed' and 'changing' meet at 'chang'"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        word = word[:-3] + 'y'
+    elif word.endswith('sses'):
+        word = word[:-2]
+    elif word.endswith('ing') and len(word) > 5:
+        word = undouble(word[:-3])
+    elif word.endswith('ed') and len(word) > 4:
+        word = undouble(word[:-2])
+    elif word.endswith('s') and not word.endswith('ss') and not word.endswith('us'):
+        word = word[:-1]
+    if word.endswith('e') and len(word) > 4:
+        word = word[:-1]
+    return word
+
+def undouble(word):
+    """'stopp' -> 'stop', but keep 'enroll' and 'pass'"""
+    if len(word) > 2 and word[-1] == word[-2] and word[-1] not in 'lsz':
+        return word[:-1]
+    return word
+
+def content_words(text):
+    """Lowercased words of text without stopwords, in the knowledge base's spelling"""
+    return [SPELLINGS.get(word, word) for word in TOKEN.findall(text.lower()) if word not in STOPWORDS]
+
+def tokenize(text):
+    """Lowercased, stemmed content words of text"""
+    return [stem(word) for word in content_words(text)]
@@ -8,14 +8,15 @@ import json
 import os
 from datetime import datetime
 from collections import Counter
+from conversation_store import ConversationStore
+from sentiment import SentimentAnalyzer, CONVERSATION_LOG_POSITIVE_WORDS, CONVERSATION_LOG_NEGATIVE_WORDS
+
+# Same lexicon app_simple labels the conversation log with
+sentiment_analyzer = SentimentAnalyzer(CONVERSATION_LOG_POSITIVE_WORDS, CONVERSATION_LOG_NEGATIVE_WORDS)
 
 def load_data():
     """Load all data files"""
-    try:
-        with open('conversations.json', 'r') as f:
-            conversations = json.load(f)
-    except FileNotFoundError:
-        conversations = []
+    conversations = list(ConversationStore().read_all())
     
     try:
         with open('training_data.json', 'r') as f:
@@ -39,7 +40,7 @@ def analyze_conversations():
     print(f"Total conversations: {len(conversations)}")
     
     # Sentiment analysis
-    sentiment_counts = Counter(conv.get('sentiment', 'neutral') for conv in conversations)
+    sentiment_counts = sentiment_analyzer.distribution(conversations)
     print(f"Sentiment distribution: {dict(sentiment_counts)}")
     
     # Common topics
@@ -179,7 +180,7 @@ def generate_report():
     }
     
     # Sentiment analysis
-    sentiment_counts = Counter(conv.get('sentiment', 'neutral') for conv in conversations)
+    sentiment_counts = sentiment_analyzer.distribution(conversations)
     report["sentiment_analysis"] = dict(sentiment_counts)
     
     # Calculate satisfaction rate